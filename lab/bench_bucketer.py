@@ -0,0 +1,77 @@
+"""
+Show that the bucketers don't grow during a long watch.
+
+Simulates polls five minutes apart, with a new run every ten minutes.  Each
+poll defuzzes the newest page of runs and their jobs, the way get_events does.
+The memory used by a bucketer that never forgets is compared to RepoBucketers
+forgetting old instants.
+
+    $ python lab/bench_bucketer.py [NUM_POLLS]
+
+"""
+
+import datetime
+import sys
+import tracemalloc
+
+from watchgha.bucketer import DatetimeBucketer, RepoBucketers
+from watchgha.data_core import BUCKET_WINDOW, MAX_DAYS_OLD
+
+T0 = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+POLL = datetime.timedelta(minutes=5)
+RUN_EVERY = datetime.timedelta(minutes=10)
+JOBS_PER_RUN = 5
+RUNS_PER_PAGE = 30
+
+
+def poll_times(now):
+    """The run and job creation times a poll at `now` would see."""
+    newest = (now - T0) // RUN_EVERY
+    for nrun in range(max(0, newest - RUNS_PER_PAGE), newest + 1):
+        started = T0 + nrun * RUN_EVERY
+        yield started
+        for njob in range(JOBS_PER_RUN):
+            yield started + datetime.timedelta(seconds=7 * njob + 1)
+
+
+def simulate(num_polls, bucketers, forget):
+    tracemalloc.start()
+    report_every = max(num_polls // 10, 1)
+    for npoll in range(num_polls):
+        now = T0 + npoll * POLL
+        if forget:
+            bucketers.forget_before(now - datetime.timedelta(days=MAX_DAYS_OLD + 1))
+        bucketer = bucketers.for_repo("https://github.com/o/r")
+        for dt in poll_times(now):
+            bucketer.defuzz(dt)
+        if npoll % report_every == report_every - 1:
+            current, _ = tracemalloc.get_traced_memory()
+            print(
+                f"  poll {npoll + 1:6}: {len(bucketers):6} instants, "
+                + f"{current / 1024:8.1f} KiB"
+            )
+    tracemalloc.stop()
+
+
+class NeverForget:
+    """The old module-global bucketer, shared by everything."""
+
+    def __init__(self):
+        self.bucketer = DatetimeBucketer(BUCKET_WINDOW)
+
+    def for_repo(self, repo):
+        return self.bucketer
+
+    def __len__(self):
+        return len(self.bucketer)
+
+
+def main(num_polls=10_000):
+    print("One bucketer, never forgetting:")
+    simulate(num_polls, NeverForget(), forget=False)
+    print("RepoBucketers, forgetting old instants:")
+    simulate(num_polls, RepoBucketers(BUCKET_WINDOW), forget=True)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
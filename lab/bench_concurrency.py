@@ -0,0 +1,44 @@
+"""
+Benchmark a poll of a big branch with different limits on concurrent requests.
+
+    $ python lab/bench_concurrency.py [NUM_RUNS] [MAX_CONCURRENT]
+
+Runs against lab/fake_github.py, which refuses requests over MAX_CONCURRENT at
+once with a secondary rate limit, as GitHub does.  The pool is big enough for
+every request, so only --max-requests limits them.  The branch is watched
+through two remotes for the same repo, so the runs are asked for twice at once.
+
+"""
+
+import sys
+import time
+
+import trio
+
+from fake_github import FakeGitHub
+from watchgha.data_core import get_events
+from watchgha.http_help import Http
+
+
+def main(num_runs=80, max_concurrent=20):
+    with FakeGitHub(
+        num_runs=num_runs, connect_delay=0, request_delay=0.05, max_concurrent=max_concurrent
+    ) as gh:
+        print(f"{num_runs} runs, the server allows {max_concurrent} requests at once")
+        urls = [gh.runs_url(), gh.runs_url()]
+        for max_requests in [num_runs * 2, max_concurrent, max_concurrent // 2, 5]:
+            gh.reset_counts()
+            http = Http(max_connections=num_runs * 2, max_requests=max_requests)
+            start = time.perf_counter()
+            trio.run(get_events, urls, http.get_json, None)
+            elapsed = time.perf_counter() - start
+            trio.run(http.aclose)
+            print(
+                f"--max-requests {max_requests:3}: {elapsed * 1000:7.1f}ms, "
+                + f"{gh.num_requests} requests, {gh.num_limited} rate limited, "
+                + f"{http.stats.shared} shared"
+            )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,36 @@
+"""
+Show how conditional requests save bytes and parsing on unchanged polls.
+
+    $ python lab/bench_etag.py [NUM_POLLS]
+
+"""
+
+import sys
+import time
+
+import trio
+
+from fake_github import FakeGitHub
+from watchgha.data_core import get_events
+from watchgha.http_help import Http
+
+
+def main(num_polls=10):
+    with FakeGitHub(num_runs=30, connect_delay=0) as gh:
+        http = Http()
+        for poll in range(num_polls):
+            gh.reset_counts()
+            start = time.perf_counter()
+            trio.run(get_events, [gh.runs_url()], http.get_json, None)
+            elapsed = time.perf_counter() - start
+            print(
+                f"poll {poll}: {elapsed * 1000:6.1f}ms, "
+                + f"{gh.num_requests} requests, {gh.num_not_modified} not modified, "
+                + f"{gh.bytes_sent} bytes of body"
+            )
+        trio.run(http.aclose)
+        print(http.stats)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
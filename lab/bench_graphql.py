@@ -0,0 +1,40 @@
+"""
+Compare the REST and GraphQL ways to get the runs and jobs for a branch.
+
+    $ python lab/bench_graphql.py [NUM_RUNS]
+
+Reports requests, bytes and wall time for one cold poll of each.
+
+"""
+
+import sys
+import time
+
+import trio
+
+from fake_github import FakeGitHub
+from watchgha.data_core import get_events
+from watchgha.graphql_data import GraphQLData
+from watchgha.http_help import Http
+
+
+def main(num_runs=50):
+    with FakeGitHub(num_runs=num_runs, num_jobs=8, request_delay=0.05) as gh:
+        print(f"{num_runs} runs of {gh.num_jobs} jobs, {gh.request_delay * 1000:.0f}ms per request")
+        for label in ["REST", "GraphQL"]:
+            http = Http()
+            datafn = http.get_json if label == "REST" else GraphQLData(http).get_json
+            gh.reset_counts()
+            start = time.perf_counter()
+            events = trio.run(get_events, [gh.runs_url()], datafn, None)
+            elapsed = time.perf_counter() - start
+            trio.run(http.aclose)
+            num_jobs = sum(len(run.jobs) for runs in events for run in runs)
+            print(
+                f"{label:>8}: {gh.num_requests:3d} requests, {gh.bytes_sent:7d} bytes, "
+                + f"{elapsed * 1000:6.1f}ms, {num_jobs} jobs"
+            )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,58 @@
+"""
+Benchmark per-poll latency with a pooled client against a client per request.
+
+    $ python lab/bench_pool.py [NUM_POLLS]
+
+Runs against lab/fake_github.py, which charges a delay for every new
+connection, like a TCP+TLS handshake would.
+
+"""
+
+import sys
+import time
+
+import trio
+
+from fake_github import FakeGitHub
+from watchgha.data_core import get_events
+from watchgha.http_help import Http
+
+
+class UnpooledHttp(Http):
+    """The old behavior: a fresh client for every URL."""
+
+    async def _get_entry(self, url):
+        http = Http()
+        try:
+            return await http._get_entry(url)
+        finally:
+            await http.aclose()
+
+
+def time_polls(gh, http, num_polls):
+    gh.reset_counts()
+    times = []
+    for _ in range(num_polls):
+        start = time.perf_counter()
+        trio.run(get_events, [gh.runs_url()], http.get_json, None)
+        times.append(time.perf_counter() - start)
+    trio.run(http.aclose)
+    return times, gh.num_connections, gh.num_requests
+
+
+def main(num_polls=5):
+    with FakeGitHub(num_runs=30) as gh:
+        print(f"{num_polls} polls of {gh.num_runs} runs, {gh.connect_delay * 1000:.0f}ms per connection")
+        for label, http in [("unpooled", UnpooledHttp()), ("pooled", Http())]:
+            times, conns, reqs = time_polls(gh, http, num_polls)
+            first, rest = times[0], times[1:]
+            avg = sum(rest) / len(rest) if rest else first
+            print(
+                f"{label:>10}: first poll {first * 1000:6.1f}ms, "
+                + f"later polls {avg * 1000:6.1f}ms, "
+                + f"{conns} connections for {reqs} requests"
+            )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,61 @@
+"""
+Compare repainting the whole screen with repainting only changed lines.
+
+Draws a run with a large matrix of jobs, then polls where one job's step
+advances each time.  Shows the characters sent to the terminal and the time
+spent per poll.
+
+    $ python lab/bench_repaint.py [NUM_JOBS] [NUM_POLLS]
+
+"""
+
+import io
+import sys
+import time
+
+import rich.console
+
+from watchgha.screen import LineScreen
+
+
+def markup(num_jobs, poll):
+    lines = ["[white bold]A big matrix[/] main \\[push]   [dim]4b2ff5812479[/]"]
+    for n in range(num_jobs):
+        step = poll if n == poll % num_jobs else 0
+        lines.append(
+            f"      {'Job ' + str(n):30} [default]\N{CLOCKWISE OPEN CIRCLE ARROW}[/] "
+            + f"[green]\N{BULLET}[/][white]\N{BULLET}[/][default] Step {step}[/]"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def measure(label, screen, console, num_jobs, num_polls):
+    with screen:
+        screen.update(markup(num_jobs, 0))
+        console.file.seek(0)
+        console.file.truncate()
+        start = time.perf_counter()
+        for poll in range(1, num_polls + 1):
+            screen.update(markup(num_jobs, poll))
+        elapsed = time.perf_counter() - start
+    chars = len(console.file.getvalue())
+    print(
+        f"{label:14}: {chars / num_polls:9,.0f} chars/poll, "
+        + f"{elapsed * 1000 / num_polls:6.2f} ms/poll"
+    )
+
+
+def main(num_jobs=200, num_polls=50):
+    def make_console():
+        return rich.console.Console(
+            file=io.StringIO(), width=100, height=num_jobs + 10, force_terminal=True
+        )
+
+    console = make_console()
+    measure("whole screen", console.screen(), console, num_jobs, num_polls)
+    console = make_console()
+    measure("changed lines", LineScreen(console), console, num_jobs, num_polls)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
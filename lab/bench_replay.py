@@ -0,0 +1,98 @@
+"""
+Time each poll of a session saved with SAVE_DATA=1.
+
+Replays the saved responses through GhaWatcher, and shows the time each poll
+spent fetching, parsing JSON, processing runs and jobs, and rendering the
+screen.  Processing is timed by getting the events again from the parsed
+responses kept in memory; fetching is what's left of the poll's wall time.
+
+    $ SAVE_DATA=1 watch_gha_runs ...
+    $ python lab/bench_replay.py [DIR] [--timing]
+
+With --timing, each response takes as long as it originally did.
+
+"""
+
+import io
+import json
+import sys
+import time
+
+import rich.console
+import trio
+
+from watchgha.replay import ReplayData
+from watchgha.screen import LineScreen
+from watchgha.targets import Target
+from watchgha.watcher import GhaWatcher
+
+
+class TimedData:
+    """A datafn that adds up how long parsing takes, and keeps the results."""
+
+    def __init__(self, replay):
+        self.replay = replay
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.parse = 0.0
+        self.parsed = {}
+
+    async def get_json(self, url):
+        self.requests += 1
+        text = await self.replay.get_data(url)
+        start = time.perf_counter()
+        data = self.parsed[url] = json.loads(text)
+        self.parse += time.perf_counter() - start
+        return data
+
+    async def get_parsed(self, url):
+        return self.parsed[url]
+
+
+def main(directory=".", timing=False):
+    replay = ReplayData(directory, timing=timing)
+    data = TimedData(replay)
+    watcher = GhaWatcher(
+        targets=[Target(replay.runs_urls())],
+        get_data_fn=data.get_json,
+        only_words=None,
+        message=None,
+    )
+    console = rich.console.Console(
+        file=io.StringIO(), width=120, height=100, force_terminal=True
+    )
+    screen = LineScreen(console)
+
+    print(
+        "poll  requests   fetch ms   parse ms  process ms   render ms    total ms"
+    )
+    with screen:
+        for poll in range(1, replay.num_polls() + 1):
+            data.reset()
+            start = time.perf_counter()
+            watcher.get_data_fn = data.get_json
+            all_events = trio.run(watcher.get_all_events)
+            got = time.perf_counter()
+            _, output = watcher.render(all_events)
+            screen.update(output)
+            done = time.perf_counter()
+
+            watcher.get_data_fn = data.get_parsed
+            again = time.perf_counter()
+            trio.run(watcher.get_all_events)
+            process = time.perf_counter() - again
+            fetch = max((got - start) - data.parse - process, 0)
+            print(
+                f"{poll:4d}  {data.requests:8d}  {fetch * 1000:9.2f}  "
+                + f"{data.parse * 1000:9.2f}  {process * 1000:10.2f}  "
+                + f"{(done - got) * 1000:10.2f}  {(done - start) * 1000:10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    timing = "--timing" in args
+    args = [a for a in args if a != "--timing"]
+    main(*args, timing=timing)
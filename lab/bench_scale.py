@@ -0,0 +1,148 @@
+"""
+Measure how getting and drawing events scale with the size of a branch.
+
+Uses synthetic data of various sizes (workflows x jobs x steps), and measures
+each phase separately: get_events (parsing, sorting, and grouping), sorting
+jobs with job_sort_key, human_key alone, and draw_events.  For each it shows
+the CPU time (best of a few tries), the peak memory while it ran, and the
+memory still allocated after it finished.
+
+Results can be saved as a baseline, and later results compared to it:
+
+    $ python lab/bench_scale.py --save baseline.json
+    ... change things ...
+    $ python lab/bench_scale.py --compare baseline.json
+
+Comparing exits with status 1 if a phase got slower or bigger by more than the
+tolerances.  Baselines are only meaningful on the machine that made them.
+
+"""
+
+import argparse
+import functools
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+import trio
+
+from watchgha.bucketer import DatetimeBucketer
+from watchgha.data_core import BUCKET_WINDOW, draw_events_status, get_events, job_sort_key
+from watchgha.sample_data import synthetic_data, synthetic_datafn
+from watchgha.utils import human_key
+
+SIZES = {
+    "small": (5, 20, 10),
+    "medium": (20, 100, 20),
+    "large": (60, 400, 30),
+}
+
+# How much worse than the baseline is a regression: a ratio, and an amount
+# too small to matter, so noise in tiny measurements isn't reported.
+TOLERANCES = {
+    "cpu": (1.25, 0.001),
+    "peak": (1.10, 64 * 1024),
+    "kept": (1.10, 64 * 1024),
+}
+
+
+def phases(num_workflows, num_jobs, num_steps):
+    """Make the phases to measure for one size: name -> function to call."""
+    datafn = synthetic_datafn(synthetic_data(num_workflows, num_jobs, num_steps))
+    events = trio.run(get_events, ["synth:runs"], datafn, None)
+    jobs = [job for runs in events for run in runs for job in run.jobs]
+    names = [job.name for job in jobs]
+
+    def sort_jobs():
+        # A fresh bucketer, as if the jobs were seen for the first time.
+        key = functools.partial(job_sort_key, bucketer=DatetimeBucketer(BUCKET_WINDOW))
+        sorted(reversed(jobs), key=key)
+
+    return {
+        "get_events": lambda: trio.run(get_events, ["synth:runs"], datafn, None),
+        "job_sort_key": sort_jobs,
+        "human_key": lambda: [human_key(name) for name in names],
+        "draw_events": lambda: draw_events_status(events, lambda s: None),
+    }
+
+
+def measure(fn, repeat):
+    """Return the CPU seconds, peak bytes, and kept bytes of calling `fn`."""
+    cpu = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.process_time()
+        fn()
+        cpu = min(cpu, time.process_time() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    gc.collect()
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {"cpu": cpu, "peak": peak, "kept": kept}
+
+
+def compare(result, baseline):
+    """Describe how `result` differs from `baseline`, and whether it regressed."""
+    notes = []
+    regressed = False
+    for metric, (tolerance, too_small) in TOLERANCES.items():
+        if abs(result[metric] - baseline[metric]) < too_small:
+            continue
+        ratio = result[metric] / max(baseline[metric], too_small)
+        if ratio > tolerance:
+            regressed = True
+            notes.append(f"{metric} {ratio:.2f}x WORSE")
+        elif ratio < 1 / tolerance:
+            notes.append(f"{metric} {ratio:.2f}x")
+    return regressed, ", ".join(notes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().partition("\n")[0])
+    parser.add_argument("sizes", nargs="*", help=f"sizes to run: {', '.join(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="tries for CPU time")
+    parser.add_argument("--save", metavar="FILE", help="save the results as a baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare to a saved baseline")
+    args = parser.parse_args()
+    for size in args.sizes:
+        if size not in SIZES:
+            parser.error(f"Unknown size {size!r}")
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {}
+    any_regressed = False
+    print(f"{'size':8} {'phase':14} {'cpu ms':>9} {'peak KiB':>10} {'kept KiB':>10}")
+    for size in args.sizes or SIZES:
+        for phase, fn in phases(*SIZES[size]).items():
+            key = f"{size}/{phase}"
+            result = results[key] = measure(fn, args.repeat)
+            line = (
+                f"{size:8} {phase:14} {result['cpu'] * 1000:9.1f} "
+                + f"{result['peak'] / 1024:10.1f} {result['kept'] / 1024:10.1f}"
+            )
+            if key in baseline:
+                regressed, notes = compare(result, baseline[key])
+                any_regressed = any_regressed or regressed
+                if notes:
+                    line += f"   {notes}"
+            print(line)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if any_regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Measure how long the command takes to start.
+
+Each case runs in a fresh Python process, a number of times, and the best time
+is shown, minus the time for Python to start and do nothing.  Exits with
+status 1 if `watch_gha_runs --help` is over its budget.
+
+    $ python lab/bench_startup.py [REPO_DIR] [TRIES]
+
+"""
+
+import subprocess
+import sys
+import time
+
+# The most --help should add to Python's own startup, in milliseconds.
+HELP_BUDGET_MS = 100
+
+
+def best_time(code, tries):
+    best = float("inf")
+    for _ in range(tries):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(repo_dir=".", tries=10):
+    tries = int(tries)
+    cases = {
+        "--help": (
+            "from watchgha.watch_runs import main\n"
+            + "main(['--help'], standalone_mode=False)"
+        ),
+        "import for a watch": "import watchgha.watcher",
+        "git: fast path": (
+            "from watchgha.git_help import git_repo_urls, git_branch\n"
+            + f"list(git_repo_urls({repo_dir!r})); git_branch({repo_dir!r})"
+        ),
+        "git: dulwich": (
+            "import dulwich.porcelain, dulwich.repo\n"
+            + f"repo = dulwich.repo.Repo({repo_dir!r})\n"
+            + "repo.get_config(); dulwich.porcelain.active_branch(repo)"
+        ),
+    }
+    python = best_time("pass", tries)
+    print(f"{'python itself':20}: {python * 1000:6.1f} ms")
+    over = False
+    for label, code in cases.items():
+        extra = (best_time(code, tries) - python) * 1000
+        note = ""
+        if label == "--help":
+            over = extra > HELP_BUDGET_MS
+            note = f"  (budget {HELP_BUDGET_MS} ms{', OVER' if over else ''})"
+        print(f"{label:20}: +{extra:5.1f} ms{note}")
+    if over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,277 @@
+"""
+A local stand-in for the GitHub Actions API, for benchmarks.
+
+Serves a branch with `num_runs` workflow runs, each with `num_jobs` jobs.
+`connect_delay` is slept once per new connection, to simulate the TCP+TLS
+handshake that a real connection to api.github.com costs.  `request_delay` is
+slept for every request, to simulate server latency.  Like GitHub's secondary
+rate limits, more than `max_concurrent` requests at once are refused with a
+403 and a Retry-After header.
+
+    with FakeGitHub(num_runs=30) as gh:
+        url = gh.runs_url()
+
+"""
+
+import datetime
+import hashlib
+import http.server
+import json
+import re
+import threading
+import time
+
+
+class QuietServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up on us is normal.
+        pass
+
+
+class FakeGitHub:
+    def __init__(
+        self,
+        num_runs=30,
+        num_jobs=8,
+        connect_delay=0.02,
+        request_delay=0.0,
+        max_concurrent=None,
+    ):
+        self.num_runs = num_runs
+        self.num_jobs = num_jobs
+        self.connect_delay = connect_delay
+        self.request_delay = request_delay
+        self.max_concurrent = max_concurrent
+        self.num_active = 0
+        self.num_limited = 0
+        self.num_connections = 0
+        self.num_requests = 0
+        self.num_not_modified = 0
+        self.bytes_sent = 0
+        self.rate_limit = 5000
+        self.rate_remaining = 5000
+        self.rate_reset = int(time.time()) + 3600
+        self.started = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        self.lock = threading.Lock()
+        self.server = None
+
+    def __enter__(self):
+        self.server = QuietServer(("127.0.0.1", 0), self.handler_class())
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def runs_url(self):
+        return f"{self.base_url}/repos/owner/repo/actions/runs?per_page=100&branch=main"
+
+    def reset_counts(self):
+        with self.lock:
+            self.num_connections = 0
+            self.num_requests = 0
+            self.num_not_modified = 0
+            self.num_limited = 0
+            self.bytes_sent = 0
+
+    def run_data(self, run_id):
+        started = self.started.isoformat()
+        return {
+            "id": run_id,
+            "name": f"Workflow {run_id}",
+            "display_title": "A commit message",
+            "head_branch": "main",
+            "head_sha": "4b2ff58124791953563fdb52e40d9ab79d274d9a",
+            "event": "push",
+            "status": "in_progress",
+            "conclusion": None,
+            "run_attempt": 1,
+            "run_started_at": started,
+            "html_url": f"https://github.com/owner/repo/actions/runs/{run_id}",
+            "jobs_url": f"{self.base_url}/repos/owner/repo/actions/runs/{run_id}/jobs",
+        }
+
+    def job_data(self, run_id, job_num):
+        return {
+            "id": run_id * 1000 + job_num,
+            "run_id": run_id,
+            "name": f"Job {job_num}",
+            "status": "in_progress",
+            "conclusion": None,
+            "created_at": self.started.isoformat(),
+            "steps": [
+                {"name": "Set up job", "status": "completed", "conclusion": "success", "number": 1},
+                {"name": "Run tests", "status": "in_progress", "conclusion": None, "number": 2},
+                {"name": "Post", "status": "queued", "conclusion": None, "number": 3},
+            ],
+        }
+
+    def graphql_data(self):
+        """The GraphQL response for the check suites on the commit."""
+
+        def upper(value):
+            return value.upper() if value else value
+
+        suites = []
+        for run_id in range(1, self.num_runs + 1):
+            run = self.run_data(run_id)
+            check_runs = []
+            for job_num in range(1, self.num_jobs + 1):
+                job = self.job_data(run_id, job_num)
+                check_runs.append({
+                    "databaseId": job["id"],
+                    "name": job["name"],
+                    "status": upper(job["status"]),
+                    "conclusion": upper(job["conclusion"]),
+                    "startedAt": job["created_at"],
+                    "completedAt": None,
+                    "steps": {"pageInfo": {"hasNextPage": False}, "nodes": [
+                        {
+                            "name": step["name"],
+                            "number": step["number"],
+                            "status": upper(step["status"]),
+                            "conclusion": upper(step["conclusion"]),
+                            "startedAt": None,
+                            "completedAt": None,
+                        }
+                        for step in job["steps"]
+                    ]},
+                })
+            suites.append({
+                "id": f"CS_{run_id}",
+                "status": upper(run["status"]),
+                "conclusion": upper(run["conclusion"]),
+                "createdAt": run["run_started_at"],
+                "branch": {"name": run["head_branch"]},
+                "workflowRun": {
+                    "databaseId": run["id"],
+                    "url": run["html_url"],
+                    "event": upper(run["event"]),
+                    "createdAt": run["run_started_at"],
+                    "workflow": {"name": run["name"]},
+                },
+                "checkRuns": {
+                    "pageInfo": {"hasNextPage": False, "endCursor": None},
+                    "nodes": check_runs,
+                },
+            })
+        return {"data": {"repository": {"object": {
+            "oid": "4b2ff58124791953563fdb52e40d9ab79d274d9a",
+            "messageHeadline": "A commit message",
+            "checkSuites": {
+                "pageInfo": {"hasNextPage": False, "endCursor": None},
+                "nodes": suites,
+            },
+        }}}}
+
+    def respond(self, path):
+        """Return a status code and JSON data for `path`."""
+        if re.fullmatch(r"/repos/[^/]+/[^/]+/actions/runs", path):
+            runs = [self.run_data(run_id) for run_id in range(1, self.num_runs + 1)]
+            return 200, {"total_count": len(runs), "workflow_runs": runs}
+        if re.fullmatch(r"/repos/[^/]+/[^/]+/actions/workflows", path):
+            # Each run is from its own workflow, with the same id.
+            workflows = [
+                {"id": run_id, "name": f"Workflow {run_id}"}
+                for run_id in range(1, self.num_runs + 1)
+            ]
+            return 200, {"total_count": len(workflows), "workflows": workflows}
+        if m := re.fullmatch(r"/repos/[^/]+/[^/]+/actions/workflows/(\d+)/runs", path):
+            runs = [self.run_data(int(m[1]))]
+            return 200, {"total_count": len(runs), "workflow_runs": runs}
+        if m := re.fullmatch(r"/repos/[^/]+/[^/]+/actions/runs/(\d+)/jobs", path):
+            run_id = int(m[1])
+            jobs = [self.job_data(run_id, n) for n in range(1, self.num_jobs + 1)]
+            return 200, {"total_count": len(jobs), "jobs": jobs}
+        return 404, {"message": "Not Found"}
+
+    def handler_class(self):
+        fake = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with fake.lock:
+                    fake.num_connections += 1
+                time.sleep(fake.connect_delay)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                self.do_GET(post=True)
+
+            def do_GET(self, post=False):
+                with fake.lock:
+                    fake.num_requests += 1
+                    fake.num_active += 1
+                    limited = (
+                        fake.max_concurrent is not None
+                        and fake.num_active > fake.max_concurrent
+                    )
+                    if limited:
+                        fake.num_limited += 1
+                try:
+                    if limited:
+                        self.send_secondary_limit()
+                    else:
+                        self.send_data(post)
+                finally:
+                    with fake.lock:
+                        fake.num_active -= 1
+
+            def send_secondary_limit(self):
+                body = json.dumps(
+                    {"message": "You have exceeded a secondary rate limit."}
+                ).encode()
+                self.send_response(403)
+                self.send_header("Retry-After", "1")
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_data(self, post):
+                time.sleep(fake.request_delay)
+                if post and self.path == "/graphql":
+                    status, data = 200, fake.graphql_data()
+                else:
+                    status, data = fake.respond(self.path.partition("?")[0])
+                body = json.dumps(data).encode()
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                if status == 200 and self.headers.get("If-None-Match") == etag:
+                    with fake.lock:
+                        fake.num_not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_rate_limit_headers()
+                    self.end_headers()
+                    return
+                with fake.lock:
+                    fake.bytes_sent += len(body)
+                    fake.rate_remaining = max(fake.rate_remaining - 1, 0)
+                self.send_response(status)
+                self.send_rate_limit_headers()
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                if status == 200:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_rate_limit_headers(self):
+                self.send_header("X-RateLimit-Limit", str(fake.rate_limit))
+                self.send_header("X-RateLimit-Remaining", str(fake.rate_remaining))
+                self.send_header("X-RateLimit-Reset", str(fake.rate_reset))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
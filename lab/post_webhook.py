@@ -0,0 +1,31 @@
+"""
+Post a recorded webhook payload to a watch_gha_runs --webhook listener.
+
+    $ python lab/post_webhook.py EVENT PAYLOAD.json [URL]
+
+EVENT is the X-GitHub-Event name, like workflow_job.  URL defaults to
+http://127.0.0.1:8765/.  If WATCHGHA_WEBHOOK_SECRET is set, the payload is
+signed with it.
+
+"""
+
+import sys
+
+import httpx
+
+from watchgha.webhook import signature, webhook_secret
+
+
+def main(event_name, payload_file, url="http://127.0.0.1:8765/"):
+    with open(payload_file, "rb") as f:
+        body = f.read()
+    headers = {"X-GitHub-Event": event_name, "Content-Type": "application/json"}
+    secret = webhook_secret()
+    if secret:
+        headers["X-Hub-Signature-256"] = signature(secret, body)
+    resp = httpx.post(url, content=body, headers=headers)
+    print(resp.status_code)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,169 @@
+"""
+Watch runs from your own async program.
+
+    from watchgha.api import repo_target, watch
+
+    targets = [repo_target("owner/repo", sha=sha) for sha in shas]
+    snapshots = watch(targets)
+    try:
+        async for snapshot in snapshots:
+            print(snapshot.target.label, snapshot.status)
+    finally:
+        await snapshots.aclose()
+
+This is built on anyio, so it runs in the caller's event loop, under asyncio or
+trio, with no threads or nested loops.  All the targets share one HTTP client,
+with its connection pool, ETag cache, rate limit, and limit on how many
+requests are made at once.
+
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+import anyio
+import exceptiongroup
+
+from .bucketer import RepoBucketers
+from .data_core import BUCKET_WINDOW, Status, events_status, get_events
+from .eta import DurationHistory, next_transition
+from .http_help import Http
+from .jobs_cache import JobsCache
+from .ndjson import Transitions
+from .scheduler import PollScheduler
+from .targets import Target, runs_url
+from .utils import WatchGhaError, leaf_exceptions
+
+
+def repo_target(repo_name, branch=None, sha=None, label=None):
+    """
+    A Target for the runs of `repo_name` ("owner/repo") on `branch` or `sha`.
+
+    The label defaults to the repo and the branch or commit.
+
+    """
+    if label is None:
+        label = f"{repo_name} {sha or branch}"
+    return Target([runs_url(repo_name, branch, sha)], label=label)
+
+
+@dataclass
+class Snapshot:
+    """What one target looked like after a poll."""
+
+    target: Target
+    # The runs, grouped into events: a list of lists of Runs, with their jobs.
+    events: list = field(default_factory=list)
+    status: Status = field(default_factory=Status)
+    # The runs and jobs that changed since the last snapshot of this target,
+    # as records like --format=ndjson writes.
+    changes: list = field(default_factory=list)
+    # If the data couldn't be had, why not.  The target isn't polled again.
+    error: Optional[str] = None
+    # Is this the last snapshot of the target?
+    final: bool = False
+
+
+class Watched:
+    """A target being watched, and what we know about it."""
+
+    def __init__(self, target):
+        self.target = target
+        self.transitions = Transitions()
+        self.events = []
+        self.started = False
+        self.polled = False
+        self.done = False
+
+
+async def watch(
+    targets,
+    poll=15,
+    http=None,
+    datafn=None,
+    only_words=None,
+    jobs_cache=None,
+    wait_for_start=False,
+    budget=0.5,
+):
+    """
+    Watch `targets` until all of their runs are done.
+
+    An async generator, yielding a Snapshot of each target after its first
+    poll, and after any poll that changed it.  The last Snapshot of a target
+    has `final` set.  A target that fails (after retries) has `error` set, and
+    doesn't stop the others.
+
+    Polls are every `poll` seconds, stretched to stay within `budget`, the
+    fraction of the remaining API rate limit to use.  `http` is the Http to
+    use, or one is made and closed when done.  `datafn` gets the JSON for a
+    URL, instead of `http`.  `only_words` limits the workflows shown, and
+    `jobs_cache` is a JobsCache for the jobs of finished runs, shared by all
+    the targets (an in-memory one if not given).  With `wait_for_start`, a
+    target isn't done until it has had runs in progress.
+
+    If you stop iterating before it's done, call the generator's `aclose`.
+
+    """
+    own_http = http is None and datafn is None
+    if own_http:
+        http = Http()
+    if datafn is None:
+        datafn = http.get_json
+    if jobs_cache is None:
+        jobs_cache = JobsCache()
+    interval = PollScheduler(poll, http.rate_limit if http else None, budget)
+    history = DurationHistory()
+    bucketers = RepoBucketers(BUCKET_WINDOW)
+    watching = [Watched(target) for target in targets]
+
+    async def poll_target(index, watched, snapshots):
+        snapshot = Snapshot(watched.target)
+        errors = []
+
+        def handle_errors(excgroup):
+            errors.extend(leaf_exceptions(excgroup))
+
+        with exceptiongroup.catch({WatchGhaError: handle_errors}):
+            snapshot.events = watched.events = await get_events(
+                watched.target.urls,
+                datafn,
+                only_words,
+                jobs_cache=jobs_cache,
+                history=history,
+                bucketers=bucketers,
+            )
+        if errors:
+            snapshot.error = str(errors[0])
+            snapshot.final = True
+        else:
+            snapshot.status = events_status(snapshot.events)
+            snapshot.changes = watched.transitions.changes([snapshot.events])
+            watched.started = watched.started or not snapshot.status.done
+            snapshot.final = snapshot.status.done and (
+                watched.started or not wait_for_start
+            )
+        if snapshot.changes or snapshot.final or not watched.polled:
+            snapshots[index] = snapshot
+        watched.polled = True
+        watched.done = snapshot.final
+
+    try:
+        while watching:
+            snapshots = [None] * len(watching)
+            async with anyio.create_task_group() as tg:
+                for index, watched in enumerate(watching):
+                    tg.start_soon(poll_target, index, watched, snapshots)
+            snapshots = [s for s in snapshots if s is not None]
+            # Yield outside of the task group, which can't be suspended in.
+            for snapshot in snapshots:
+                yield snapshot
+            watching = [w for w in watching if not w.done]
+            if watching:
+                interval.next_due = next_transition(
+                    [runs for w in watching for runs in w.events]
+                )
+                await anyio.sleep(interval.next_delay())
+    finally:
+        if own_http:
+            await http.aclose()
@@ -1,8 +1,13 @@
+import bisect
+
+
 class DatetimeBucketer:
     def __init__(self, window):
         self.window = window
         # The set of good instants
         self.instants = set()
+        # The good instants, sorted, for finding old ones to forget.
+        self.sorted = []
         # Map rounded times to good instants
         self.rounds = {}
 
@@ -20,7 +25,48 @@ class DatetimeBucketer:
                 return instant
 
         self.instants.add(dt)
+        bisect.insort(self.sorted, dt)
         for rounded in self.roundings(dt):
             self.rounds[rounded] = dt
 
         return dt
+
+    def forget_before(self, dt):
+        """Forget the instants earlier than `dt`."""
+        num_old = bisect.bisect_left(self.sorted, dt)
+        for instant in self.sorted[:num_old]:
+            self.instants.discard(instant)
+            for rounded in self.roundings(instant):
+                if self.rounds.get(rounded) == instant:
+                    del self.rounds[rounded]
+        del self.sorted[:num_old]
+
+    def __len__(self):
+        return len(self.sorted)
+
+
+class RepoBucketers:
+    """
+    A DatetimeBucketer for each repo, so instants in one repo don't affect
+    another.  Repos are identified by their URL.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.bucketers = {}
+
+    def for_repo(self, repo):
+        bucketer = self.bucketers.get(repo)
+        if bucketer is None:
+            bucketer = self.bucketers[repo] = DatetimeBucketer(self.window)
+        return bucketer
+
+    def forget_before(self, dt):
+        """Forget instants earlier than `dt`, and repos with none left."""
+        for repo, bucketer in list(self.bucketers.items()):
+            bucketer.forget_before(dt)
+            if not bucketer:
+                del self.bucketers[repo]
+
+    def __len__(self):
+        return sum(len(b) for b in self.bucketers.values())
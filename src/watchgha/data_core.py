@@ -1,18 +1,32 @@
 """Data collection and rendering for watchgha."""
 
 import datetime
+import functools
 import itertools
-import json
+import math
 import re
+import urllib.parse
 from dataclasses import dataclass
 
+import anyio
 import trio
 
-from .bucketer import DatetimeBucketer
-from .utils import human_key, nice_time, to_datetime, DictAttr
+from .bucketer import RepoBucketers
+from .jobs_cache import repo_key
+from .model import Job, Run
+from .targets import RERUN_DAYS
+from .timings import NO_TIMINGS
+from .utils import human_key, nice_eta, nice_time, to_datetime
 
 
-bucketer = DatetimeBucketer(5)
+# How close together times have to be to be considered the same, in seconds.
+BUCKET_WINDOW = 5
+
+# Runs older than this many days aren't shown.
+MAX_DAYS_OLD = 7
+
+# How many pages of a paginated list to get at once.
+PAGE_BATCH = 4
 
 CSTYLES = {
     "failure": "red bold",
@@ -67,35 +81,34 @@ CONCLUSION_BAD = {
 }
 
 def summary_style_icon(data):
-    summary = data["status"]
+    summary = data.status
     if summary == "completed":
-        summary = data["conclusion"]
+        summary = data.conclusion
     style = CSTYLES.get(summary, "default")
     icon = CICONS.get(summary, " ")
     return summary, style, icon
 
 
-def run_group_key(run_data):
-    return (
-        bucketer.defuzz(run_data["started_dt"]),
-        run_data["head_sha"],
-        run_data["event"],
-    )
+def run_is_finished(run_data):
+    return summary_style_icon(run_data)[0] in FINISHED
 
 
-def run_sort_key(run_data):
+def run_group_key(run, bucketers):
     return (
-        bucketer.defuzz(run_data["started_dt"]),
-        run_data["head_sha"],
-        run_data["event"],
-        run_data["name"],
+        bucketers.for_repo(repo_key(run)).defuzz(run.started_dt),
+        run.head_sha,
+        run.event,
     )
 
 
-def job_sort_key(job_data):
+def run_sort_key(run, bucketers):
+    return run_group_key(run, bucketers) + (run.name,)
+
+
+def job_sort_key(job, bucketer):
     return (
-        bucketer.defuzz(job_data["created_dt"]),
-        human_key(job_data["name"]),
+        bucketer.defuzz(job.created_dt),
+        human_key(job.name),
     )
 
 
@@ -107,8 +120,30 @@ class Status:
     num_succeeded: int = 0
     num_failed: int = 0
 
+    def add(self, other):
+        """Combine another Status into this one."""
+        self.done = self.done and other.done
+        self.succeeded = self.succeeded and other.succeeded
+        self.total += other.total
+        self.num_succeeded += other.num_succeeded
+        self.num_failed += other.num_failed
+
+
+def draw_runs(urls, datafn, outfn, only_words=None, jobs_cache=None):
+    """Get and draw the runs, in a new event loop."""
+    return trio.run(
+        functools.partial(
+            draw_runs_async,
+            urls,
+            datafn,
+            outfn,
+            only_words=only_words,
+            jobs_cache=jobs_cache,
+        )
+    )
+
 
-def draw_runs(urls, datafn, outfn, only_words=None):
+async def draw_runs_async(urls, datafn, outfn, only_words=None, jobs_cache=None):
     # Workflow runs is a flat list of runs.  We bucket them by time started,
     # sha, and event to create "events".  Each event has a number of runs, each
     # run has a number of jobs, each job has a number of steps. They end up
@@ -117,55 +152,228 @@ def draw_runs(urls, datafn, outfn, only_words=None):
     #   event-name sha, time
     #       outcome run-name, url
     #           job-name     current-step-or-outcome
+    #
+    # `datafn` is an async function taking a URL and returning the parsed JSON
+    # data from it.
+    #
+    # `jobs_cache` is a JobsCache to avoid re-fetching the jobs of finished
+    # runs.
 
-    events = trio.run(get_events, urls, datafn, only_words)
+    events = await get_events(urls, datafn, only_words, jobs_cache)
+    return draw_events_status(events, outfn)
+
+
+def draw_events_status(events, outfn):
+    """Draw the events, and return a Status summarizing them."""
 
     def safe_outfn(s):
         """Scrub control characters from lines of output."""
         outfn(re.sub(r"[\x00-\x1f\x7f-\x9f]", "", s))
 
+    status = count_jobs(events)
+    status.done, status.succeeded = draw_events(events, safe_outfn)
+    return status
+
+
+def events_status(events):
+    """The Status of the events, without drawing anything."""
+    status = count_jobs(events)
+    status.done, status.succeeded = draw_events(events, lambda s: None)
+    return status
+
+
+def count_jobs(events):
+    """Make a Status with the job counts of the events."""
     status = Status()
     for runs in events:
         for run in runs:
-            for job in run["jobs"]:
+            for job in run.jobs or ():
                 status.total += 1
-                if job["status"] == "completed":
-                    if job["conclusion"] in CONCLUSION_BAD:
+                if job.status == "completed":
+                    if job.conclusion in CONCLUSION_BAD:
                         status.num_failed += 1
                     else:
                         status.num_succeeded += 1
-
-    status.done, status.succeeded = draw_events(events, safe_outfn)
     return status
 
 
-async def get_events(urls, datafn, only_words):
-    runs = []
+class Until:
+    """
+    A workflow, or a job in a workflow, to wait for.
 
-    async def runs_from_url(url):
-        runs.extend(json.loads(await datafn(url))["workflow_runs"])
+    Parsed from "workflow" or "workflow/job".  Names are matched without
+    regard to case.
 
-    async with trio.open_nursery() as nursery:
-        for url in urls:
-            nursery.start_soon(runs_from_url, url)
+    """
 
-    # In odd situations (duplicate remotes) we can get the same run more than
-    # once. De-duplicate them.
-    runs_by_id = {r["id"]: r for r in runs}
-    runs = list(runs_by_id.values())
+    def __init__(self, text):
+        workflow, _, job = text.partition("/")
+        self.workflow = workflow.strip().lower()
+        self.job = job.strip().lower() or None
 
-    async with trio.open_nursery() as nursery:
-        for run in runs:
-            run["started_dt"] = to_datetime(run["run_started_at"])
+    def wants_jobs(self, run):
+        return run.name.lower() == self.workflow
+
+    def result(self, events):
+        """
+        Has the latest matching run or job in `events` finished?
+
+        Returns None if not, or whether it succeeded.
+
+        """
+        for event_runs in events:
+            for run in event_runs:
+                if run.name.lower() == self.workflow:
+                    return self.run_result(run)
+        return None
+
+    def run_result(self, run):
+        if self.job is None:
+            if run.status != "completed":
+                return None
+            return run.conclusion not in CONCLUSION_BAD
+        if run.jobs is None:
+            return None
+        for job in run.jobs:
+            if job.name.lower() == self.job:
+                if job.status != "completed":
+                    return None
+                return job.conclusion not in CONCLUSION_BAD
+        if run.status == "completed":
+            # The run finished without the job.
+            return False
+        return None
+
+
+def page_url(url, page):
+    """The URL for page number `page` of a paginated `url`."""
+    parts = urllib.parse.urlsplit(url)
+    query = [(k, v) for k, v in urllib.parse.parse_qsl(parts.query) if k != "page"]
+    query.append(("page", str(page)))
+    return parts._replace(query=urllib.parse.urlencode(query)).geturl()
+
+
+async def get_all_pages(datafn, url, key, stop=None):
+    """
+    Get all the items in a paginated list from `url`.
+
+    The items are in the `key` list of each page.  After the first page, we
+    know the total count, and get the rest of the pages a few at a time.  If
+    `stop` is provided, it's called with the items so far, and if it returns
+    true, we don't get any more pages.
+
+    A new item arriving between pages shifts the others along, so an item can
+    be on two pages.  Only the first of the same id is kept.
+
+    """
+    first_page = await datafn(url)
+    items = list(first_page[key])
+    total = first_page.get("total_count", len(items))
+    if not items or total <= len(items):
+        return items
+    num_pages = math.ceil(total / len(items))
+    next_page = 2
+    while next_page <= num_pages and not (stop and stop(items)):
+        pages = {}
+
+        async def get_page(page):
+            pages[page] = (await datafn(page_url(url, page)))[key]
+
+        batch = range(next_page, min(next_page + PAGE_BATCH, num_pages + 1))
+        async with anyio.create_task_group() as tg:
+            for page in batch:
+                tg.start_soon(get_page, page)
+        seen = {item["id"] for item in items}
+        for page in batch:
+            for item in pages[page]:
+                if item["id"] not in seen:
+                    seen.add(item["id"])
+                    items.append(item)
+        next_page += PAGE_BATCH
+    return items
+
+
+def past_cutoff(runs):
+    """
+    Have we got runs that are too old to show?  They come newest first.
+
+    They are listed by when they were created, but shown by when they started.
+    A run created long ago can have been re-run recently, up to RERUN_DAYS
+    after it was created.
+
+    """
+    oldest = runs[-1].get("created_at") or runs[-1]["run_started_at"]
+    days_old = (datetime.datetime.now(datetime.timezone.utc) - to_datetime(oldest)).days
+    return days_old > RERUN_DAYS + MAX_DAYS_OLD
+
+
+async def get_events(
+    urls,
+    datafn,
+    only_words,
+    jobs_cache=None,
+    eventsfn=None,
+    history=None,
+    bucketers=None,
+    jobs_wanted=None,
+    timings=None,
+):
+    """
+    Get the events to display.
+
+    Runs and jobs that started within a few seconds of each other are grouped
+    together.  `bucketers` is a RepoBucketers remembering the grouping times
+    from one call to the next.  Times too old to be displayed are forgotten.
+
+    If `jobs_wanted` is provided, it's called with each run, and only the runs
+    it returns true for get their jobs.  The others have an empty list.
+
+    If `eventsfn` is provided, it's called with the events as soon as the runs
+    are known, and again as each run's jobs arrive.  Runs without their jobs
+    yet have None for `jobs`.
+
+    If `history` is a DurationHistory, it learns from the finished jobs, and
+    from the last successful run of each workflow that is still going.  Then
+    it sets an `eta` on the jobs it can predict.
+
+    `timings` is a Timings to record the phases in.
+
+    """
+    if timings is None:
+        timings = NO_TIMINGS
+    runs = []
+
+    async def runs_from_url(url):
+        runs.extend(
+            await get_all_pages(datafn, url, "workflow_runs", stop=past_cutoff)
+        )
 
-        runs.sort(key=run_sort_key, reverse=True)
+    with timings.span("get runs", concurrent=True):
+        async with anyio.create_task_group() as tg:
+            for url in urls:
+                tg.start_soon(runs_from_url, url)
+
+    with timings.span("sort runs"):
+        # In odd situations (duplicate remotes) we can get the same run more than
+        # once. De-duplicate them.
+        runs_by_id = {r["id"]: r for r in runs}
+        runs = [Run.from_json(r) for r in runs_by_id.values()]
+
+        if bucketers is None:
+            bucketers = RepoBucketers(BUCKET_WINDOW)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        bucketers.forget_before(now - datetime.timedelta(days=MAX_DAYS_OLD + 1))
+        runs.sort(
+            key=functools.partial(run_sort_key, bucketers=bucketers), reverse=True
+        )
         run_names_seen = {"Cancel"}
 
         events = []
 
-        for _, g in itertools.groupby(runs, key=run_group_key):
+        group_key = functools.partial(run_group_key, bucketers=bucketers)
+        for _, g in itertools.groupby(runs, key=group_key):
             event_runs = list(g)
-            these_runs_names = {run["name"] for run in event_runs}
+            these_runs_names = {run.name for run in event_runs}
             # If the .yml file couldn't even be parsed, the run name is the
             # name of the .yml file.  Exclude those, or a bad parse will
             # pollute the run list.
@@ -174,18 +382,15 @@ async def get_events(urls, datafn, only_words):
             }
             if not (these_runs_names - run_names_seen):
                 continue
-            days_old = (
-                datetime.datetime.now(datetime.timezone.utc)
-                - event_runs[0]["started_dt"]
-            ).days
-            if days_old > 7:
+            days_old = (now - event_runs[0].started_dt).days
+            if days_old > MAX_DAYS_OLD:
                 continue
 
             if only_words is not None:
                 event_runs = [
                     run
                     for run in event_runs
-                    if any(word in run["name"].lower() for word in only_words)
+                    if any(word in run.name.lower() for word in only_words)
                 ]
                 if not event_runs:
                     continue
@@ -193,23 +398,95 @@ async def get_events(urls, datafn, only_words):
             events.append(event_runs)
             run_names_seen.update(these_runs_names)
 
-            async def load_run(run):
-                jobs = json.loads(await datafn(run["jobs_url"] + "?per_page=100"))["jobs"]
-                for job in jobs:
-                    job["created_dt"] = to_datetime(job["created_at"])
-                run["jobs"] = sorted(jobs, key=job_sort_key)
+    async def fetch_jobs(run):
+        jobs_data = await get_all_pages(datafn, run.jobs_url + "?per_page=100", "jobs")
+        bucketer = bucketers.for_repo(repo_key(run))
+        with timings.span("sort jobs"):
+            jobs = sorted(
+                map(Job.from_json, jobs_data),
+                key=functools.partial(job_sort_key, bucketer=bucketer),
+            )
+        # The runs list and the jobs can disagree for a moment: a finished run
+        # can still have a job in progress.  Only keep jobs that are final.
+        if (
+            jobs_cache is not None
+            and run_is_finished(run)
+            and all(job.status == "completed" for job in jobs)
+        ):
+            jobs_cache.put(run, jobs)
+        if history is not None:
+            history.learn(run, jobs)
+        return jobs
+
+    async def load_run(run):
+        run.jobs = await fetch_jobs(run)
+        if eventsfn is not None:
+            eventsfn(events)
+
+    async def load_history(run):
+        jobs = jobs_cache.get(run) if jobs_cache is not None else None
+        if jobs is None:
+            # fetch_jobs learns from them.
+            await fetch_jobs(run)
+        else:
+            history.learn(run, jobs)
+
+    with timings.span("get jobs", concurrent=True):
+        async with anyio.create_task_group() as tg:
+            if history is not None:
+                for run in history_runs(runs, events):
+                    if jobs_wanted is None or jobs_wanted(run):
+                        tg.start_soon(load_history, run)
+
+            for event_runs in events:
+                for run in event_runs:
+                    if jobs_wanted is not None and not jobs_wanted(run):
+                        run.jobs = []
+                        continue
+                    if jobs_cache is not None and run_is_finished(run):
+                        jobs = jobs_cache.get(run)
+                        if jobs is not None:
+                            run.jobs = jobs
+                            continue
+                    tg.start_soon(load_run, run)
+
+            if eventsfn is not None:
+                eventsfn(events)
+
+    if history is not None:
+        with timings.span("eta"):
+            history.annotate(events)
+    return events
+
 
-            for run in event_runs:
-                nursery.start_soon(load_run, run)
+def history_runs(runs, events):
+    """
+    Find the runs to learn job durations from.
 
-    return events
+    For each unfinished run in `events`, this is the latest successful run of
+    the same workflow before it.
+
+    """
+    shown = {id(run) for event_runs in events for run in event_runs}
+    wanted = {
+        run.name
+        for event_runs in events
+        for run in event_runs
+        if not run_is_finished(run)
+    }
+    for run in runs:
+        if run.name not in wanted or id(run) in shown:
+            continue
+        if run.status == "completed" and run.conclusion == "success":
+            wanted.discard(run.name)
+            yield run
 
 
 def draw_events(events, outfn):
     done = True
     succeeded = True
     for event_runs in events:
-        e = DictAttr(event_runs[0])
+        e = event_runs[0]
         outfn(
             f"[white bold]{e.display_title}[/] "
             + f"{e.head_branch} "
@@ -220,57 +497,64 @@ def draw_events(events, outfn):
             summary, style, icon = summary_style_icon(run)
             if summary not in FINISHED:
                 done = False
-            r = DictAttr(run)
-            run_id = r.html_url.split("/")[-1]
+            run_id = run.html_url.split("/")[-1]
             outfn(
                 "   "
                 + f"[{style}]{icon} {summary:12}[/] "
-                + f"[white bold]{r.name:16}[/] "
-                + f"  [blue link={r.html_url}]view {run_id}[/]"
+                + f"[white bold]{run.name:16}[/] "
+                + f"  [blue link={run.html_url}]view {run_id}[/]"
             )
 
             if summary in NO_JOBS:
                 continue
 
+            if run.jobs is None:
+                # The jobs haven't arrived yet.
+                done = False
+                continue
+
             succeeded = False
-            for job in run["jobs"]:
+            for job in run.jobs:
                 current_step, style, icon = summary_style_icon(job)
                 stepdots = ""
                 if current_step != "success":
-                    if job["status"] == "queued":
+                    if job.status == "queued":
                         current_step = "queued"
                         done = False
                     else:
-                        steps = job["steps"]
+                        steps = job.steps
                         for step in steps:
                             if (
-                                step["status"] == "completed"
-                                and step["conclusion"] == "failure"
+                                step.status == "completed"
+                                and step.conclusion == "failure"
                             ):
-                                current_step = f"failure {step['name']}"
+                                current_step = f"failure {step.name}"
                                 break
-                            if step["status"] == "in_progress":
+                            if step.status == "in_progress":
                                 done = False
                                 stepdots = ""
                                 for s in steps:
                                     ssum = summary_style_icon(s)[0]
                                     stepdots += STEPDOTS.get(ssum, "?")
-                                current_step = f" {step['name']}"
+                                current_step = f" {step.name}"
                                 break
                         else:
                             if steps:
-                                current_step = steps[-1]["name"]
+                                current_step = steps[-1].name
                             elif (
-                                job["status"] == "completed"
-                                and job["conclusion"] == "skipped"
+                                job.status == "completed"
+                                and job.conclusion == "skipped"
                             ):
                                 current_step = "skipped"
 
-                j = DictAttr(job)
+                eta = ""
+                if job.eta is not None and job.status == "in_progress":
+                    eta = f" [dim]{nice_eta(job.eta)}[/]"
+
                 outfn(
                     "      "
-                    + f"{j.name:30} [{style}]{icon}[/] "
-                    + f"{stepdots}[{style}]{current_step}[/]"
+                    + f"{job.name:30} [{style}]{icon}[/] "
+                    + f"{stepdots}[{style}]{current_step}[/]{eta}"
                 )
 
     return done, succeeded
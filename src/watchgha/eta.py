@@ -0,0 +1,131 @@
+"""
+Predict when jobs will finish, from how long they took before.
+"""
+
+import collections
+import datetime
+
+from .jobs_cache import repo_key
+
+
+# How many jobs to remember having learned from.
+MAX_LEARNED = 10_000
+
+
+class DurationHistory:
+    """
+    How long jobs and their steps took in successful runs of a workflow.
+
+    Durations are keyed by (repo, workflow name, job name) for jobs, and
+    (repo, workflow name, job name, step name) for steps.  The average of what we've
+    seen is used to predict how long they will take next time.
+
+    """
+
+    def __init__(self):
+        # Map keys to (total seconds, count).
+        self.totals = {}
+        # Ids of jobs we've already learned from, oldest first.
+        self.learned = collections.OrderedDict()
+
+    def add(self, key, secs):
+        total, count = self.totals.get(key, (0.0, 0))
+        self.totals[key] = (total + secs, count + 1)
+
+    def mean(self, key):
+        """The average duration for `key`, or None if we've never seen it."""
+        total_count = self.totals.get(key)
+        if total_count is None:
+            return None
+        total, count = total_count
+        return total / count
+
+    def learn(self, run, jobs):
+        """Remember the durations of the successful jobs and steps in `jobs`."""
+        for job in jobs:
+            if job.conclusion != "success" or job.id in self.learned:
+                continue
+            secs = elapsed(job)
+            if secs is None:
+                continue
+            self.learned[job.id] = None
+            if len(self.learned) > MAX_LEARNED:
+                self.learned.popitem(last=False)
+            job_key = (repo_key(run), run.name, job.name)
+            self.add(job_key, secs)
+            for step in job.steps:
+                secs = elapsed(step)
+                if step.conclusion == "success" and secs is not None:
+                    self.add((*job_key, step.name), secs)
+
+    def predict(self, run, job, now):
+        """
+        Predict when an in-progress `job` will finish, as a datetime.
+
+        Returns None if we have no idea.
+
+        """
+        if job.status != "in_progress":
+            return None
+        job_key = (repo_key(run), run.name, job.name)
+        remaining = 0.0
+        for step in job.steps:
+            if step.status == "completed":
+                continue
+            mean = self.mean((*job_key, step.name))
+            if mean is None:
+                break
+            if step.status == "in_progress" and step.started_dt is not None:
+                mean -= (now - step.started_dt).total_seconds()
+            remaining += max(mean, 0)
+        else:
+            if job.steps:
+                return now + datetime.timedelta(seconds=remaining)
+
+        # We don't know all of the steps, use the job as a whole.
+        mean = self.mean(job_key)
+        if mean is None or job.started_dt is None:
+            return None
+        return job.started_dt + datetime.timedelta(seconds=mean)
+
+    def annotate(self, events, now=None):
+        """Set the `eta` datetime on the in-progress jobs we can predict."""
+        if now is None:
+            now = datetime.datetime.now(datetime.timezone.utc)
+        for runs in events:
+            for run in runs:
+                for job in run.jobs or ():
+                    job.eta = self.predict(run, job, now)
+
+
+def elapsed(data):
+    """How many seconds a job or step took, or None if we can't tell."""
+    if data.started_dt is None or data.completed_dt is None:
+        return None
+    return (data.completed_dt - data.started_dt).total_seconds()
+
+
+def next_transition(events):
+    """
+    When do we next expect something to change in `events`?
+
+    Returns a time.time() timestamp, or None if there are unfinished runs or
+    jobs we can't predict, since they could change at any moment.
+
+    """
+    soonest = None
+    for runs in events:
+        for run in runs:
+            if run.status == "completed":
+                continue
+            if run.jobs is None:
+                return None
+            for job in run.jobs:
+                if job.status == "completed":
+                    continue
+                eta = job.eta
+                if eta is None:
+                    return None
+                if soonest is None or eta < soonest:
+                    soonest = eta
+    return soonest.timestamp() if soonest is not None else None
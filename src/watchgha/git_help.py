@@ -1,27 +1,184 @@
 """
 Get information from local git.
+
+All we need are the remote URLs and the current branch, which are easy to read
+from .git/config and .git/HEAD.  That's much faster than importing dulwich and
+opening the repo with it, which matters for a command run from shell prompts
+and aliases.  If the files are anything we don't understand, dulwich is used
+instead.
+
 """
 
 import functools
+import os
+import re
+
+
+class GitFastPathError(Exception):
+    """The git files are too unusual for us to read, so use dulwich."""
+
+
+def git_dirs(dir):
+    """
+    Find the git directory for a work tree at `dir`.
+
+    Returns (git_dir, common_dir).  In a linked worktree (or a submodule),
+    .git is a file pointing to the git directory.  A worktree's git directory
+    has its own HEAD, but shares config and branches with the main repo in the
+    common directory.
+
+    """
+    dot_git = os.path.join(dir, ".git")
+    if os.path.isdir(dot_git):
+        git_dir = dot_git
+    elif os.path.isfile(dot_git):
+        with open(dot_git) as f:
+            text = f.read().strip()
+        if not text.startswith("gitdir:"):
+            raise GitFastPathError(f"Don't understand {dot_git}")
+        git_dir = os.path.join(dir, text.removeprefix("gitdir:").strip())
+    else:
+        raise GitFastPathError(f"No .git in {dir}")
+
+    common_dir = git_dir
+    commondir_file = os.path.join(git_dir, "commondir")
+    if os.path.exists(commondir_file):
+        with open(commondir_file) as f:
+            common_dir = os.path.join(git_dir, f.read().strip())
+    return git_dir, common_dir
+
+
+CONFIG_SECTION = re.compile(r'\[\s*([-.\w]+)(?:\s+"((?:[^"\\]|\\.)*)")?\s*\]')
+CONFIG_KEY = re.compile(r"([A-Za-z][-A-Za-z0-9]*)\s*(?:=\s*(.*))?")
+
 
-import dulwich.porcelain
-import dulwich.repo
+def parse_config_value(text):
+    """Parse the value of a config line: quotes, escapes, and comments."""
+    value = []
+    in_quotes = False
+    chars = iter(text)
+    for c in chars:
+        if c == "\\":
+            c = next(chars, "")
+            if c not in {"\\", '"', "n", "t", "b"}:
+                raise GitFastPathError(f"Don't understand escape in {text!r}")
+            value.append({"n": "\n", "t": "\t", "b": "\b"}.get(c, c))
+        elif c == '"':
+            in_quotes = not in_quotes
+        elif c in "#;" and not in_quotes:
+            break
+        else:
+            value.append(c)
+    if in_quotes:
+        raise GitFastPathError(f"Unbalanced quotes in {text!r}")
+    return "".join(value).strip()
+
+
+def parse_config(text):
+    """
+    Parse git config `text` into {(section, subsection): {key: [values]}}.
+
+    Section and key names are lowercased, as git treats them.
+
+    """
+    config = {}
+    values = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line[0] in "#;":
+            continue
+        if line.endswith("\\"):
+            raise GitFastPathError("Continued lines aren't supported")
+        if line.startswith("["):
+            m = CONFIG_SECTION.match(line)
+            if m is None or line[m.end() :].strip()[:1] not in {"", "#", ";"}:
+                raise GitFastPathError(f"Don't understand config line {line!r}")
+            section = m[1].lower()
+            if "." in section:
+                raise GitFastPathError(f"Old-style section name: {line!r}")
+            if section in {"include", "includeif"}:
+                raise GitFastPathError("Config includes aren't supported")
+            subsection = re.sub(r"\\(.)", r"\1", m[2]) if m[2] is not None else None
+            values = config.setdefault((section, subsection), {})
+        else:
+            m = CONFIG_KEY.fullmatch(line)
+            if m is None or values is None:
+                raise GitFastPathError(f"Don't understand config line {line!r}")
+            value = parse_config_value(m[2]) if m[2] is not None else "true"
+            values.setdefault(m[1].lower(), []).append(value)
+    return config
+
+
+def read_remote_urls(dir):
+    """Read the remote URLs from the config file, as a list."""
+    _, common_dir = git_dirs(dir)
+    with open(os.path.join(common_dir, "config")) as f:
+        config = parse_config(f.read())
+    urls = []
+    for (section, _), values in config.items():
+        if section == "remote" and "url" in values:
+            urls.append(values["url"][-1])
+    return urls
+
+
+def read_branch(dir):
+    """
+    Read the current branch from HEAD.
+
+    A branch can be a symbolic ref to another branch, so follow loose refs
+    until one isn't symbolic.  Packed refs are never symbolic, so a branch
+    that is only in packed-refs ends the chain.
+
+    """
+    git_dir, common_dir = git_dirs(dir)
+    path = os.path.join(git_dir, "HEAD")
+    ref = None
+    for _ in range(5):
+        try:
+            with open(path) as f:
+                text = f.read().strip()
+        except FileNotFoundError:
+            if ref is None:
+                raise
+            break
+        if not text.startswith("ref:"):
+            if ref is None:
+                raise GitFastPathError("HEAD is detached")
+            break
+        ref = text.removeprefix("ref:").strip()
+        path = os.path.join(common_dir, *ref.split("/"))
+    else:
+        raise GitFastPathError("Symbolic refs nested too deeply")
+    if not ref.startswith("refs/heads/"):
+        raise GitFastPathError(f"HEAD isn't a branch: {ref}")
+    return ref.removeprefix("refs/heads/")
 
 
 @functools.lru_cache(maxsize=10)
 def _dulwich_repo(dir="."):
+    import dulwich.repo
+
     return dulwich.repo.Repo(dir)
 
 
 def git_repo_urls(dir):
     """Find all the remote URLs for a git repo at `dir`."""
-    config = _dulwich_repo(dir).get_config()
-    for section in config.sections():
-        if section[0] == b"remote":
-            url = config.get(section, "url").decode()
-            yield url
+    try:
+        yield from read_remote_urls(dir)
+    except (GitFastPathError, OSError, UnicodeDecodeError):
+        config = _dulwich_repo(dir).get_config()
+        for section in config.sections():
+            if section[0] == b"remote":
+                url = config.get(section, "url").decode()
+                yield url
 
 
 def git_branch(dir):
     """Get the current git branch name."""
+    try:
+        return read_branch(dir)
+    except (GitFastPathError, OSError, UnicodeDecodeError):
+        pass
+    import dulwich.porcelain
+
     return dulwich.porcelain.active_branch(_dulwich_repo(dir)).decode()
@@ -0,0 +1,223 @@
+"""
+Get run and job data from the GitHub GraphQL API.
+
+The REST API needs one request for the runs, and then one request per run for
+its jobs.  GraphQL can get the check suites (runs), check runs (jobs), and
+their steps for a commit in one query.  GraphQLData translates them into the
+same shapes the REST API returns, so get_events can use them unchanged.
+
+Only the runs for the commit at the tip of the branch (or the --sha commit) are
+found this way.  GraphQL always needs authentication.  It doesn't tell us the
+attempt number of a run, so the runs' "run_attempt" is None.
+
+"""
+
+import os
+import re
+import urllib.parse
+
+from .utils import WatchGhaError
+
+
+CHECK_RUN_FIELDS = """\
+fragment checkRunFields on CheckRun {
+  databaseId
+  name
+  status
+  conclusion
+  startedAt
+  completedAt
+  steps(first: 100) {
+    pageInfo { hasNextPage }
+    nodes { name number status conclusion startedAt completedAt }
+  }
+}
+"""
+
+QUERY = """\
+query($owner: String!, $name: String!, $expr: String!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    object(expression: $expr) {
+      ... on Commit {
+        oid
+        messageHeadline
+        checkSuites(first: 50, after: $after) {
+          pageInfo { hasNextPage endCursor }
+          nodes {
+            id
+            status
+            conclusion
+            createdAt
+            branch { name }
+            workflowRun {
+              databaseId
+              url
+              event
+              createdAt
+              workflow { name }
+            }
+            checkRuns(first: 100) {
+              pageInfo { hasNextPage endCursor }
+              nodes { ...checkRunFields }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+""" + CHECK_RUN_FIELDS
+
+# For a suite with more check runs than fit in QUERY.
+CHECK_RUNS_QUERY = """\
+query($id: ID!, $after: String) {
+  node(id: $id) {
+    ... on CheckSuite {
+      checkRuns(first: 100, after: $after) {
+        pageInfo { hasNextPage endCursor }
+        nodes { ...checkRunFields }
+      }
+    }
+  }
+}
+""" + CHECK_RUN_FIELDS
+
+
+def graphql_url(api_url):
+    """The GraphQL endpoint that goes with a REST API URL."""
+    url = os.getenv("GITHUB_GRAPHQL_URL")
+    if url:
+        return url
+    if api_url.endswith("/api/v3"):
+        # GitHub Enterprise Server.
+        return api_url[: -len("/v3")] + "/graphql"
+    return api_url + "/graphql"
+
+
+def lower(value):
+    return value.lower() if value else value
+
+
+class GraphQLData:
+    """
+    A datafn that uses GraphQL instead of the REST API.
+
+    Use `get_json` as the datafn.  For a runs URL, it makes a GraphQL query,
+    and remembers the jobs it got.  Requests for the jobs URLs are then
+    answered from those, without any request at all.
+
+    """
+
+    def __init__(self, http):
+        self.http = http
+        self.jobs = {}
+
+    async def get_json(self, url):
+        base_url = url.partition("?")[0]
+        if base_url in self.jobs:
+            jobs = self.jobs[base_url]
+            return {"total_count": len(jobs), "jobs": jobs}
+        m = re.fullmatch(r"(.*)/repos/([^/]+)/([^/]+)/actions/runs", base_url)
+        if m is None:
+            raise WatchGhaError(f"Can't use GraphQL for {url!r}")
+        api_url, owner, name = m.groups()
+        params = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+        if "head_sha" in params:
+            expr = params["head_sha"][0]
+        else:
+            expr = "refs/heads/" + params["branch"][0]
+        return await self.get_runs(graphql_url(api_url), owner, name, expr)
+
+    async def query(self, endpoint, query, variables):
+        """Make a GraphQL query, and return its data."""
+        data = await self.http.post_json(
+            endpoint, {"query": query, "variables": variables}
+        )
+        if data.get("errors"):
+            msgs = "\n".join(err["message"] for err in data["errors"])
+            raise WatchGhaError(f"GraphQL query failed:\n{msgs}")
+        return data["data"]
+
+    async def get_runs(self, endpoint, owner, name, expr):
+        """Get the workflow runs for `expr` in the repo, as the REST API would."""
+        runs = []
+        after = None
+        while True:
+            variables = {"owner": owner, "name": name, "expr": expr, "after": after}
+            data = await self.query(endpoint, QUERY, variables)
+            commit = (data["repository"] or {}).get("object")
+            if not commit:
+                break
+            suites = commit["checkSuites"]
+            for suite in suites["nodes"]:
+                if suite["workflowRun"] is not None:
+                    check_runs = await self.get_check_runs(endpoint, suite)
+                    runs.append(self.run_from_suite(commit, suite, check_runs))
+            if not suites["pageInfo"]["hasNextPage"]:
+                break
+            after = suites["pageInfo"]["endCursor"]
+        return {"total_count": len(runs), "workflow_runs": runs}
+
+    async def get_check_runs(self, endpoint, suite):
+        """All the check runs of a suite, with more queries if there are many."""
+        check_runs = suite["checkRuns"]
+        nodes = list(check_runs["nodes"])
+        while check_runs["pageInfo"]["hasNextPage"]:
+            variables = {"id": suite["id"], "after": check_runs["pageInfo"]["endCursor"]}
+            data = await self.query(endpoint, CHECK_RUNS_QUERY, variables)
+            check_runs = data["node"]["checkRuns"]
+            nodes.extend(check_runs["nodes"])
+        return nodes
+
+    def run_from_suite(self, commit, suite, check_runs):
+        """Make a REST-style run from a GraphQL check suite."""
+        wfrun = suite["workflowRun"]
+        jobs_url = f"graphql:{wfrun['databaseId']}/jobs"
+        jobs = [
+            self.job_from_check_run(check_run, suite)
+            for check_run in check_runs
+        ]
+        self.jobs[jobs_url] = jobs
+        return {
+            "id": wfrun["databaseId"],
+            "name": wfrun["workflow"]["name"],
+            "display_title": commit["messageHeadline"],
+            "head_branch": (suite["branch"] or {}).get("name", ""),
+            "head_sha": commit["oid"],
+            "event": lower(wfrun["event"]),
+            "status": lower(suite["status"]),
+            "conclusion": lower(suite["conclusion"]),
+            # GraphQL doesn't tell us the attempt number.
+            "run_attempt": None,
+            "run_started_at": wfrun["createdAt"],
+            "html_url": wfrun["url"],
+            "jobs_url": jobs_url,
+        }
+
+    def job_from_check_run(self, check_run, suite):
+        """Make a REST-style job from a GraphQL check run."""
+        if check_run["steps"]["pageInfo"]["hasNextPage"]:
+            raise WatchGhaError(
+                f"Job {check_run['name']!r} has more than 100 steps, "
+                + "too many for --graphql"
+            )
+        return {
+            "id": check_run["databaseId"],
+            "name": check_run["name"],
+            "status": lower(check_run["status"]),
+            "conclusion": lower(check_run["conclusion"]),
+            "created_at": check_run["startedAt"] or suite["createdAt"],
+            "started_at": check_run["startedAt"],
+            "completed_at": check_run["completedAt"],
+            "steps": [
+                {
+                    "name": step["name"],
+                    "number": step["number"],
+                    "status": lower(step["status"]),
+                    "conclusion": lower(step["conclusion"]),
+                    "started_at": step["startedAt"],
+                    "completed_at": step["completedAt"],
+                }
+                for step in check_run["steps"]["nodes"]
+            ],
+        }
@@ -2,17 +2,161 @@
 Helper for getting data from URLs.
 """
 
+import collections
+import datetime
 import itertools
+import json
 import mimetypes
 import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Optional
 
+import anyio
 import httpx
-import trio
 
-from .utils import WatchGhaError
+from .timings import NO_TIMINGS, HttpTrace
+from .utils import WatchGhaError, nice_time_ts
 
 
-RETRY_STATUS_CODES = {502}
+# Server errors that are usually temporary, and worth trying again.
+RETRY_STATUS_CODES = {502, 503, 504}
+
+# How many times to try a request before giving up.
+MAX_TRIES = 4
+
+# The backoff before the first retry of an error, in seconds.  It doubles for
+# each retry after that, and is jittered.
+RETRY_BACKOFF = 0.25
+
+# How long an idle pooled connection is kept open, in seconds.
+KEEPALIVE_EXPIRY = 60
+
+# The longest we'll wait for a rate limit to clear before giving up, in seconds.
+MAX_RATE_LIMIT_WAIT = 5 * 60
+
+# How many responses to keep for conditional requests.
+MAX_CACHE_ENTRIES = 1000
+
+
+class CacheEntry:
+    """A response we can revalidate with a conditional request."""
+
+    def __init__(self, text, etag=None, last_modified=None):
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self._json = None
+
+    @property
+    def json(self):
+        """The parsed JSON of the response, only parsed once."""
+        if self._json is None:
+            self._json = json.loads(self.text)
+        return self._json
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    # Requests that shared a response already in flight for the same URL.
+    shared: int = 0
+
+    def __str__(self):
+        text = f"HTTP cache: {self.hits} hits, {self.misses} misses"
+        if self.shared:
+            text += f", {self.shared} shared"
+        return text
+
+
+class Flight:
+    """A request in progress, that others can wait for."""
+
+    def __init__(self):
+        self.done = anyio.Event()
+        self.result = None
+        self.error = None
+
+
+def retry_backoff(ntry):
+    """
+    How long to wait before retrying an error, after try number `ntry`.
+
+    The wait is jittered, so that many requests failing at once don't all
+    retry at the same moment.
+
+    """
+    backoff = RETRY_BACKOFF * 2**ntry
+    return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+@dataclass
+class RateLimit:
+    """What GitHub has told us about our API rate limit."""
+
+    limit: Optional[int] = None
+    remaining: Optional[int] = None
+    # When the limit resets, as a time.time() value.
+    reset: Optional[float] = None
+    # If we've been told to back off, when we can try again.
+    blocked_until: float = 0
+    # How many requests we've made that count against the limit.
+    num_charged: int = 0
+
+    def update(self, resp):
+        """Update from the headers of a response."""
+        headers = resp.headers
+        if "x-ratelimit-remaining" in headers:
+            self.limit = int(headers.get("x-ratelimit-limit", self.limit or 0))
+            self.remaining = int(headers["x-ratelimit-remaining"])
+            self.reset = float(headers.get("x-ratelimit-reset", self.reset or 0))
+        if resp.status_code != 304:
+            # Conditional requests answered with 304 don't count.
+            self.num_charged += 1
+
+    def retry_wait(self, resp):
+        """
+        If `resp` says we hit a rate limit, return how many seconds to wait
+        before trying again.  Otherwise, return None.
+        """
+        if resp.status_code not in (403, 429):
+            return None
+        now = time.time()
+        if "retry-after" in resp.headers:
+            wait = float(resp.headers["retry-after"])
+        elif resp.headers.get("x-ratelimit-remaining") == "0" and self.reset:
+            wait = self.reset - now
+        elif resp.status_code == 429 or "rate limit" in resp.text.lower():
+            # A secondary rate limit with no advice: GitHub says to wait at
+            # least a minute.
+            wait = 60
+        else:
+            # A 403 that isn't about rate limits.
+            return None
+        wait = max(wait, 1)
+        self.blocked_until = max(self.blocked_until, now + wait)
+        return wait
+
+    def describe(self):
+        """A short human description of the rate limit, or "" if unknown."""
+        if self.remaining is None:
+            return ""
+        text = f"GitHub API: {self.remaining:,} of {self.limit:,} requests left"
+        if self.reset:
+            text += f", resets @{nice_time_ts(self.reset)}"
+        if self.blocked_until > time.time():
+            text += f", rate limited until @{nice_time_ts(self.blocked_until)}"
+        return text
 
 
 class Http:
@@ -21,18 +165,47 @@ class Http:
 
     Uses the GITHUB_TOKEN environment variable (if set) as authentication.
 
+    One httpx client is shared by all requests, so connections are pooled and
+    kept alive between polls.  Call `aclose` when done with it.
+
+    Responses with an ETag or Last-Modified header are remembered, and
+    re-requested conditionally.  GitHub answers with a 304 if nothing has
+    changed, and 304's don't count against the rate limit.  `stats` counts
+    the hits and misses.
+
+    At most `max_requests` requests are made at once, however many connections
+    there are, so a branch with many runs doesn't set off GitHub's secondary
+    rate limits.  Concurrent GETs of the same URL share one request.
+
+    `rate_limit` tracks GitHub's rate limit headers.  If we are told to back
+    off, we wait as long as we are asked to, up to MAX_RATE_LIMIT_WAIT, and new
+    requests wait too.  Bad gateways and dropped connections are retried with
+    a jittered exponential backoff.
+
     Define SAVE_DATA=1 in the environment to save retrieved data in get_*.*
-    files.
+    files, listed in get_index.txt with when they were requested and how long
+    they took.  ReplayData can play them back.
+
+    `timings` is a Timings to record each request in.
 
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        http2=False,
+        max_connections=10,
+        max_requests=10,
+        transport=None,
+        timings=None,
+    ):
         # $set_env.py: SAVE_DATA - save all fetched data to get_* files.
         self.save = bool(int(os.environ.get("SAVE_DATA", "0")))
         if self.save:
+            now = datetime.datetime.now(datetime.timezone.utc)
             with open("get_index.txt", "w") as index:
-                index.write("# URLs fetched:\n")
+                index.write(f"# URLs fetched, starting at {now.isoformat()}:\n")
             self.count = itertools.count()
+            self.save_start = time.monotonic()
         self.auth = None
         self.headers = {}
         token = os.environ.get("GITHUB_TOKEN", "")
@@ -43,62 +216,215 @@ class Http:
                 self.auth = httpx.NetRCAuth()
             except FileNotFoundError:
                 self.auth = None
-
-    async def get_data(self, url):
-        async with httpx.AsyncClient(auth=self.auth) as client:
-            resp = None
+        if http2:
             try:
-                for ntry in range(3):
-                    resp = await client.get(
-                        url,
-                        headers=self.headers,
-                        timeout=30,
-                        follow_redirects=True,
-                    )
-                    if resp.status_code not in RETRY_STATUS_CODES:
-                        break
-                    await trio.sleep(0.05 * 2**ntry)
-                resp.raise_for_status()
-            except httpx.HTTPError as e:
-                # Some error messages have the URL, and some don't.  Add it in
-                # if it isn't there already.
-                if len(url) > 10 and url in str(e):
-                    msg = str(e)
+                import h2  # noqa: F401
+            except ImportError:
+                raise WatchGhaError(
+                    "HTTP/2 needs the h2 package: pip install watchgha[http2]"
+                ) from None
+        self.http2 = http2
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        )
+        self.transport = transport
+        self.client = None
+        self.max_requests = max_requests
+        self.limiter = None
+        # GETs in progress: url -> Flight.
+        self.in_flight = {}
+        self.cache = collections.OrderedDict()
+        self.stats = CacheStats()
+        self.rate_limit = RateLimit()
+        self.timings = timings if timings is not None else NO_TIMINGS
+
+    def get_client(self):
+        """
+        Get the one client used for all requests, creating it if needed.
+
+        It's created in the event loop that will use it, with the limiter
+        on how many requests it makes at once.
+
+        """
+        if self.client is None:
+            self.limiter = anyio.CapacityLimiter(self.max_requests)
+            self.client = httpx.AsyncClient(
+                auth=self.auth,
+                headers=self.headers,
+                timeout=30,
+                follow_redirects=True,
+                http2=self.http2,
+                limits=self.limits,
+                transport=self.transport,
+            )
+        return self.client
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def _request(self, method, url, ok_statuses=(), **kwargs):
+        """
+        Make a request, retrying errors that might be temporary.
+
+        Statuses in `ok_statuses` are accepted, others raise WatchGhaError.
+
+        """
+        client = self.get_client()
+        blocked = self.rate_limit.blocked_until - time.time()
+        if blocked > 0:
+            # Another request was told to back off, so this one should too.
+            await anyio.sleep(min(blocked, MAX_RATE_LIMIT_WAIT))
+        resp = None
+        try:
+            for ntry in range(MAX_TRIES):
+                resp = None
+                try:
+                    async with self.limiter:
+                        if self.timings.enabled:
+                            resp = await self._timed_request(
+                                client, method, url, ntry, kwargs
+                            )
+                        else:
+                            resp = await client.request(method, url, **kwargs)
+                except httpx.TransportError:
+                    if ntry == MAX_TRIES - 1:
+                        raise
+                    wait = retry_backoff(ntry)
                 else:
-                    msg = f"Couldn't get {url!r}: {e}"
-                if resp is not None:
-                    try:
-                        for label, text in resp.json().items():
-                            msg += f"\n{label}: {text}"
-                    except Exception:
-                        msg += f"\n{resp.text}"
-                raise WatchGhaError(msg) from e
-            data = resp.text
-            if self.save:
-                ext = extension_for_content(resp)
-                filename = f"get_{next(self.count):03d}{ext}"
-                async with await trio.open_file("get_index.txt", "a") as index:
-                    await index.write(f"{filename}: {url}\n")
-                async with await trio.open_file(filename, "w") as out:
-                    await out.write(data)
-            return data
+                    self.rate_limit.update(resp)
+                    if resp.status_code in RETRY_STATUS_CODES:
+                        wait = retry_backoff(ntry)
+                    else:
+                        wait = self.rate_limit.retry_wait(resp)
+                        if wait is None or wait > MAX_RATE_LIMIT_WAIT:
+                            break
+                if ntry == MAX_TRIES - 1:
+                    break
+                self.timings.retried()
+                await anyio.sleep(wait)
+            if resp.status_code not in ok_statuses:
+                resp.raise_for_status()
+        except httpx.HTTPError as e:
+            # Some error messages have the URL, and some don't.  Add it in
+            # if it isn't there already.
+            if len(url) > 10 and url in str(e):
+                msg = str(e)
+            else:
+                msg = f"Couldn't get {url!r}: {e}"
+            if resp is not None:
+                try:
+                    for label, text in resp.json().items():
+                        msg += f"\n{label}: {text}"
+                except Exception:
+                    msg += f"\n{resp.text}"
+            raise WatchGhaError(msg) from e
+        return resp
 
+    async def _timed_request(self, client, method, url, ntry, kwargs):
+        """Make one request, recording it in our timings."""
+        trace = HttpTrace()
+        start = time.perf_counter()
+        resp = await client.request(method, url, extensions={"trace": trace}, **kwargs)
+        self.timings.request(
+            url,
+            start,
+            resp.status_code,
+            len(resp.content),
+            attempt=ntry + 1,
+            stages=trace.stages,
+        )
+        return resp
 
-def extension_for_content(response):
-    content_type = response.headers["content-type"].partition(";")[0].strip()
-    return mimetypes.guess_extension(content_type)
+    async def _get_entry(self, url):
+        started = time.monotonic()
+        entry = self.cache.get(url)
+        if entry is not None:
+            resp = await self._request(
+                "GET", url, ok_statuses={304}, headers=entry.conditional_headers()
+            )
+        else:
+            resp = await self._request("GET", url)
 
+        if resp.status_code == 304:
+            self.stats.hits += 1
+            self.cache.move_to_end(url)
+        else:
+            self.stats.misses += 1
+            entry = CacheEntry(
+                resp.text,
+                etag=resp.headers.get("etag"),
+                last_modified=resp.headers.get("last-modified"),
+            )
+            if entry.etag or entry.last_modified:
+                self.cache[url] = entry
+                self.cache.move_to_end(url)
+                if len(self.cache) > MAX_CACHE_ENTRIES:
+                    self.cache.popitem(last=False)
 
-_get_data = Http().get_data
+        if self.save:
+            ext = extension_for_content(resp)
+            filename = f"get_{next(self.count):03d}{ext}"
+            at = started - self.save_start
+            took = time.monotonic() - started
+            async with await anyio.open_file("get_index.txt", "a") as index:
+                await index.write(f"{filename}: {url} (at {at:.3f}s, took {took:.3f}s)\n")
+            async with await anyio.open_file(filename, "w") as out:
+                await out.write(entry.text)
+        return entry
 
+    async def get_entry(self, url):
+        """Get the CacheEntry for `url`, sharing a request already in flight."""
+        flight = self.in_flight.get(url)
+        while flight is not None:
+            await flight.done.wait()
+            if flight.error is not None:
+                self.stats.shared += 1
+                raise WatchGhaError(str(flight.error))
+            if flight.result is not None:
+                self.stats.shared += 1
+                return flight.result
+            # Whoever made the request was cancelled, which says nothing about
+            # the URL.  Make the request ourselves, unless someone else is.
+            flight = self.in_flight.get(url)
 
-async def get_data(*args, **kwargs):
-    """Run get_data three times, with retry."""
-    # I don't like that this has a retry loop and get_data above also does.
-    for ntry in range(3):
+        flight = self.in_flight[url] = Flight()
         try:
-            return await _get_data(*args, **kwargs)
+            flight.result = await self._get_entry(url)
+            return flight.result
         except Exception as exc:
-            exc_to_raise = exc
-            await trio.sleep(0.05 * 2**ntry)
-    raise exc_to_raise
+            flight.error = exc
+            raise
+        finally:
+            del self.in_flight[url]
+            flight.done.set()
+
+    async def get_data(self, url):
+        """Get the text of `url`."""
+        return (await self.get_entry(url)).text
+
+    async def get_json(self, url):
+        """
+        Get the parsed JSON data from `url`.
+
+        If the response hasn't changed, the same parsed data is returned as the
+        last time.
+
+        """
+        entry = await self.get_entry(url)
+        with self.timings.span("parse"):
+            return entry.json
+
+    async def post_json(self, url, data):
+        """POST `data` as JSON to `url`, and return the parsed JSON response."""
+        return (await self._request("POST", url, json=data)).json()
+
+
+def extension_for_content(response):
+    # A 304 response has no content-type, but it's a re-use of JSON.
+    content_type = response.headers.get("content-type", "application/json")
+    content_type = content_type.partition(";")[0].strip()
+    return mimetypes.guess_extension(content_type)
@@ -0,0 +1,199 @@
+"""
+Remember the jobs of runs that have finished.
+"""
+
+import collections
+import json
+import os
+import sqlite3
+import time
+
+from .model import Job
+from .utils import user_cache_dir
+
+
+# How big the on-disk cache can get before old entries are evicted.
+MAX_DISK_CACHE_BYTES = 20_000_000
+
+# The format of the jobs in the database.  Change it when Job.to_json changes,
+# and jobs stored in other formats are discarded.
+DISK_FORMAT = 1
+
+# How many runs' jobs to keep in memory.
+MAX_MEMORY_ENTRIES = 1000
+
+
+def repo_key(run):
+    """The repo a run belongs to, including the server: https://github.com/o/r"""
+    return run.html_url.partition("/actions/runs/")[0]
+
+
+def run_key(run):
+    """The key identifying one attempt of a run."""
+    return (repo_key(run), run.id, run.run_attempt)
+
+
+class JobsCache:
+    """
+    The jobs of finished runs, for the length of a session.
+
+    A finished run's jobs will never change, so once we've seen them, we don't
+    need to fetch them again.  Re-running a workflow makes a new attempt of the
+    run, which has a different key.  Runs without an attempt number (from
+    GraphQL) can't be told apart from their re-runs, so aren't kept.
+
+    Only the `max_entries` most recently used runs are kept.
+
+    """
+
+    def __init__(self, max_entries=MAX_MEMORY_ENTRIES):
+        self.jobs = collections.OrderedDict()
+        self.max_entries = max_entries
+
+    def get(self, run):
+        """Get the jobs for `run`, or None if we don't have them."""
+        key = run_key(run)
+        jobs = self.jobs.get(key)
+        if jobs is not None:
+            self.jobs.move_to_end(key)
+        return jobs
+
+    def put(self, run, jobs):
+        """Remember the jobs for `run`, which has finished."""
+        if run.run_attempt is not None:
+            self.remember(run_key(run), jobs)
+
+    def remember(self, key, jobs):
+        self.jobs[key] = jobs
+        self.jobs.move_to_end(key)
+        if len(self.jobs) > self.max_entries:
+            self.jobs.popitem(last=False)
+
+    def close(self):
+        pass
+
+
+class DiskJobsCache(JobsCache):
+    """
+    A JobsCache that also keeps the jobs in a SQLite database, so that they
+    are remembered from one invocation to the next.
+
+    When the database grows past `max_bytes`, the least recently used entries
+    are evicted.  The database's user_version is the DISK_FORMAT of the jobs
+    in it.
+
+    """
+
+    def __init__(self, path=None, max_bytes=MAX_DISK_CACHE_BYTES):
+        super().__init__()
+        if path is None:
+            path = os.path.join(user_cache_dir(), "jobs.sqlite")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(path, timeout=5, isolation_level=None)
+        (disk_format,) = self.db.execute("pragma user_version").fetchone()
+        if disk_format != DISK_FORMAT:
+            self.db.execute("drop table if exists jobs")
+            self.db.execute(f"pragma user_version = {DISK_FORMAT}")
+        self.db.execute(
+            "create table if not exists jobs ("
+            + "repo text, run_id integer, attempt integer, "
+            + "jobs text, size integer, used real, "
+            + "primary key (repo, run_id, attempt))"
+        )
+
+    def get(self, run):
+        jobs = super().get(run)
+        if jobs is None and self.db is not None:
+            try:
+                jobs = self.load(run)
+            except sqlite3.Error:
+                self.stop_using_disk()
+        return jobs
+
+    def load(self, run):
+        """Get the jobs for `run` from the database, or None."""
+        key = run_key(run)
+        row = self.db.execute(
+            "select jobs from jobs where repo = ? and run_id = ? and attempt = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+        jobs = _load_jobs(row[0])
+        self.db.execute(
+            "update jobs set used = ? where repo = ? and run_id = ? and attempt = ?",
+            (time.time(), *key),
+        )
+        self.remember(key, jobs)
+        return jobs
+
+    def put(self, run, jobs):
+        if run.run_attempt is None:
+            return
+        super().put(run, jobs)
+        if self.db is not None:
+            try:
+                self.save(run, jobs)
+            except sqlite3.Error:
+                self.stop_using_disk()
+
+    def save(self, run, jobs):
+        """Write the jobs for `run` to the database."""
+        text = _dump_jobs(jobs)
+        self.db.execute(
+            "insert or replace into jobs values (?, ?, ?, ?, ?, ?)",
+            (*run_key(run), text, len(text), time.time()),
+        )
+        self.evict()
+
+    def stop_using_disk(self):
+        """
+        The database failed (locked by another watcher too long, corrupt, disk
+        full): keep going with just the memory cache.
+        """
+        try:
+            self.db.close()
+        except sqlite3.Error:
+            pass
+        self.db = None
+
+    def evict(self):
+        """Delete the least recently used entries if we're too big."""
+        (total,) = self.db.execute("select coalesce(sum(size), 0) from jobs").fetchone()
+        if total <= self.max_bytes:
+            return
+        to_delete = []
+        for repo, run_id, attempt, size in self.db.execute(
+            "select repo, run_id, attempt, size from jobs order by used"
+        ).fetchall():
+            to_delete.append((repo, run_id, attempt))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self.db.executemany(
+            "delete from jobs where repo = ? and run_id = ? and attempt = ?",
+            to_delete,
+        )
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+
+
+def open_jobs_cache(disk=True):
+    """Make a JobsCache, on disk if possible and wanted."""
+    if disk:
+        try:
+            return DiskJobsCache()
+        except (OSError, sqlite3.Error):
+            pass
+    return JobsCache()
+
+
+def _dump_jobs(jobs):
+    return json.dumps([job.to_json() for job in jobs])
+
+
+def _load_jobs(text):
+    return [Job.from_json(job) for job in json.loads(text)]
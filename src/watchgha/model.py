@@ -0,0 +1,129 @@
+"""
+Compact records of the GitHub data we use.
+
+The GitHub API returns large JSON objects, with many fields, URLs, and nested
+objects we never look at.  These classes keep only the fields we need, with
+datetimes parsed once.
+
+"""
+
+from .utils import to_datetime
+
+
+def _datetime_or_none(isostr):
+    return to_datetime(isostr) if isostr else None
+
+
+def _isostr_or_none(dt):
+    return dt.isoformat() if dt is not None else None
+
+
+class Step:
+    __slots__ = ("name", "status", "conclusion", "started_dt", "completed_dt")
+
+    @classmethod
+    def from_json(cls, data):
+        step = cls()
+        step.name = data.get("name")
+        step.status = data["status"]
+        step.conclusion = data.get("conclusion")
+        step.started_dt = _datetime_or_none(data.get("started_at"))
+        step.completed_dt = _datetime_or_none(data.get("completed_at"))
+        return step
+
+    def to_json(self):
+        return {
+            "name": self.name,
+            "status": self.status,
+            "conclusion": self.conclusion,
+            "started_at": _isostr_or_none(self.started_dt),
+            "completed_at": _isostr_or_none(self.completed_dt),
+        }
+
+    def __repr__(self):
+        return f"<Step {self.name!r} {self.status}>"
+
+
+class Job:
+    __slots__ = (
+        "id",
+        "name",
+        "status",
+        "conclusion",
+        "created_dt",
+        "started_dt",
+        "completed_dt",
+        "steps",
+        # A predicted completion datetime, set by DurationHistory.
+        "eta",
+    )
+
+    @classmethod
+    def from_json(cls, data):
+        job = cls()
+        job.id = data["id"]
+        job.name = data["name"]
+        job.status = data["status"]
+        job.conclusion = data.get("conclusion")
+        job.created_dt = to_datetime(data["created_at"])
+        job.started_dt = _datetime_or_none(data.get("started_at"))
+        job.completed_dt = _datetime_or_none(data.get("completed_at"))
+        job.steps = [Step.from_json(step) for step in data.get("steps") or ()]
+        job.eta = None
+        return job
+
+    def to_json(self):
+        """Make GitHub-style JSON data that from_json can read."""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "conclusion": self.conclusion,
+            "created_at": self.created_dt.isoformat(),
+            "started_at": _isostr_or_none(self.started_dt),
+            "completed_at": _isostr_or_none(self.completed_dt),
+            "steps": [step.to_json() for step in self.steps],
+        }
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.name!r} {self.status}>"
+
+
+class Run:
+    __slots__ = (
+        "id",
+        "name",
+        "display_title",
+        "head_branch",
+        "head_sha",
+        "event",
+        "status",
+        "conclusion",
+        "run_attempt",
+        "started_dt",
+        "html_url",
+        "jobs_url",
+        # The list of Jobs, or None if we haven't got them yet.
+        "jobs",
+    )
+
+    @classmethod
+    def from_json(cls, data):
+        run = cls()
+        run.id = data["id"]
+        run.name = data["name"]
+        run.display_title = data["display_title"]
+        run.head_branch = data["head_branch"]
+        run.head_sha = data["head_sha"]
+        run.event = data["event"]
+        run.status = data["status"]
+        run.conclusion = data.get("conclusion")
+        run.run_attempt = data.get("run_attempt", 1)
+        run.started_dt = to_datetime(data["run_started_at"])
+        run.html_url = data["html_url"]
+        run.jobs_url = data["jobs_url"]
+        run.jobs = None
+        return run
+
+    def __repr__(self):
+        return f"<Run {self.id} {self.name!r} {self.status}>"
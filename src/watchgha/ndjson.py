@@ -0,0 +1,118 @@
+"""
+Report changes as newline-delimited JSON, for programs to read.
+
+Each line is one JSON object with a "type" key:
+
+- "run": a run was seen for the first time, or its status or conclusion
+  changed.
+
+- "job": a job was seen for the first time, or its status, conclusion, or
+  current step changed.
+
+- "summary": the last line, with the job counts and whether everything
+  succeeded.
+
+"""
+
+import datetime
+import json
+
+
+def now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+
+
+def current_step(job):
+    """The name of the step `job` is running, or None."""
+    for step in job.steps:
+        if step.status == "in_progress":
+            return step.name
+    return None
+
+
+class Transitions:
+    """
+    Find what changed from one poll to the next.
+
+    `changes` returns records for the runs and jobs that are new or different
+    since the last time it was called.  Runs that are no longer there are
+    forgotten, so a long watch doesn't accumulate them.
+
+    """
+
+    def __init__(self):
+        # The last state we reported for each run and job, keyed by
+        # ("run", run_id) or ("job", run_id, job_id).
+        self.states = {}
+
+    def changed(self, key, state):
+        if self.states.get(key) == state:
+            return False
+        self.states[key] = state
+        return True
+
+    def changes(self, all_events):
+        records = []
+        run_ids = set()
+        for events in all_events:
+            for runs in events:
+                for run in runs:
+                    run_ids.add(run.id)
+                    records.extend(self.run_changes(run))
+        self.states = {
+            key: state for key, state in self.states.items() if key[1] in run_ids
+        }
+        return records
+
+    def run_changes(self, run):
+        if self.changed(("run", run.id), (run.run_attempt, run.status, run.conclusion)):
+            yield {
+                "type": "run",
+                "time": now_iso(),
+                "id": run.id,
+                "attempt": run.run_attempt,
+                "name": run.name,
+                "status": run.status,
+                "conclusion": run.conclusion,
+                "head_branch": run.head_branch,
+                "head_sha": run.head_sha,
+                "url": run.html_url,
+            }
+        for job in run.jobs or ():
+            step = current_step(job)
+            state = (job.status, job.conclusion, step)
+            if self.changed(("job", run.id, job.id), state):
+                yield {
+                    "type": "job",
+                    "time": now_iso(),
+                    "id": job.id,
+                    "run_id": run.id,
+                    "name": job.name,
+                    "status": job.status,
+                    "conclusion": job.conclusion,
+                    "step": step,
+                }
+
+
+def summary_record(status, succeeded=None):
+    """
+    The final record, from a Status.
+
+    `succeeded` is the overall result, if it isn't `status.succeeded`.
+
+    """
+    if succeeded is None:
+        succeeded = status.succeeded
+    return {
+        "type": "summary",
+        "time": now_iso(),
+        "done": status.done,
+        "succeeded": succeeded,
+        "total": status.total,
+        "num_succeeded": status.num_succeeded,
+        "num_failed": status.num_failed,
+    }
+
+
+def dumps(record):
+    return json.dumps(record, separators=(",", ":"))
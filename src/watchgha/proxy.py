@@ -0,0 +1,262 @@
+"""
+A daemon to share GitHub requests among all the watchers on a host.
+
+`watch_gha_runs --serve` listens on a Unix socket.  Watchers find the socket
+and get their data through it instead of from GitHub directly.  The daemon:
+
+- makes only one request at a time for each URL, sharing the response with
+  everyone who asked for it while it was in flight,
+
+- re-uses responses for a few seconds, and revalidates older ones with their
+  ETags,
+
+- stretches how long responses are re-used to stay within a share of its API
+  rate limit.
+
+So the load on GitHub grows with the number of distinct repos being watched,
+not with the number of people watching them.
+
+The protocol is simple: the client connects, and sends a URL and a newline.
+The daemon answers with one line of JSON describing the response, then the
+text of the response, then closes the connection.
+
+The daemon uses its own GitHub credentials for everyone who can connect to its
+socket.  So it only fetches repo URLs from the GitHub API (GITHUB_API_URL), to
+keep its token from being sent anywhere else.
+
+"""
+
+import contextlib
+import json
+import os
+import posixpath
+import time
+import urllib.parse
+
+import trio
+
+from .utils import WatchGhaError, user_cache_dir
+
+
+# How long a response is re-used before asking GitHub again, in seconds.
+FRESH_SECS = 5
+
+# URLs nobody has asked for in this long are forgotten, in seconds.
+FORGET_SECS = 10 * 60
+
+
+def private_socket_path():
+    """The socket for a daemon only the current user can use."""
+    return os.path.join(user_cache_dir(), "proxy.sock")
+
+
+def socket_path():
+    """Where the daemon's socket is, unless --socket says otherwise."""
+    # $set_env.py: WATCHGHA_SOCKET - the Unix socket for watch_gha_runs --serve.
+    return os.environ.get("WATCHGHA_SOCKET") or private_socket_path()
+
+
+def has_unix_sockets():
+    return hasattr(trio.socket, "AF_UNIX")
+
+
+class ProxyServer:
+    """
+    Serve GitHub data to watchers, from one Http.
+
+    `budget` is the fraction of the remaining rate limit we are willing to use
+    before it resets.  Only URLs under /repos/ at `api_url` are fetched.
+
+    """
+
+    def __init__(self, http, budget=1.0, api_url=None):
+        self.http = http
+        self.budget = budget
+        if api_url is None:
+            api_url = os.getenv("GITHUB_API_URL", "https://api.github.com")
+        self.api_url = urllib.parse.urlsplit(api_url)
+        # Responses we've got: url -> (time.time() when fetched, text).
+        self.fetched = {}
+        # When each URL was last asked for: url -> time.time().
+        self.asked = {}
+        self.num_requests = 0
+        self.num_fresh = 0
+
+    @property
+    def num_shared(self):
+        """How many requests were answered with someone else's response."""
+        return self.num_fresh + self.http.stats.shared
+
+    def fresh_secs(self, now):
+        """
+        How long a response can be re-used.
+
+        Every URL asked for recently is fetched again once each period, so
+        that's the cost of a period.  Choose a period that fits the budget.
+
+        """
+        secs = FRESH_SECS
+        rl = self.http.rate_limit
+        if rl.remaining is not None and rl.reset:
+            until_reset = max(rl.reset - now, 0)
+            allowed = rl.remaining * self.budget
+            cost = len(self.asked)
+            if allowed < cost:
+                secs = max(secs, until_reset)
+            else:
+                secs = max(secs, until_reset * cost / allowed)
+        return max(secs, rl.blocked_until - now)
+
+    def forget_old(self, now):
+        for url, when in list(self.asked.items()):
+            if now - when > FORGET_SECS:
+                del self.asked[url]
+                self.fetched.pop(url, None)
+
+    def allowed(self, url):
+        """Is `url` one we will fetch with our credentials?"""
+        parts = urllib.parse.urlsplit(url)
+        api = self.api_url
+        if (parts.scheme, parts.netloc.lower()) != (api.scheme, api.netloc.lower()):
+            return False
+        # No dot segments, so the path can't climb out of /repos/.
+        if posixpath.normpath(parts.path) != parts.path:
+            return False
+        return parts.path.startswith(api.path.rstrip("/") + "/repos/")
+
+    async def get_data(self, url):
+        """Get the text of `url`, sharing recent and in-flight responses."""
+        if not self.allowed(url):
+            raise WatchGhaError(f"Not a GitHub API repo URL: {url!r}")
+        now = time.time()
+        self.num_requests += 1
+        self.asked[url] = now
+        self.forget_old(now)
+
+        fetched = self.fetched.get(url)
+        if fetched is not None and now - fetched[0] < self.fresh_secs(now):
+            self.num_fresh += 1
+            return fetched[1]
+
+        # Http shares the request with anyone else asking for the URL now.
+        text = await self.http.get_data(url)
+        self.fetched[url] = (time.time(), text)
+        return text
+
+    async def handle(self, stream):
+        """Answer one request on a connection."""
+        async with stream:
+            request = b""
+            while b"\n" not in request:
+                data = await stream.receive_some()
+                if not data:
+                    return
+                request += data
+            url = request.partition(b"\n")[0].decode("utf-8")
+            rl = self.http.rate_limit
+            try:
+                text = await self.get_data(url)
+            except Exception as err:
+                # Tell the client, but keep serving.
+                header = {"error": str(err) or repr(err)}
+                body = b""
+            else:
+                body = text.encode("utf-8")
+                header = {"length": len(body)}
+            header["rate_limit"] = {
+                "limit": rl.limit,
+                "remaining": rl.remaining,
+                "reset": rl.reset,
+                "blocked_until": rl.blocked_until,
+            }
+            try:
+                await stream.send_all(
+                    json.dumps(header).encode("utf-8") + b"\n" + body
+                )
+            except trio.BrokenResourceError:
+                # The client went away.
+                pass
+
+    async def serve(self, path, private=True, task_status=trio.TASK_STATUS_IGNORED):
+        """
+        Listen on the Unix socket `path` until cancelled.
+
+        If `private`, only our own user can connect to it.
+
+        """
+        if os.path.exists(path):
+            try:
+                await (await trio.open_unix_socket(path)).aclose()
+            except OSError:
+                # A stale socket from a daemon that didn't clean up.
+                os.remove(path)
+            else:
+                raise WatchGhaError(f"A daemon is already serving on {path}")
+        os.makedirs(
+            os.path.dirname(path) or ".", mode=0o700 if private else 0o777, exist_ok=True
+        )
+        sock = trio.socket.socket(trio.socket.AF_UNIX, trio.socket.SOCK_STREAM)
+        try:
+            # Make the socket private as it's created: changing it afterwards
+            # would leave a moment when anyone could connect.
+            old_umask = os.umask(0o077) if private else None
+            try:
+                await sock.bind(path)
+            finally:
+                if old_umask is not None:
+                    os.umask(old_umask)
+            sock.listen()
+            task_status.started()
+            await trio.serve_listeners(self.handle, [trio.SocketListener(sock)])
+        finally:
+            sock.close()
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+    def describe(self):
+        return (
+            f"Proxy: {self.num_requests} requests, "
+            + f"{self.num_shared} answered with shared responses"
+        )
+
+
+class ProxyClient:
+    """
+    Get data through a ProxyServer, or from `http` directly if there isn't one.
+
+    The rate limit the daemon reports is copied into `http.rate_limit`.
+
+    """
+
+    def __init__(self, path, http):
+        self.path = path
+        self.http = http
+
+    def available(self):
+        """Does it look like there's a daemon to talk to?"""
+        return has_unix_sockets() and os.path.exists(self.path)
+
+    async def get_json(self, url):
+        try:
+            stream = await trio.open_unix_socket(self.path)
+        except OSError:
+            # No daemon: get it ourselves.
+            return await self.http.get_json(url)
+
+        async with stream:
+            await stream.send_all(url.encode("utf-8") + b"\n")
+            response = b""
+            async for data in stream:
+                response += data
+
+        header, _, body = response.partition(b"\n")
+        if not header:
+            raise WatchGhaError(f"No response from daemon for {url!r}")
+        header = json.loads(header)
+        rl = self.http.rate_limit
+        for name, value in header["rate_limit"].items():
+            if value is not None:
+                setattr(rl, name, value)
+        if "error" in header:
+            raise WatchGhaError(header["error"])
+        return json.loads(body)
@@ -0,0 +1,152 @@
+"""
+Play back data saved with SAVE_DATA=1, instead of getting it from GitHub.
+
+Http writes each response to a get_NNN file, and lists them in get_index.txt:
+
+    # URLs fetched, starting at 2025-03-25T12:34:56.789+00:00:
+    get_000.json: https://api.github.com/repos/... (at 0.000s, took 0.213s)
+
+A URL requested many times was saved many times, once for each poll.
+ReplayData answers the first request for a URL with the first response saved
+for it, the second with the second, and so on, repeating the last one when
+they run out.  That plays back the polls of the session in order.
+
+"""
+
+import collections
+import datetime
+import json
+import os
+import re
+import urllib.parse
+
+import anyio
+
+from .utils import WatchGhaError, to_datetime
+
+
+INDEX_LINE = re.compile(
+    r"(?P<filename>\S+): (?P<url>\S+)"
+    + r"(?: \(at (?P<at>[\d.]+)s, took (?P<took>[\d.]+)s\))?"
+)
+
+# A repo's runs, or one workflow's runs (with --only or --until).
+RUNS_PATH = re.compile(r"/actions/(workflows/[^/]+/)?runs$")
+
+CAPTURED_AT = re.compile(r"# URLs fetched, starting at (?P<when>\S+):")
+
+
+class Capture:
+    """One saved response."""
+
+    def __init__(self, filename, at=None, took=None):
+        self.filename = filename
+        self.at = at
+        self.took = took
+
+
+class ReplayData:
+    """
+    A data function serving the responses saved in `directory`.
+
+    If `timing` is true, each response takes as long as it originally did.
+
+    Runs are only shown if they are recent, so times in the data are moved
+    forward by how long ago it was captured, as if it had been captured just
+    now.  `shift_times=False` leaves them alone.
+
+    """
+
+    def __init__(self, directory=".", timing=False, shift_times=True):
+        self.directory = directory
+        self.timing = timing
+        self.captures = collections.defaultdict(list)
+        # The URLs in the order they were first requested.
+        self.urls = []
+        self.served = collections.Counter()
+        self.texts = {}
+        self.shift = None
+
+        index_path = os.path.join(directory, "get_index.txt")
+        try:
+            with open(index_path) as index:
+                lines = index.read().splitlines()
+        except OSError as err:
+            raise WatchGhaError(f"Couldn't read saved data: {err}") from err
+        captured_at = None
+        for line in lines:
+            if m := CAPTURED_AT.fullmatch(line):
+                captured_at = to_datetime(m["when"])
+            elif m := INDEX_LINE.fullmatch(line):
+                at = float(m["at"]) if m["at"] else None
+                took = float(m["took"]) if m["took"] else None
+                if m["url"] not in self.captures:
+                    self.urls.append(m["url"])
+                self.captures[m["url"]].append(Capture(m["filename"], at, took))
+
+        if shift_times:
+            if captured_at is None:
+                # Older captures didn't say when they were made.
+                mtime = os.path.getmtime(index_path)
+                captured_at = datetime.datetime.fromtimestamp(
+                    mtime, datetime.timezone.utc
+                )
+            self.shift = datetime.datetime.now(datetime.timezone.utc) - captured_at
+
+    def runs_urls(self):
+        """The repos' runs URLs, the ones a watcher started with."""
+        runs_urls = []
+        for url in self.urls:
+            parts = urllib.parse.urlsplit(url)
+            query = urllib.parse.parse_qs(parts.query)
+            if RUNS_PATH.search(parts.path) and "page" not in query:
+                runs_urls.append(url)
+        return runs_urls
+
+    def num_polls(self):
+        """How many polls were saved: the most any runs URL was fetched."""
+        return max((len(self.captures[url]) for url in self.runs_urls()), default=0)
+
+    def read_text(self, filename):
+        """The text of a saved response, with its times shifted if needed."""
+        text = self.texts.get(filename)
+        if text is None:
+            with open(os.path.join(self.directory, filename)) as f:
+                text = f.read()
+            if self.shift:
+                text = json.dumps(shift_times(json.loads(text), self.shift))
+            self.texts[filename] = text
+        return text
+
+    async def get_data(self, url):
+        """Get the text of the next saved response for `url`."""
+        captures = self.captures.get(url)
+        if not captures:
+            raise WatchGhaError(f"No saved data for {url!r}")
+        capture = captures[min(self.served[url], len(captures) - 1)]
+        self.served[url] += 1
+        text = await anyio.to_thread.run_sync(self.read_text, capture.filename)
+        if self.timing and capture.took:
+            await anyio.sleep(capture.took)
+        return text
+
+    async def get_json(self, url):
+        """Get the parsed JSON of the next saved response for `url`."""
+        return json.loads(await self.get_data(url))
+
+
+def shift_times(data, shift):
+    """Move all the "*_at" times in JSON `data` by the timedelta `shift`."""
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key.endswith("_at") and isinstance(value, str):
+                try:
+                    data[key] = (to_datetime(value) + shift).isoformat()
+                except ValueError:
+                    pass
+            else:
+                shift_times(value, shift)
+    elif isinstance(data, list):
+        for value in data:
+            shift_times(value, shift)
+    return data
@@ -1,6 +1,8 @@
+import copy
 import datetime
 import itertools
-import json
+import random
+import urllib.parse
 
 from .data_core import FINISHED, draw_runs
 
@@ -146,8 +148,86 @@ SAMPLE_DATA = {
 
 async def sample_datafn(url):
     url = url.partition("?")[0]
-    return json.dumps(SAMPLE_DATA[url])
+    return copy.deepcopy(SAMPLE_DATA[url])
 
 
 def sample(outfn):
     draw_runs(["demo:one"], datafn=sample_datafn, outfn=outfn)
+
+
+def synthetic_data(num_workflows=60, num_jobs=400, num_steps=30, seed=0):
+    """
+    Make a large scenario like SAMPLE_DATA, for benchmarks.
+
+    One push started `num_workflows` runs, each with a matrix of `num_jobs`
+    jobs of `num_steps` steps.  Some runs have finished, the rest are part way
+    through.  The runs are at "synth:runs".
+
+    """
+    rand = random.Random(seed)
+    pushed = NOW - datetime.timedelta(minutes=20)
+
+    def isodatetime(dt):
+        return dt.isoformat(timespec="seconds")
+
+    def step(n, done):
+        if n <= done:
+            return {"name": f"Step {n}", "status": "completed", "conclusion": "success"}
+        elif n == done + 1:
+            return {"name": f"Step {n}", "status": "in_progress"}
+        else:
+            return {"name": f"Step {n}", "status": "queued"}
+
+    data = {"synth:runs": {"workflow_runs": []}}
+    oses = ["ubuntu-latest", "macos-latest", "windows-latest"]
+    for nworkflow in range(num_workflows):
+        started = pushed + datetime.timedelta(seconds=rand.uniform(0, 3))
+        finished = nworkflow % 3 == 0
+        conclusion = rand.choice(["success"] * 4 + ["failure"]) if finished else None
+        run = {
+            **run_common(),
+            "name": f"Workflow {nworkflow}",
+            "status": "completed" if finished else "in_progress",
+            "conclusion": conclusion,
+            "run_started_at": isodatetime(started),
+        }
+        run["html_url"] = f"https://github.com/owner/repo/actions/runs/{run['id']}"
+        run["jobs_url"] = jobs_url = f"synth:jobs_{run['id']}"
+        data["synth:runs"]["workflow_runs"].append(run)
+
+        jobs = []
+        for njob in range(num_jobs):
+            created = started + datetime.timedelta(seconds=rand.uniform(0, 2))
+            if finished:
+                done = num_steps
+            else:
+                done = rand.randint(0, num_steps)
+            job = {
+                **job_common(),
+                "name": f"test (3.{8 + njob % 5}, {oses[njob // 5 % 3]}, {njob // 15})",
+                "status": "in_progress",
+                "created_at": isodatetime(created),
+                "steps": [step(n, done) for n in range(1, num_steps + 1)],
+            }
+            if done == num_steps:
+                job["status"] = "completed"
+                # A failed run has one failed job.
+                failed = conclusion == "failure" and njob == 0
+                job["conclusion"] = "failure" if failed else "success"
+            jobs.append(job)
+        data[jobs_url] = {"jobs": jobs}
+    return data
+
+
+def synthetic_datafn(data, per_page=100):
+    """A datafn serving `data` from synthetic_data, in pages like GitHub."""
+
+    async def datafn(url):
+        url, _, query = url.partition("?")
+        page = int(urllib.parse.parse_qs(query).get("page", ["1"])[0])
+        key, items = next(iter(data[url].items()))
+        start = (page - 1) * per_page
+        # Nothing changes the data it's given, so it isn't copied.
+        return {"total_count": len(items), key: items[start : start + per_page]}
+
+    return datafn
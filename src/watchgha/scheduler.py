@@ -0,0 +1,84 @@
+"""
+Decide when to poll next.
+"""
+
+import time
+
+from .utils import Interval
+
+
+# While nothing is expected to change, the poll interval can stretch up to
+# this many times longer.
+MAX_STRETCH = 4
+
+
+class PollScheduler(Interval):
+    """
+    An Interval that stretches to stay within a share of the API rate limit.
+
+    `rate_limit` is the RateLimit from our Http.  `budget` is the fraction of
+    the remaining requests we are willing to use before the limit resets,
+    leaving the rest for other tools using the same token.
+
+    If the last poll didn't use any rate-limited requests (because they were
+    all conditional), it costs nothing and we poll at the full rate.
+
+    `next_due` can be set to the time.time() when we next expect something to
+    change, predicted from how long jobs took before.  Until then, we poll
+    less often, and as it approaches, more often.
+
+    """
+
+    def __init__(self, secs, rate_limit=None, budget=1.0):
+        super().__init__(secs)
+        self.poll_secs = secs
+        self.rate_limit = rate_limit
+        self.budget = budget
+        self.last_charged = 0
+        self.next_due = None
+
+    def next_delay(self):
+        now = time.time()
+        self.secs = self.secs_for_eta(now)
+        if self.rate_limit is not None:
+            cost = self.rate_limit.num_charged - self.last_charged
+            self.last_charged = self.rate_limit.num_charged
+            self.secs = self.secs_for_cost(cost, now, self.secs)
+        return super().next_delay()
+
+    def secs_for_eta(self, now):
+        """How long an interval to use, based on `next_due`."""
+        if self.next_due is None:
+            return self.poll_secs
+        until_due = self.next_due - now
+        if until_due > self.poll_secs:
+            # Nothing is expected to happen for a while.
+            return min(until_due, self.poll_secs * MAX_STRETCH)
+        if until_due > -self.poll_secs:
+            # Something should happen soon, look more often.
+            return max(self.poll_secs / 2, 1)
+        # Our prediction was wrong, go back to the normal rate.
+        return self.poll_secs
+
+    def secs_for_cost(self, cost, now, secs=None):
+        """How long an interval to use if each poll costs `cost` requests."""
+        if secs is None:
+            secs = self.poll_secs
+        rl = self.rate_limit
+        if rl.remaining is not None and rl.reset and cost > 0:
+            until_reset = max(rl.reset - now, 0)
+            allowed = rl.remaining * self.budget
+            if allowed < cost:
+                secs = max(secs, until_reset)
+            else:
+                secs = max(secs, until_reset * cost / allowed)
+        return max(secs, rl.blocked_until - now)
+
+    def describe(self):
+        """A status line about the rate limit and polling."""
+        if self.rate_limit is None:
+            return ""
+        text = self.rate_limit.describe()
+        if text and self.secs != self.poll_secs:
+            text += f", polling every {self.secs:.0f}s"
+        return text
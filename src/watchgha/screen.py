@@ -0,0 +1,97 @@
+"""
+A full-screen display that only repaints what changed.
+"""
+
+# Terminal control sequences.
+ALT_SCREEN_ON = "\x1b[?1049h"
+ALT_SCREEN_OFF = "\x1b[?1049l"
+HIDE_CURSOR = "\x1b[?25l"
+SHOW_CURSOR = "\x1b[?25h"
+CLEAR_SCREEN = "\x1b[2J"
+CLEAR_TO_END_OF_LINE = "\x1b[K"
+CLEAR_TO_END_OF_SCREEN = "\x1b[J"
+
+
+def move_to(row):
+    """Move to the start of `row`, counting from zero."""
+    return f"\x1b[{row + 1};1H"
+
+
+class LineScreen:
+    """
+    Like rich's console.screen(), but repaints only the lines that changed.
+
+    Each line of markup is rendered once, and re-used until it changes.  The
+    rendered lines are compared to what's already on the screen, and only
+    the different ones are written.  A poll that changes one job's line only
+    sends that line to the terminal.
+
+    """
+
+    def __init__(self, console):
+        self.console = console
+        self.size = None
+        # The rendered screen lines for each line of markup on the screen.
+        self.rendered = {}
+        # The rendered lines on the screen now.
+        self.lines = []
+        self.chars_written = 0
+
+    def __enter__(self):
+        self.write(ALT_SCREEN_ON + HIDE_CURSOR + CLEAR_SCREEN)
+        return self
+
+    def __exit__(self, *exc):
+        self.write(SHOW_CURSOR + ALT_SCREEN_OFF)
+
+    def write(self, text):
+        self.chars_written += len(text)
+        self.console.file.write(text)
+        self.console.file.flush()
+
+    def render(self, markup):
+        """Render one line of markup to a list of screen lines."""
+        with self.console.capture() as capture:
+            self.console.print(markup)
+        return capture.get().rstrip("\n").split("\n")
+
+    def update(self, markup):
+        """Show `markup` on the screen."""
+        out = []
+        size = self.console.size
+        if size != self.size:
+            # The terminal changed size, start over.
+            self.size = size
+            self.rendered = {}
+            self.lines = []
+            out.append(CLEAR_SCREEN)
+
+        rendered = {}
+        lines = []
+        for mline in markup.splitlines():
+            screen_lines = rendered.get(mline) or self.rendered.get(mline)
+            if screen_lines is None:
+                screen_lines = self.render(mline)
+            rendered[mline] = screen_lines
+            lines.extend(screen_lines)
+        lines = lines[: size.height]
+
+        for row, line in enumerate(lines):
+            if row >= len(self.lines) or line != self.lines[row]:
+                out.append(move_to(row) + line + CLEAR_TO_END_OF_LINE)
+        if len(lines) < len(self.lines):
+            out.append(move_to(len(lines)) + CLEAR_TO_END_OF_SCREEN)
+
+        self.rendered = rendered
+        self.lines = lines
+        if out:
+            self.write("".join(out))
+
+
+def open_screen(console):
+    """A context manager for the live screen, with an update(markup) method."""
+    if console.legacy_windows or not console.is_terminal:
+        # The old Windows console doesn't understand our control sequences,
+        # and files and pipes shouldn't get them.  rich leaves them out.
+        return console.screen()
+    return LineScreen(console)
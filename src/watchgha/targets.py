@@ -0,0 +1,78 @@
+"""
+What to watch: repos and branches or commits, and their runs URLs.
+
+This is used by the command line and the library API, so it imports only
+what it needs.
+
+"""
+
+import datetime
+import os
+import urllib.parse
+from dataclasses import dataclass
+from typing import Optional
+
+
+# GitHub lets a run be re-run for this many days after it was created.  A
+# re-run starts it again, so a run created this long ago can still be recent
+# enough to show.
+RERUN_DAYS = 30
+
+
+@dataclass
+class Target:
+    """One repo and branch or commit to watch."""
+
+    # The runs URLs for the repo.
+    urls: list
+    # The heading for its section of the display, if there are many targets.
+    label: Optional[str] = None
+
+
+def oldest_run_date():
+    """
+    The creation date of the oldest runs get_events might show.
+
+    get_events shows runs started in the last week, but the server can only
+    filter on when runs were created.  A re-run of an older run has its old
+    creation date, so go back as far as runs can be re-run, and then the
+    week (and a day) before that.
+
+    """
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    return (today - datetime.timedelta(days=RERUN_DAYS + 8)).isoformat()
+
+
+def runs_url(repo_name, branch=None, sha=None):
+    """The API URL for the runs of `repo_name` ("owner/repo") on `branch` or `sha`."""
+    params = {"per_page": "100"}
+    if sha:
+        params["head_sha"] = sha
+    elif branch:
+        params["branch"] = branch
+    else:
+        raise ValueError("Need a branch or a commit SHA")
+    # Don't get runs that are too old to display, even if re-run, or the pull
+    # requests for each run, which we don't use.
+    params["created"] = f">={oldest_run_date()}"
+    params["exclude_pull_requests"] = "true"
+    url_args = urllib.parse.urlencode(params)
+    api_url = os.getenv("GITHUB_API_URL", "https://api.github.com")
+    return f"{api_url}/repos/{repo_name}/actions/runs?{url_args}"
+
+
+async def workflow_runs_urls(repo_runs_url, datafn, only_words):
+    """
+    Narrow a repo's runs URL to the workflows matching `only_words`.
+
+    Returns a list of runs URLs for just those workflows.
+
+    """
+    base_url, _, url_args = repo_runs_url.partition("?")
+    repo_url = base_url.removesuffix("/actions/runs")
+    workflows = (await datafn(f"{repo_url}/actions/workflows?per_page=100"))["workflows"]
+    return [
+        f"{repo_url}/actions/workflows/{workflow['id']}/runs?{url_args}"
+        for workflow in workflows
+        if any(word in workflow["name"].lower() for word in only_words)
+    ]
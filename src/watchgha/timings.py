@@ -0,0 +1,259 @@
+"""
+Measure where the time goes, for --timings and --trace.
+
+A Timings records spans of time for the phases of each poll (getting runs,
+parsing, sorting, drawing, updating the screen), and one record for each HTTP
+request, with its size, retries, and how long connecting and waiting for the
+server took.  It can summarize the last poll in a line for the screen, or
+write the whole session as a Chrome trace file, for chrome://tracing or
+https://ui.perfetto.dev.
+
+Trace events are only kept if a trace will be written, since a long session
+would pile up a lot of them.  When timings aren't wanted at all, NO_TIMINGS
+does nothing, as cheaply as possible.
+
+"""
+
+import collections
+import contextlib
+import json
+import time
+
+
+class Timings:
+    """
+    Record spans of time and HTTP requests during a session.
+
+    Use `trace` to keep the events for write_trace.
+
+    """
+
+    enabled = True
+
+    def __init__(self, trace=False):
+        self.start = time.perf_counter()
+        self.trace = trace
+        # Chrome trace events.
+        self.events = []
+        # When each lane for concurrent work is free again.
+        self.lanes = []
+        # Totals for the poll in progress, and the last finished poll.
+        self.poll = PollTotals()
+        self.last_poll = None
+        self.num_polls = 0
+        # Totals for the whole session: name -> seconds.
+        self.session = collections.Counter()
+
+    def add_event(self, name, cat, start, duration, tid=0, args=None):
+        if not self.trace:
+            return
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": round((start - self.start) * 1e6),
+            "dur": round(duration * 1e6),
+            "pid": 1,
+            "tid": tid,
+        }
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    @contextlib.contextmanager
+    def span(self, name, concurrent=False, **args):
+        """
+        Time a phase of work.
+
+        Use `concurrent` for phases that wait for other tasks, and might
+        overlap with others like them.
+
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            duration = end - start
+            if concurrent:
+                self.add_event(
+                    name, "phase", start, duration, tid=self.lane(start, end), args=args
+                )
+            else:
+                # Concurrent phases overlap other work, so don't add them up.
+                self.add_event(name, "phase", start, duration, args=args)
+                self.poll.phases[name] += duration
+                self.session[name] += duration
+
+    def start_poll(self):
+        self.poll = PollTotals()
+        self.poll.start = time.perf_counter()
+
+    def end_poll(self):
+        self.poll.duration = time.perf_counter() - self.poll.start
+        self.add_event(
+            f"poll {self.num_polls + 1}", "poll", self.poll.start, self.poll.duration
+        )
+        # Phases after the poll, like updating the screen, still count toward
+        # it until the next one starts.
+        self.last_poll = self.poll
+        self.num_polls += 1
+
+    def lane(self, start, end):
+        """Choose a trace lane for concurrent work, so they don't overlap."""
+        if not self.trace:
+            return 0
+        for lane, free_at in enumerate(self.lanes):
+            if free_at <= start:
+                break
+        else:
+            lane = len(self.lanes)
+            self.lanes.append(0)
+        self.lanes[lane] = end
+        return lane + 1
+
+    def request(self, url, start, status, nbytes, attempt=1, stages=None):
+        """
+        Record an HTTP request to `url` that started at `start`.
+
+        `attempt` counts the tries of the same request.  `stages` is a dict
+        of name -> (start, end) from HttpTrace.
+
+        """
+        end = time.perf_counter()
+        tid = self.lane(start, end)
+        args = {"url": url, "status": status, "bytes": nbytes, "attempt": attempt}
+        self.add_event("GET", "http", start, end - start, tid=tid, args=args)
+        for name, (sstart, send) in (stages or {}).items():
+            self.add_event(name, "http", sstart, send - sstart, tid=tid)
+            self.poll.phases[name] += send - sstart
+            self.session[name] += send - sstart
+        poll = self.poll
+        poll.requests += 1
+        poll.bytes += nbytes
+        poll.slowest = max(poll.slowest, end - start)
+        self.session["requests"] += 1
+        self.session["bytes"] += nbytes
+
+    def retried(self):
+        self.poll.retries += 1
+        self.session["retries"] += 1
+
+    def describe(self):
+        """A line about the last poll, or "" if there hasn't been one."""
+        if self.last_poll is None:
+            return ""
+        return self.last_poll.describe()
+
+    def describe_session(self):
+        """Lines summarizing the whole session."""
+        session = self.session
+        lines = [
+            f"Timings: {self.num_polls} polls, {session['requests']} requests, "
+            + f"{session['bytes'] / 1024:,.0f} KiB, {session['retries']} retries"
+        ]
+        for name, secs in session.items():
+            if name not in ("requests", "bytes", "retries"):
+                lines.append(f"  {name:16} {secs * 1000:10,.1f} ms")
+        return lines
+
+    def write_trace(self, path):
+        """Write the session as a Chrome trace file."""
+        names = ["main"] + [f"concurrent {n + 1}" for n in range(len(self.lanes))]
+        meta = [
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+            for tid, name in enumerate(names)
+        ]
+        trace = {"traceEvents": meta + self.events, "displayTimeUnit": "ms"}
+        with open(path, "w") as f:
+            json.dump(trace, f)
+
+
+class PollTotals:
+    """What happened during one poll."""
+
+    def __init__(self):
+        self.start = 0.0
+        self.duration = 0.0
+        self.requests = 0
+        self.bytes = 0
+        self.retries = 0
+        self.slowest = 0.0
+        # name -> seconds spent in that phase.
+        self.phases = collections.Counter()
+
+    def describe(self):
+        text = (
+            f"Last poll {self.duration * 1000:,.0f}ms: {self.requests} requests, "
+            + f"{self.bytes / 1024:,.0f} KiB"
+        )
+        if self.retries:
+            text += f", {self.retries} retries"
+        if self.requests:
+            text += f", slowest {self.slowest * 1000:,.0f}ms"
+        phases = [f"{name} {secs * 1000:,.0f}" for name, secs in self.phases.items()]
+        if phases:
+            text += "; ms: " + ", ".join(phases)
+        return text
+
+
+class HttpTrace:
+    """
+    An httpcore trace callback, noting when each stage of a request happened.
+
+    The stages are "connect" (DNS and TCP), "tls", "wait" (sending the request
+    and waiting for the response headers), and "download".
+
+    """
+
+    STAGES = {
+        "connection.connect_tcp": "connect",
+        "connection.connect_unix_socket": "connect",
+        "connection.start_tls": "tls",
+        "http11.receive_response_headers": "wait",
+        "http2.receive_response_headers": "wait",
+        "http11.receive_response_body": "download",
+        "http2.receive_response_body": "download",
+    }
+
+    def __init__(self):
+        self.stages = {}
+        self.started = {}
+
+    async def __call__(self, event_name, info):
+        name, _, state = event_name.rpartition(".")
+        stage = self.STAGES.get(name)
+        if stage is None:
+            return
+        if state == "started":
+            self.started[stage] = time.perf_counter()
+        elif state == "complete" and stage in self.started:
+            self.stages[stage] = (self.started.pop(stage), time.perf_counter())
+
+
+class NoTimings:
+    """A Timings that records nothing."""
+
+    enabled = False
+    _null_context = contextlib.nullcontext()
+
+    def span(self, name, concurrent=False, **args):
+        return self._null_context
+
+    def start_poll(self):
+        pass
+
+    def end_poll(self):
+        pass
+
+    def request(self, *args, **kwargs):
+        pass
+
+    def retried(self):
+        pass
+
+    def describe(self):
+        return ""
+
+
+NO_TIMINGS = NoTimings()
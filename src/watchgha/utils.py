@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import datetime
+import os
 import re
+import sys
 import time
 
 
@@ -9,6 +11,17 @@ class WatchGhaError(Exception):
     pass
 
 
+def leaf_exceptions(exc):
+    """The exceptions in `exc`, an exception group that might be nested."""
+    import exceptiongroup
+
+    if isinstance(exc, exceptiongroup.BaseExceptionGroup):
+        for inner in exc.exceptions:
+            yield from leaf_exceptions(inner)
+    else:
+        yield exc
+
+
 def nice_time(dt):
     dt = dt.astimezone()
     now = datetime.datetime.now()
@@ -22,18 +35,37 @@ def nice_time(dt):
     return dt.strftime(fmt).lower()
 
 
+def nice_time_ts(ts):
+    """nice_time for a time.time() timestamp."""
+    return nice_time(datetime.datetime.fromtimestamp(ts, datetime.timezone.utc))
+
+
+def nice_eta(dt):
+    """How long until `dt`, roughly: "~3m left"."""
+    secs = (dt - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+    if secs < 60:
+        return "<1m left"
+    mins = round(secs / 60)
+    if mins < 60:
+        return f"~{mins}m left"
+    return f"~{mins // 60}h{mins % 60:02d}m left"
+
+
 def to_datetime(isostr):
     # 3.11 accepts Z, but older Pythons don't.
     isostr = isostr.replace("Z", "+00:00")
     return datetime.datetime.fromisoformat(isostr)
 
 
-class DictAttr:
-    def __init__(self, d):
-        self.d = d
-
-    def __getattr__(self, name):
-        return self.d[name]
+def user_cache_dir():
+    """The directory for watchgha's cached data, following OS conventions."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(r"~\AppData\Local")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "watchgha")
 
 
 class Interval:
@@ -48,12 +80,19 @@ class Interval:
         self.secs = secs
         self.last_time = time.time()
 
-    def wait(self):
+    def next_delay(self):
+        """How long to wait until the next interval should start."""
         now = time.time()
-        delay = self.secs - (now - self.last_time)
-        self.last_time = now
-        if delay > 0:
-            time.sleep(delay)
+        delay = max(self.secs - (now - self.last_time), 0)
+        self.last_time = now + delay
+        return delay
+
+    def reset(self):
+        """Start the interval over from now."""
+        self.last_time = time.time()
+
+    def wait(self):
+        time.sleep(self.next_delay())
 
 
 def human_key(s):
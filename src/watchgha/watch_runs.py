@@ -5,60 +5,47 @@ specific branch.
 It tries to show enough runs to see the latest status of each workflow.  Runs
 older than a week are not considered.
 
+This module is the command line.  It's imported every time the command runs,
+even for --help, so it only imports what it needs right away.  The watching
+itself is in watcher.py.
+
 """
 
-import contextlib
-import io
 import os
 import re
-import signal
 import sys
-import urllib.parse
 
 from os.path import isdir
 
 import click
-import exceptiongroup
-import rich.console
 
-from .data_core import Status, draw_runs
 from .git_help import git_repo_urls, git_branch
-from .http_help import get_data
-from .utils import Interval, WatchGhaError
+from .targets import Target, runs_url
+from .utils import WatchGhaError
 
 
-console = rich.console.Console(highlight=False)
-error_console = rich.console.Console(stderr=True, highlight=False)
+class LazyConsole:
+    """A rich Console, created (and rich imported) when it's first used."""
 
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.console = None
 
-def fatal(msg, status=1):
-    error_console.print(msg)
-    sys.exit(status)
+    def __getattr__(self, name):
+        if self.console is None:
+            import rich.console
 
+            self.console = rich.console.Console(**self.kwargs)
+        return getattr(self.console, name)
 
-@contextlib.contextmanager
-def handle_resize(handler):
-    original_sigwinch_handler = None
-    try:
-        # Save the original handler.
-        original_sigwinch_handler = signal.getsignal(signal.SIGWINCH)
-        # Call the given handler on sigwinch.
-        signal.signal(signal.SIGWINCH, lambda _, __: handler())
-    except AttributeError:
-        # This system is probably windows, and doesn't have SIGWINCH.
-        # Unfortunately there's no signal for window resize on windows and I
-        # don't know how to properly handle it. Just swallow the error.
-        pass
 
-    # yield control to the with block, and re-raise any exceptions
-    try:
-        yield
-    except:
-        raise
-    finally:
-        # clean up our sigwinch handler if we set one
-        if original_sigwinch_handler:
-            signal.signal(signal.SIGWINCH, original_sigwinch_handler)
+console = LazyConsole(highlight=False)
+error_console = LazyConsole(stderr=True, highlight=False)
+
+
+def fatal(msg, status=1):
+    error_console.print(msg)
+    sys.exit(status)
 
 
 @click.command()
@@ -82,9 +69,144 @@ def handle_resize(handler):
     ),
 )
 @click.option("--message", help="A message to display at the top of the screen.")
+@click.option(
+    "--http2", is_flag=True, help="Use HTTP/2 to multiplex requests. Needs h2."
+)
+@click.option(
+    "--max-connections",
+    help="How many connections to GitHub to keep open at once.",
+    type=int,
+    default=10,
+    show_default=True,
+)
+@click.option(
+    "--max-requests",
+    help="How many requests to GitHub to make at once.",
+    type=click.IntRange(1),
+    default=10,
+    show_default=True,
+)
+@click.option(
+    "--budget",
+    help=(
+        "Percent of the remaining GitHub API rate limit to use. "
+        + "Polling slows down to stay within it."
+    ),
+    type=click.IntRange(1, 100),
+    default=50,
+    show_default=True,
+)
+@click.option(
+    "--graphql",
+    is_flag=True,
+    help=(
+        "Use the GitHub GraphQL API to get all the runs and jobs in one request. "
+        + "Only shows runs for the latest commit. Needs authentication."
+    ),
+)
+@click.option("--stats", is_flag=True, help="Show HTTP statistics when done.")
+@click.option(
+    "--no-cache", is_flag=True, help="Don't use the on-disk cache of finished jobs."
+)
+@click.option(
+    "--targets",
+    "targets_file",
+    type=click.File("r"),
+    help=(
+        "A file of repos to watch together, one per line: "
+        + "REPO and an optional BRANCH or full commit SHA."
+    ),
+)
+@click.option(
+    "--serve",
+    is_flag=True,
+    help=(
+        "Run a daemon that other watchers on this host get their data through, "
+        + "sharing requests and the rate limit. Watchers use it automatically."
+    ),
+)
+@click.option(
+    "--socket",
+    "socket_file",
+    help=(
+        "The Unix socket for --serve, instead of one private to you "
+        + "(or WATCHGHA_SOCKET). "
+        + "Anyone who can use it can read any repo your GitHub "
+        + "credentials can read."
+    ),
+)
+@click.option(
+    "--webhook",
+    metavar="[HOST:]PORT",
+    help=(
+        "Listen for workflow_run and workflow_job webhook deliveries "
+        + "forwarded to this address, and only poll occasionally to catch up."
+    ),
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["screen", "ndjson"]),
+    default="screen",
+    show_default=True,
+    help=(
+        "How to show the runs. ndjson writes a JSON line for each change "
+        + "as it's seen, and a summary when done."
+    ),
+)
+@click.option(
+    "--fail-fast", is_flag=True, help="Stop with a failure as soon as a job fails."
+)
+@click.option(
+    "--until",
+    metavar="WORKFLOW[/JOB]",
+    help=(
+        "Stop when this workflow (or one job in it) finishes, "
+        + "with its result as the exit status. Other workflows' jobs aren't fetched."
+    ),
+)
+@click.option(
+    "--timings",
+    "show_timings",
+    is_flag=True,
+    help=(
+        "Show how long the last poll's requests, parsing, sorting, and drawing "
+        + "took, and a summary of the session when done."
+    ),
+)
+@click.option(
+    "--trace",
+    "trace_file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write the timings of the whole session to a Chrome trace file.",
+)
 @click.argument("repo", default=".")
 @click.argument("branch", required=False)
-def main(sha, poll, wait, only, message, repo, branch):
+def main(
+    sha,
+    poll,
+    wait,
+    only,
+    message,
+    http2,
+    max_connections,
+    max_requests,
+    budget,
+    graphql,
+    stats,
+    no_cache,
+    targets_file,
+    serve,
+    socket_file,
+    webhook,
+    output_format,
+    fail_fast,
+    until,
+    show_timings,
+    trace_file,
+    repo,
+    branch,
+):
     """
     Watch GitHub Action runs.
 
@@ -95,20 +217,138 @@ def main(sha, poll, wait, only, message, repo, branch):
 
     BRANCH is defaulted from the git repo.
 
+    With --targets, a number of repos and branches are watched at once, each
+    in its own section, and the exit status is a success only if all of them
+    succeeded.
+
     """
+    # Imported here, so that --help doesn't have to.
+    import trio
+
+    from .data_core import Until
+    from .graphql_data import GraphQLData
+    from .http_help import Http
+    from .jobs_cache import open_jobs_cache
+    from .proxy import ProxyClient, socket_path
+    from .timings import Timings
+    from .watcher import GhaWatcher
+    from .webhook import parse_address
+
     if only is not None:
-        only_words = [w.strip() for w in only.split(",")]
+        only_words = [w.strip().lower() for w in only.split(",")]
     else:
         only_words = None
 
+    if until is not None:
+        until = Until(until)
+        if only_words is None:
+            # Only get the runs that could be the workflow we want.
+            only_words = [until.workflow]
+
+    timings = Timings(trace=bool(trace_file)) if (show_timings or trace_file) else None
+    try:
+        http = Http(
+            http2=http2,
+            max_connections=max_connections,
+            max_requests=max_requests,
+            timings=timings,
+        )
+    except WatchGhaError as err:
+        fatal(str(err))
+
+    if serve:
+        run_proxy(http, budget / 100, socket_file, stats)
+        return
+
+    webhook_address = None
+    if webhook is not None:
+        try:
+            webhook_address = parse_address(webhook)
+        except ValueError as err:
+            fatal(str(err))
+
+    if graphql:
+        get_data_fn = GraphQLData(http).get_json
+    else:
+        proxy = ProxyClient(socket_file or socket_path(), http)
+        if proxy.available():
+            get_data_fn = proxy.get_json
+        else:
+            get_data_fn = http.get_json
+
+    if targets_file is not None:
+        if (repo, branch, sha) != (".", None, None):
+            fatal("Can't use --targets with REPO, BRANCH, or --sha")
+        targets = read_targets(targets_file)
+    else:
+        targets = [Target(gha_urls(repo, branch, sha))]
+
+    jobs_cache = open_jobs_cache(disk=not no_cache)
     watcher = GhaWatcher(
-        urls=gha_urls(repo, branch, sha),
-        get_data_fn=get_data,
+        targets=targets,
+        get_data_fn=get_data_fn,
         only_words=only_words,
         message=message,
+        jobs_cache=jobs_cache,
+        rate_limit=http.rate_limit,
+        budget=budget / 100,
+        # GraphQL gets all the runs for a commit at once anyway.
+        narrow_by_workflow=not graphql,
+        webhook_address=webhook_address,
+        output_format=output_format,
+        fail_fast=fail_fast,
+        until=until,
+        timings=timings,
     )
 
-    watcher.watch(wait, poll, console)
+    try:
+        try:
+            watcher.watch(wait, poll, console)
+        except WatchGhaError as err:
+            fatal(err)
+        if watcher.interrupted:
+            fatal("** interrupted **", status=2)
+        if watcher.stop_message:
+            error_console.print(watcher.stop_message)
+        sys.exit(0 if watcher.succeeded else 1)
+    finally:
+        trio.run(http.aclose)
+        jobs_cache.close()
+        if stats:
+            error_console.print(str(http.stats))
+            if http.rate_limit.remaining is not None:
+                error_console.print(http.rate_limit.describe())
+        if trace_file:
+            timings.write_trace(trace_file)
+        if show_timings:
+            for line in timings.describe_session():
+                error_console.print(line)
+
+
+def run_proxy(http, budget, socket_file, stats):
+    """Run the --serve daemon until interrupted."""
+    import trio
+
+    from .proxy import ProxyServer, has_unix_sockets, private_socket_path, socket_path
+
+    if not has_unix_sockets():
+        fatal("--serve needs Unix sockets, which this system doesn't have")
+    server = ProxyServer(http, budget=budget)
+    path = socket_file or socket_path()
+    error_console.print(f"Serving GitHub data on {path}")
+    try:
+        trio.run(server.serve, path, path == private_socket_path())
+    except KeyboardInterrupt:
+        pass
+    except WatchGhaError as err:
+        fatal(str(err))
+    finally:
+        trio.run(http.aclose)
+        if stats:
+            error_console.print(server.describe())
+            error_console.print(str(http.stats))
+            if http.rate_limit.remaining is not None:
+                error_console.print(http.rate_limit.describe())
 
 
 def gha_urls(repo, branch=None, sha=None):
@@ -119,19 +359,11 @@ def gha_urls(repo, branch=None, sha=None):
             branch = git_branch(repo)
     elif ":" in repo:
         repo_urls = [repo]
-        if branch is None:
+        if branch is None and sha is None:
             fatal(f"Branch is required for URL repo")
     else:
         fatal(f"Don't understand repo {repo!r}")
 
-    params = {"per_page": "100"}
-    if sha:
-        params["head_sha"] = sha
-    else:
-        assert branch is not None
-        params["branch"] = branch
-    url_args = urllib.parse.urlencode(params)
-
     github_urls = []
     for repo_url in repo_urls:
         # repo_url = "https://github.com/owner/repo.git"
@@ -144,10 +376,7 @@ def gha_urls(repo, branch=None, sha=None):
         )
         if repo_match is None:
             continue
-
-        api_url = os.getenv("GITHUB_API_URL", "https://api.github.com")
-        url = f"{api_url}/repos/{repo_match[1]}/actions/runs?{url_args}"
-        github_urls.append(url)
+        github_urls.append(runs_url(repo_match[1], branch, sha))
 
     if not github_urls:
         fatal(f"Couldn't find GitHub repo from remote URLs: {repo_urls!r}")
@@ -155,85 +384,31 @@ def gha_urls(repo, branch=None, sha=None):
     return github_urls
 
 
-class GhaWatcher:
-    def __init__(self, urls, get_data_fn, only_words, message):
-        self.urls = urls
-        self.get_data_fn = get_data_fn
-        self.only_words = only_words
-        self.message = message
-        self.status = 0
-        self.error = None
-
-    def watch(self, wait_for_start, poll, console):
-        self.status = Status()
-        self.interrupted = False
-
-        self.watch_gha_errors = []
-        interval = Interval(poll)
-
-        output = ""
-
-        with exceptiongroup.catch(
-            {
-                WatchGhaError: self.handle_watchghaerror,
-                KeyboardInterrupt: self.handle_keyboardinterrupt,
-            }
-        ):
-            while True:
-                output = self.get_gha_display()
-                if wait_for_start:
-                    if not self.status.done:
-                        break
-                else:
-                    break
-
-            if not self.status.done:
-                with console.screen() as screen:
-                    with handle_resize(lambda: screen.update(output)):
-                        while not self.status.done:
-                            screen.update(output)
-                            self.update_terminal_progress()
-                            interval.wait()
-                            output = self.get_gha_display()
-
-        self.clear_terminal_progress()
-
-        if self.watch_gha_errors:
-            fatal(self.watch_gha_errors[0])
-        console.print(output, end="")
-        if self.interrupted:
-            fatal("** interrupted **", status=2)
-        sys.exit(0 if self.status.succeeded else 1)
-
-    def handle_watchghaerror(self, excgroup):
-        self.watch_gha_errors.extend(excgroup.exceptions)
-
-    def handle_keyboardinterrupt(self, excgroup):
-        self.interrupted = True
+def read_targets(lines):
+    """
+    Read targets from the lines of a --targets file.
 
-    def get_gha_display(self):
-        stream = io.StringIO()
+    Each line is a REPO and an optional BRANCH, like the command line
+    arguments.  A BRANCH that is a full 40-character hex SHA is used as a
+    commit SHA instead.  Blank lines and lines starting with # are ignored.
 
-        self.status = draw_runs(
-            self.urls,
-            datafn=self.get_data_fn,
-            outfn=lambda s: print(s, file=stream),
-            only_words=self.only_words,
-        )
-        output = stream.getvalue()
-        if self.message:
-            output = f"{self.message}\n{output}"
-        return output
-
-    def update_terminal_progress(self):
-        finished = self.status.num_succeeded + self.status.num_failed
-        percent_done = finished * 100 // self.status.total
-        state = 2 if self.status.num_failed else 1
-        osc_9_4(state, percent_done)
-
-    def clear_terminal_progress(self):
-        osc_9_4(0, 0)
-
-def osc_9_4(st, pr):
-    sys.stdout.write(f"\033]9;4;{st};{pr}\033\\")
-    sys.stdout.flush()
+    """
+    targets = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        words = line.split()
+        if len(words) > 2:
+            fatal(f"Don't understand target {line!r}")
+        repo = words[0]
+        branch = sha = None
+        if len(words) == 2:
+            if re.fullmatch(r"[0-9a-f]{40}", words[1]):
+                sha = words[1]
+            else:
+                branch = words[1]
+        targets.append(Target(gha_urls(repo, branch, sha), label=line))
+    if not targets:
+        fatal("No targets to watch")
+    return targets
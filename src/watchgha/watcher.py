@@ -0,0 +1,496 @@
+"""
+Watch the runs: poll GitHub, and show what's happening until it's done.
+"""
+
+import contextlib
+import functools
+import io
+import os
+import signal
+import sys
+
+import exceptiongroup
+import trio
+
+from .bucketer import RepoBucketers
+from .data_core import (
+    BUCKET_WINDOW,
+    CICONS,
+    CSTYLES,
+    Status,
+    draw_events_status,
+    events_status,
+    get_events,
+    run_is_finished,
+)
+from .eta import DurationHistory, next_transition
+from .jobs_cache import JobsCache
+from .ndjson import Transitions, dumps, summary_record
+from .scheduler import PollScheduler
+from .screen import open_screen
+from .targets import workflow_runs_urls
+from .timings import NO_TIMINGS
+from .utils import WatchGhaError, leaf_exceptions
+from .webhook import apply_delivery, serve_webhooks, webhook_secret
+
+
+# How often to poll when webhooks are telling us about changes, in seconds.
+RECONCILE_SECS = 120
+
+
+@contextlib.contextmanager
+def cbreak_stdin():
+    """
+    Put the terminal into cbreak mode so we can read single keystrokes.
+
+    Produces the file descriptor to read, or None if stdin isn't a terminal or
+    this isn't a system with termios.
+
+    """
+    try:
+        import termios
+        import tty
+    except ImportError:
+        yield None
+        return
+
+    try:
+        fd = sys.stdin.fileno()
+        original_attrs = termios.tcgetattr(fd)
+    except (OSError, ValueError, termios.error):
+        yield None
+        return
+
+    try:
+        tty.setcbreak(fd)
+        yield fd
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, original_attrs)
+
+
+class GhaWatcher:
+    def __init__(
+        self,
+        targets,
+        get_data_fn,
+        only_words,
+        message,
+        jobs_cache=None,
+        rate_limit=None,
+        budget=1.0,
+        narrow_by_workflow=False,
+        webhook_address=None,
+        output_format="screen",
+        fail_fast=False,
+        until=None,
+        timings=None,
+    ):
+        self.targets = targets
+        self.get_data_fn = get_data_fn
+        self.only_words = only_words
+        self.message = message
+        self.jobs_cache = jobs_cache if jobs_cache is not None else JobsCache()
+        self.rate_limit = rate_limit
+        self.budget = budget
+        self.narrow_by_workflow = narrow_by_workflow
+        self.webhook_address = webhook_address
+        self.output_format = output_format
+        self.fail_fast = fail_fast
+        self.until = until
+        self.timings = timings if timings is not None else NO_TIMINGS
+        self.succeeded = False
+        self.stop_message = ""
+        self.transitions = Transitions()
+        self.scheduler = None
+        self.history = DurationHistory()
+        self.bucketers = RepoBucketers(BUCKET_WINDOW)
+        # The events for each target, from the last poll.
+        self.all_events = [[] for _ in targets]
+        # Set to wake up the watch loop, with poll_now if it should poll.
+        self.wakeup = None
+        self.poll_now = False
+        self.poll_deadline = None
+        self.status = 0
+        self.error = None
+        self.output = ""
+
+    def watch(self, wait_for_start, poll, console):
+        """
+        Watch until everything is done, or we're interrupted.
+
+        Raises WatchGhaError if the data couldn't be had.  Afterward,
+        `interrupted`, `stop_message`, and `succeeded` say how it ended.
+
+        """
+        self.status = Status()
+        self.interrupted = False
+
+        self.watch_gha_errors = []
+
+        with exceptiongroup.catch(
+            {
+                WatchGhaError: self.handle_watchghaerror,
+                KeyboardInterrupt: self.handle_keyboardinterrupt,
+            }
+        ):
+            trio.run(self.watch_async, wait_for_start, poll, console)
+
+        if self.output_format == "screen":
+            self.clear_terminal_progress()
+
+        if self.watch_gha_errors:
+            raise self.watch_gha_errors[0]
+        if self.output_format == "screen":
+            console.print(self.output, end="")
+
+    async def watch_async(self, wait_for_start, poll, console):
+        """
+        The whole watch session, in one event loop.
+
+        Polling, redrawing on resize, reading keys, and receiving webhooks all
+        happen concurrently.
+
+        """
+        self.wakeup = trio.Event()
+        if self.output_format == "ndjson":
+            polls = functools.partial(self.stream_polls, wait_for_start, poll)
+        else:
+            polls = functools.partial(self.watch_polls, wait_for_start, poll, console)
+
+        if self.webhook_address is None:
+            await polls()
+            return
+
+        # Webhooks tell us about changes, polls only need to catch up on
+        # anything they missed.
+        poll = max(poll, RECONCILE_SECS)
+        async with trio.open_nursery() as nursery:
+            host, port = self.webhook_address
+            try:
+                await nursery.start(
+                    serve_webhooks, host, port, self.deliver, webhook_secret()
+                )
+            except OSError as err:
+                raise WatchGhaError(f"Couldn't listen for webhooks: {err}") from err
+            await polls()
+            nursery.cancel_scope.cancel()
+
+    async def stream_polls(self, wait_for_start, poll):
+        """Poll until everything is done, writing changes as NDJSON."""
+        interval = self.scheduler = PollScheduler(poll, self.rate_limit, self.budget)
+
+        if self.only_words and self.narrow_by_workflow:
+            await self.narrow_urls()
+
+        self.show(await self.get_all_events())
+        while wait_for_start and self.status.done:
+            if await self.wait_for_next_poll(interval):
+                self.show(await self.get_all_events())
+        while not self.should_stop():
+            if await self.wait_for_next_poll(interval):
+                self.show(await self.get_all_events())
+        write_record(summary_record(self.status, self.succeeded))
+
+    async def watch_polls(self, wait_for_start, poll, console):
+        """Poll and display until everything is done."""
+        interval = self.scheduler = PollScheduler(poll, self.rate_limit, self.budget)
+
+        if self.only_words and self.narrow_by_workflow:
+            await self.narrow_urls()
+
+        with contextlib.ExitStack() as stack:
+            screen = None
+
+            def show_partial(output):
+                # Show the runs while their jobs are still arriving.
+                nonlocal screen
+                if screen is None:
+                    screen = stack.enter_context(open_screen(console))
+                with self.timings.span("screen"):
+                    screen.update(output)
+
+            self.output = await self.get_gha_display(partialfn=show_partial)
+            while wait_for_start and self.status.done:
+                if await self.wait_for_next_poll(interval):
+                    self.output = await self.get_gha_display()
+
+            if self.should_stop():
+                return
+
+            if screen is None:
+                screen = stack.enter_context(open_screen(console))
+            async with trio.open_nursery() as nursery:
+                nursery.start_soon(self.redraw_on_resize, screen)
+                nursery.start_soon(self.read_keys)
+                while not self.should_stop():
+                    self.update_screen(screen)
+                    self.update_terminal_progress()
+                    if await self.wait_for_next_poll(interval):
+                        self.output = await self.get_gha_display()
+                nursery.cancel_scope.cancel()
+
+    def should_stop(self):
+        """
+        Should we stop polling?
+
+        If so, sets `succeeded` to the result, and `stop_message` to explain
+        why we stopped early, if we did.
+
+        """
+        if self.fail_fast and self.status.num_failed:
+            self.succeeded = False
+            self.stop_message = "Stopped: a job failed"
+            return True
+        if self.until is not None:
+            result = self.until.result(
+                [runs for events in self.all_events for runs in events]
+            )
+            if result is not None:
+                self.succeeded = result
+                return True
+        if self.status.done:
+            if self.until is not None:
+                self.succeeded = False
+                self.stop_message = "Stopped: everything finished, but not --until"
+            else:
+                self.succeeded = self.status.succeeded
+            return True
+        return False
+
+    async def narrow_urls(self):
+        """Change our URLs to get runs only for the --only workflows."""
+
+        async def narrow(target):
+            urls = []
+            for url in target.urls:
+                urls.extend(
+                    await workflow_runs_urls(url, self.get_data_fn, self.only_words)
+                )
+            target.urls = urls
+
+        async with trio.open_nursery() as nursery:
+            for target in self.targets:
+                nursery.start_soon(narrow, target)
+
+    async def wait_for_next_poll(self, interval):
+        """
+        Wait for the poll interval, or for a key asking to refresh now.
+
+        Returns True if it's time to poll.  Returns False if a webhook changed
+        the display first, and the poll is still to come.
+
+        """
+        if self.poll_deadline is None:
+            self.poll_deadline = trio.current_time() + interval.next_delay()
+        with trio.move_on_at(self.poll_deadline):
+            await self.wakeup.wait()
+        woken = self.wakeup.is_set()
+        self.wakeup = trio.Event()
+        if woken and not self.poll_now:
+            return False
+        if woken:
+            interval.reset()
+        self.poll_now = False
+        self.poll_deadline = None
+        return True
+
+    def deliver(self, event_name, payload):
+        """Apply a webhook delivery to the runs on the screen."""
+        repo = payload["repository"]["full_name"].lower()
+        urls = [url.lower() for target in self.targets for url in target.urls]
+        if not any(f"/repos/{repo}/" in url for url in urls):
+            return
+        everything = [runs for events in self.all_events for runs in events]
+        changed = apply_delivery(everything, event_name, payload, self.bucketers)
+        if changed:
+            self.history.annotate(everything)
+            self.show(self.all_events)
+            # Get the final word from GitHub before stopping.
+            self.poll_now = self.status.done
+        elif changed is None:
+            # A new run: poll to find out where it goes.
+            self.poll_now = True
+        else:
+            return
+        self.wakeup.set()
+
+    async def redraw_on_resize(self, screen):
+        """Redraw the screen when the terminal window changes size."""
+        if not hasattr(signal, "SIGWINCH"):
+            # This system is probably windows, and doesn't have SIGWINCH.
+            # Unfortunately there's no signal for window resize on windows and
+            # I don't know how to properly handle it.
+            return
+        with trio.open_signal_receiver(signal.SIGWINCH) as signals:
+            async for _ in signals:
+                self.update_screen(screen)
+
+    async def read_keys(self):
+        """Handle keystrokes: r or space to refresh now, q to quit."""
+        with cbreak_stdin() as fd:
+            if fd is None:
+                return
+            while True:
+                await trio.lowlevel.wait_readable(fd)
+                key = os.read(fd, 1)
+                if key in (b"r", b" "):
+                    self.poll_now = True
+                    self.wakeup.set()
+                elif key == b"q":
+                    raise KeyboardInterrupt
+
+    def handle_watchghaerror(self, excgroup):
+        self.watch_gha_errors.extend(leaf_exceptions(excgroup))
+
+    def handle_keyboardinterrupt(self, excgroup):
+        self.interrupted = True
+
+    async def get_gha_display(self, partialfn=None):
+        """
+        Get the latest data, and return the markup to display.
+
+        If `partialfn` is provided, it is called with partial markup as the
+        data arrives, if any runs are still going.
+
+        """
+
+        def show_partial(all_events):
+            everything = [runs for events in all_events for runs in events]
+            if not all(run_is_finished(r) for runs in everything for r in runs):
+                partialfn(self.render(all_events)[1])
+
+        eventsfn = show_partial if partialfn is not None else None
+        all_events = await self.get_all_events(eventsfn)
+        self.status, output = self.render(all_events)
+        return output
+
+    async def get_all_events(self, eventsfn=None):
+        """
+        Get the latest events for each target, in the same order as the targets.
+
+        If `eventsfn` is provided, it's called with the events for all the
+        targets as they arrive.
+
+        """
+        self.timings.start_poll()
+        all_events = [[] for _ in self.targets]
+
+        def target_eventsfn(target_index, events):
+            all_events[target_index] = events
+            if eventsfn is not None:
+                eventsfn(all_events)
+
+        async def target_events(target_index, target):
+            all_events[target_index] = await get_events(
+                target.urls,
+                datafn=self.get_data_fn,
+                only_words=self.only_words,
+                jobs_cache=self.jobs_cache,
+                eventsfn=functools.partial(target_eventsfn, target_index),
+                history=self.history,
+                bucketers=self.bucketers,
+                jobs_wanted=self.until.wants_jobs if self.until else None,
+                timings=self.timings,
+            )
+
+        # All the targets share one HTTP client, so --max-requests limits
+        # how many requests are made at once.
+        async with trio.open_nursery() as nursery:
+            for target_index, target in enumerate(self.targets):
+                nursery.start_soon(target_events, target_index, target)
+
+        if self.scheduler is not None:
+            self.scheduler.next_due = next_transition(
+                [runs for events in all_events for runs in events]
+            )
+        self.all_events = all_events
+        self.timings.end_poll()
+        return all_events
+
+    def show(self, all_events):
+        """Update our status and output for new events."""
+        if self.output_format == "ndjson":
+            self.status = Status(done=True, succeeded=True)
+            for events in all_events:
+                self.status.add(events_status(events))
+            for record in self.transitions.changes(all_events):
+                write_record(record)
+        else:
+            self.status, self.output = self.render(all_events)
+
+    def screen_output(self):
+        """The output to show on the live screen, with status lines."""
+        output = self.output
+        status_line = self.scheduler.describe() if self.scheduler else ""
+        if status_line:
+            output += f"[dim]{status_line}[/]\n"
+        timings_line = self.timings.describe()
+        if timings_line:
+            output += f"[dim]{timings_line}[/]\n"
+        return output
+
+    def update_screen(self, screen):
+        with self.timings.span("screen"):
+            screen.update(self.screen_output())
+
+    def render(self, all_events):
+        """
+        Make the markup to display, and the Status of all the targets.
+
+        `all_events` is a list of events for each target.
+
+        """
+        status = Status(done=True, succeeded=True)
+        output = ""
+        for target, events in zip(self.targets, all_events):
+            stream = io.StringIO()
+            with self.timings.span("draw"):
+                tstatus = draw_events_status(
+                    events, outfn=lambda s: print(s, file=stream)
+                )
+            status.add(tstatus)
+            if target.label is not None:
+                output += target_heading(target, tstatus)
+            output += stream.getvalue()
+        if self.message:
+            output = f"{self.message}\n{output}"
+        return status, output
+
+    def update_terminal_progress(self):
+        finished = self.status.num_succeeded + self.status.num_failed
+        percent_done = finished * 100 // (self.status.total or 1)
+        state = 2 if self.status.num_failed else 1
+        osc_9_4(state, percent_done)
+
+    def clear_terminal_progress(self):
+        osc_9_4(0, 0)
+
+
+def write_record(record):
+    """Write one line of NDJSON output."""
+    sys.stdout.write(dumps(record) + "\n")
+    sys.stdout.flush()
+
+
+def target_heading(target, status):
+    """The markup for the heading of one target's section."""
+    if not status.done:
+        summary = "in_progress"
+    elif status.succeeded:
+        summary = "success"
+    else:
+        summary = "failure"
+    style = CSTYLES.get(summary, "default")
+    icon = CICONS[summary]
+    counts = f"{status.num_succeeded + status.num_failed}/{status.total} jobs done"
+    if status.num_failed:
+        counts += f", {status.num_failed} failed"
+    return (
+        f"[reverse] {target.label} [/] [{style}]{icon} {summary}[/]"
+        + f"  [dim]{counts}[/]\n"
+    )
+
+
+def osc_9_4(st, pr):
+    sys.stdout.write(f"\033]9;4;{st};{pr}\033\\")
+    sys.stdout.flush()
@@ -0,0 +1,169 @@
+"""
+Receive GitHub webhook deliveries, to hear about changes as they happen.
+
+GitHub can't reach a laptop directly, so deliveries are forwarded to a local
+port by a relay or tunnel (for example, ``gh webhook forward``).  We handle
+``workflow_run`` and ``workflow_job`` events, and accept but ignore others.
+
+If the WATCHGHA_WEBHOOK_SECRET environment variable is set, deliveries must be
+signed with it, as GitHub does when the webhook has a secret.
+
+"""
+
+import functools
+import hashlib
+import hmac
+import json
+import os
+
+import h11
+import trio
+
+from .data_core import job_sort_key
+from .jobs_cache import repo_key
+from .model import Job, Run
+
+
+# GitHub caps webhook payloads at 25 MB.
+MAX_PAYLOAD_BYTES = 25 * 1024 * 1024
+
+# How long a client has to send its request, in seconds.
+REQUEST_TIMEOUT = 10
+
+# The events we can use.
+WEBHOOK_EVENTS = {"workflow_run", "workflow_job"}
+
+
+def webhook_secret():
+    # $set_env.py: WATCHGHA_WEBHOOK_SECRET - the secret to check webhook signatures.
+    return os.environ.get("WATCHGHA_WEBHOOK_SECRET") or None
+
+
+def signature(secret, body):
+    """The X-Hub-Signature-256 header value for `body`."""
+    digest = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def parse_address(address):
+    """Parse a "[HOST:]PORT" string into (host, port)."""
+    host, _, port = address.rpartition(":")
+    try:
+        return (host or "127.0.0.1", int(port))
+    except ValueError:
+        raise ValueError(f"Don't understand address {address!r}") from None
+
+
+async def serve_webhooks(
+    host, port, deliverfn, secret=None, task_status=trio.TASK_STATUS_IGNORED
+):
+    """
+    Listen for webhook deliveries on `host` and `port` until cancelled.
+
+    `deliverfn` is called with the event name and the parsed payload of each
+    workflow_run or workflow_job delivery.  The listeners are passed to
+    `task_status.started`, so a caller can find the port if it was 0.
+
+    """
+
+    async def handler(stream):
+        await handle_connection(stream, deliverfn, secret)
+
+    await trio.serve_tcp(handler, port, host=host, task_status=task_status)
+
+
+async def handle_connection(stream, deliverfn, secret):
+    """Read one request from `stream`, and answer it."""
+    conn = h11.Connection(h11.SERVER, max_incomplete_event_size=64 * 1024)
+    request = None
+    body = bytearray()
+    try:
+        # Clients that are slow or silent don't get to hold the connection open.
+        with trio.move_on_after(REQUEST_TIMEOUT) as reading:
+            while True:
+                event = conn.next_event()
+                if event is h11.NEED_DATA:
+                    conn.receive_data(await stream.receive_some())
+                elif isinstance(event, h11.Request):
+                    request = event
+                elif isinstance(event, h11.Data):
+                    body += event.data
+                    if len(body) > MAX_PAYLOAD_BYTES:
+                        await respond(stream, conn, 413)
+                        return
+                elif isinstance(event, (h11.EndOfMessage, h11.ConnectionClosed)):
+                    break
+        if reading.cancelled_caught or request is None:
+            return
+        status = handle_request(request, bytes(body), deliverfn, secret)
+        await respond(stream, conn, status)
+    except (h11.RemoteProtocolError, trio.BrokenResourceError):
+        pass
+    finally:
+        await stream.aclose()
+
+
+def handle_request(request, body, deliverfn, secret):
+    """Deliver a webhook request, and return the HTTP status to answer with."""
+    if request.method != b"POST":
+        return 405
+    headers = {name.decode("ascii"): value for name, value in request.headers}
+    if secret is not None:
+        sig = headers.get("x-hub-signature-256", b"").decode("ascii", "replace")
+        if not hmac.compare_digest(sig, signature(secret, body)):
+            return 401
+    event_name = headers.get("x-github-event", b"").decode("ascii", "replace")
+    if event_name not in WEBHOOK_EVENTS:
+        # Pings and other events are fine, we just don't need them.
+        return 204
+    try:
+        payload = json.loads(body)
+        deliverfn(event_name, payload)
+    except (ValueError, KeyError, TypeError):
+        # Not JSON, or not shaped like a GitHub payload.
+        return 400
+    return 204
+
+
+async def respond(stream, conn, status):
+    headers = [("Content-Length", "0"), ("Connection", "close")]
+    await stream.send_all(conn.send(h11.Response(status_code=status, headers=headers)))
+    await stream.send_all(conn.send(h11.EndOfMessage()))
+
+
+def apply_delivery(events, event_name, payload, bucketers):
+    """
+    Update the runs in `events` from a webhook delivery.
+
+    Returns True if something changed, or False if not.  Returns None if the
+    delivery is about a run or an attempt we don't have, so we need to get the
+    runs again to know where it belongs.
+
+    """
+    runs = {run.id: run for event_runs in events for run in event_runs}
+    if event_name == "workflow_run":
+        new_run = Run.from_json(payload["workflow_run"])
+        run = runs.get(new_run.id)
+        if run is None or run.run_attempt != new_run.run_attempt:
+            return None
+        for name in Run.__slots__:
+            if name != "jobs":
+                setattr(run, name, getattr(new_run, name))
+        return True
+
+    elif event_name == "workflow_job":
+        data = payload["workflow_job"]
+        run = runs.get(data["run_id"])
+        if run is None or run.run_attempt != data.get("run_attempt", 1):
+            return None
+        if run.jobs is None:
+            # The jobs are being fetched now anyway.
+            return False
+        job = Job.from_json(data)
+        jobs = [j for j in run.jobs if j.id != job.id] + [job]
+        bucketer = bucketers.for_repo(repo_key(run))
+        jobs.sort(key=functools.partial(job_sort_key, bucketer=bucketer))
+        run.jobs = jobs
+        return True
+
+    return False
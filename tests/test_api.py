@@ -0,0 +1,132 @@
+import datetime
+
+import anyio
+import httpx
+import pytest
+
+from watchgha.api import repo_target, watch
+from watchgha.http_help import Http
+from watchgha.sample_data import sample_datafn
+from watchgha.targets import Target
+
+BACKENDS = ["asyncio", "trio"]
+
+
+def run_json(run_id, status, started):
+    return {
+        "id": run_id,
+        "name": f"CI {run_id}",
+        "display_title": "A commit",
+        "head_branch": "main",
+        "head_sha": "4b2ff58124791953563fdb52e40d9ab79d274d9a",
+        "event": "push",
+        "status": status,
+        "conclusion": "success" if status == "completed" else None,
+        "run_attempt": 1,
+        "run_started_at": started,
+        "html_url": f"https://github.com/owner/repo/actions/runs/{run_id}",
+        "jobs_url": f"https://api.github.com/repos/owner/repo/actions/runs/{run_id}/jobs",
+    }
+
+
+def finishing_transport(calls):
+    """A repo with one run, in progress the first time, then successful."""
+    started = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+    def handler(request):
+        calls.append(request.url.path)
+        if request.url.path.startswith("/repos/owner/missing/"):
+            return httpx.Response(404, json={"message": "Not Found"})
+        done = calls.count(request.url.path) > 1
+        status = "completed" if done else "in_progress"
+        conclusion = "success" if done else None
+        if request.url.path.endswith("/jobs"):
+            job = {
+                "id": 2,
+                "name": "Tests",
+                "status": status,
+                "conclusion": conclusion,
+                "created_at": started,
+                "steps": [],
+            }
+            return httpx.Response(200, json={"total_count": 1, "jobs": [job]})
+        run = run_json(1, status, started)
+        return httpx.Response(200, json={"total_count": 1, "workflow_runs": [run]})
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_watch_until_done(backend):
+    calls = []
+    http = Http(transport=finishing_transport(calls))
+    targets = [
+        repo_target("owner/repo", branch="main"),
+        repo_target("owner/missing", sha="4b2ff58124791953563fdb52e40d9ab79d274d9a"),
+    ]
+
+    async def go():
+        snapshots = [s async for s in watch(targets, poll=0, http=http)]
+        await http.aclose()
+        return snapshots
+
+    first, missing, last = anyio.run(go, backend=backend)
+    assert first.target.label == "owner/repo main"
+    assert (first.status.done, first.final) == (False, False)
+    assert [c["type"] for c in first.changes] == ["run", "job"]
+    assert missing.final
+    assert "Not Found" in missing.error
+    assert last.target is first.target
+    assert (last.status.done, last.status.succeeded, last.final) == (True, True, True)
+    assert [c["status"] for c in last.changes] == ["completed", "completed"]
+    # The missing repo was only asked for once.
+    assert sum("/missing/" in path for path in calls) == 1
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_stop_watching_early(backend):
+    async def go():
+        snapshots = watch([Target(["demo:one"])], datafn=sample_datafn)
+        try:
+            async for snapshot in snapshots:
+                return snapshot
+        finally:
+            await snapshots.aclose()
+
+    snapshot = anyio.run(go, backend=backend)
+    assert not snapshot.final
+    assert snapshot.status.total > 0
+    assert {"run", "job"} == {change["type"] for change in snapshot.changes}
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_finished_jobs_are_fetched_once(backend):
+    # Run 1 is done, run 2 takes three polls to finish.
+    started = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    calls = []
+
+    async def datafn(url):
+        calls.append(url)
+        polls = sum("/jobs" not in call for call in calls)
+        status = "completed" if polls >= 3 else "in_progress"
+        if "/jobs" in url:
+            run_id = int(url.split("/")[-2])
+            job = {
+                "id": run_id * 10,
+                "name": "Tests",
+                "status": "completed" if run_id == 1 else status,
+                "created_at": started,
+                "steps": [],
+            }
+            return {"total_count": 1, "jobs": [job]}
+        runs = [run_json(1, "completed", started), run_json(2, status, started)]
+        return {"total_count": 2, "workflow_runs": runs}
+
+    async def go():
+        target = repo_target("owner/repo", branch="main")
+        return [s async for s in watch([target], poll=0, datafn=datafn)]
+
+    snapshots = anyio.run(go, backend=backend)
+    assert snapshots[-1].final
+    assert sum("/runs/1/jobs" in call for call in calls) == 1
+    assert sum("/runs/2/jobs" in call for call in calls) == 3
@@ -0,0 +1,43 @@
+import datetime
+
+from watchgha.bucketer import DatetimeBucketer, RepoBucketers
+
+
+T0 = datetime.datetime(2025, 3, 25, 12, 0, 0, tzinfo=datetime.timezone.utc)
+
+
+def secs(n):
+    return T0 + datetime.timedelta(seconds=n)
+
+
+def test_defuzz():
+    bucketer = DatetimeBucketer(5)
+    assert bucketer.defuzz(secs(0)) == secs(0)
+    assert bucketer.defuzz(secs(2)) == secs(0)
+    assert bucketer.defuzz(secs(100)) == secs(100)
+    assert len(bucketer) == 2
+
+
+def test_forget_before():
+    bucketer = DatetimeBucketer(5)
+    for n in range(0, 1000, 100):
+        bucketer.defuzz(secs(n))
+    bucketer.forget_before(secs(500))
+    assert len(bucketer) == 5
+    assert bucketer.sorted == [secs(n) for n in range(500, 1000, 100)]
+    # A forgotten instant doesn't attract nearby times any more.
+    assert bucketer.defuzz(secs(2)) == secs(2)
+    assert bucketer.defuzz(secs(502)) == secs(500)
+
+
+def test_repo_bucketers():
+    bucketers = RepoBucketers(5)
+    assert bucketers.for_repo("a").defuzz(secs(0)) == secs(0)
+    # Another repo doesn't share the instants.
+    assert bucketers.for_repo("b").defuzz(secs(2)) == secs(2)
+    assert bucketers.for_repo("a").defuzz(secs(2)) == secs(0)
+    assert len(bucketers) == 2
+    bucketers.for_repo("b").defuzz(secs(100))
+    bucketers.forget_before(secs(50))
+    assert list(bucketers.bucketers) == ["b"]
+    assert len(bucketers) == 1
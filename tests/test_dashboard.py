@@ -0,0 +1,30 @@
+import trio
+
+from watchgha.sample_data import sample_datafn
+from watchgha.targets import Target
+from watchgha.watcher import GhaWatcher
+
+
+def test_dashboard():
+    requested = []
+
+    async def datafn(url):
+        requested.append(url)
+        return await sample_datafn(url)
+
+    watcher = GhaWatcher(
+        targets=[Target(["demo:one"], label="first"), Target(["demo:one"], label="second")],
+        get_data_fn=datafn,
+        only_words=None,
+        message=None,
+    )
+    output = trio.run(watcher.get_gha_display)
+    # Each target gets a section with a heading.
+    assert output.index(" first ") < output.index(" second ")
+    one_section = output.split(" second ")[1]
+    assert output.count("\n") == 2 * one_section.count("\n")
+    # Both targets were fetched through the same data function.
+    assert requested.count("demo:one") == 2
+    # The status is the combination of all the targets.
+    assert not watcher.status.done
+    assert watcher.status.total > 0
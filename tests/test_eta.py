@@ -0,0 +1,134 @@
+import datetime
+
+from watchgha import eta
+from watchgha.eta import DurationHistory, next_transition
+from watchgha.model import Job, Run
+
+
+NOW = datetime.datetime(2025, 3, 25, 12, 0, 0, tzinfo=datetime.timezone.utc)
+
+
+def iso(minutes):
+    """An ISO time string for `minutes` after NOW."""
+    return (NOW + datetime.timedelta(minutes=minutes)).isoformat()
+
+
+def step(name, status, start=None, end=None):
+    return {
+        "name": name,
+        "status": status,
+        "conclusion": "success" if status == "completed" else None,
+        "started_at": iso(start) if start is not None else None,
+        "completed_at": iso(end) if end is not None else None,
+    }
+
+
+def job(**kwargs):
+    return Job.from_json({"created_at": iso(-60), **kwargs})
+
+
+def run(status, jobs, repo="owner/repo"):
+    run = Run()
+    run.name = "Tests"
+    run.html_url = f"https://github.com/{repo}/actions/runs/1"
+    run.status = status
+    run.jobs = jobs
+    return run
+
+
+RUN = run("in_progress", None)
+
+FINISHED_JOB = job(**{
+    "id": 1,
+    "name": "Py 3.12",
+    "status": "completed",
+    "conclusion": "success",
+    "started_at": iso(-60),
+    "completed_at": iso(-48),
+    "steps": [
+        step("Set up", "completed", -60, -58),
+        step("Run tests", "completed", -58, -49),
+        step("Clean up", "completed", -49, -48),
+    ],
+})
+
+
+def test_predict_from_steps():
+    history = DurationHistory()
+    history.learn(RUN, [FINISHED_JOB])
+    new_job = job(
+        id=2,
+        name="Py 3.12",
+        status="in_progress",
+        started_at=iso(-5),
+        steps=[
+            step("Set up", "completed", -5, -3),
+            step("Run tests", "in_progress", -3),
+            step("Clean up", "queued"),
+        ],
+    )
+    # Run tests has 6 of its 9 minutes left, then one minute for Clean up.
+    assert history.predict(RUN, new_job, NOW) == NOW + datetime.timedelta(minutes=7)
+
+
+def test_repos_are_kept_apart():
+    history = DurationHistory()
+    history.learn(RUN, [FINISHED_JOB])
+    new_job = job(
+        id=2,
+        name="Py 3.12",
+        status="in_progress",
+        started_at=iso(-5),
+        steps=[step("Set up", "in_progress", -5)],
+    )
+    assert history.predict(RUN, new_job, NOW) is not None
+    other_run = run("in_progress", None, repo="someone/else")
+    assert history.predict(other_run, new_job, NOW) is None
+
+
+def test_predict_from_job():
+    history = DurationHistory()
+    history.learn(RUN, [FINISHED_JOB])
+    new_job = job(
+        id=2,
+        name="Py 3.12",
+        status="in_progress",
+        started_at=iso(-5),
+        steps=[step("Something new", "in_progress", -5)],
+    )
+    assert history.predict(RUN, new_job, NOW) == NOW + datetime.timedelta(minutes=7)
+
+
+def test_no_prediction():
+    history = DurationHistory()
+    history.learn(RUN, [FINISHED_JOB])
+    new_job = job(id=3, name="Py 3.13", status="in_progress", started_at=iso(-5))
+    assert history.predict(RUN, new_job, NOW) is None
+
+
+def test_next_transition():
+    eta = NOW + datetime.timedelta(minutes=7)
+
+    def job_eta(status, eta=None):
+        j = job(id=4, name="Py", status=status)
+        j.eta = eta
+        return j
+
+    jobs = [
+        job_eta("completed"),
+        job_eta("in_progress", eta + datetime.timedelta(minutes=1)),
+        job_eta("in_progress", eta),
+    ]
+    events = [[run("completed", []), run("in_progress", jobs)]]
+    assert next_transition(events) == eta.timestamp()
+    # A queued job could start at any time.
+    jobs.append(job_eta("queued"))
+    assert next_transition(events) is None
+
+
+def test_learned_is_limited(monkeypatch):
+    monkeypatch.setattr(eta, "MAX_LEARNED", 3)
+    history = DurationHistory()
+    for job_id in range(5):
+        history.learn(RUN, [job(**{**FINISHED_JOB.to_json(), "id": job_id})])
+    assert list(history.learned) == [2, 3, 4]
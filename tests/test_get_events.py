@@ -0,0 +1,89 @@
+import datetime
+import urllib.parse
+
+import trio
+
+from watchgha.data_core import get_all_pages, get_events, past_cutoff
+from watchgha.sample_data import sample_datafn
+
+
+def test_eventsfn_sees_runs_before_jobs():
+    num_with_jobs = []
+
+    def eventsfn(events):
+        runs = [run for event_runs in events for run in event_runs]
+        num_with_jobs.append(sum(run.jobs is not None for run in runs))
+
+    events = trio.run(get_events, ["demo:one"], sample_datafn, None, None, eventsfn)
+
+    # First all the runs, with no jobs, then one more each time jobs arrive.
+    assert num_with_jobs == list(range(8))
+    assert all(run.jobs is not None for run in events[0])
+
+
+def paged_datafn(items, key, requested, per_page=100):
+    """A datafn serving `items` in pages, recording the pages requested."""
+
+    async def datafn(url):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+        page = int(query.get("page", ["1"])[0])
+        requested.append(page)
+        start = (page - 1) * per_page
+        return {"total_count": len(items), key: items[start : start + per_page]}
+
+    return datafn
+
+
+def test_get_all_pages():
+    jobs = [{"id": i} for i in range(250)]
+    requested = []
+    datafn = paged_datafn(jobs, "jobs", requested)
+    got = trio.run(get_all_pages, datafn, "https://x.com/jobs?per_page=100", "jobs")
+    assert got == jobs
+    assert sorted(requested) == [1, 2, 3]
+
+
+def test_get_all_pages_without_duplicates():
+    jobs = [{"id": i} for i in range(250)]
+    requested = []
+    serve = paged_datafn(jobs, "jobs", requested)
+
+    async def datafn(url):
+        data = await serve(url)
+        if len(requested) == 1:
+            # A new job arrives after the first page, and pushes the rest along.
+            jobs.insert(0, {"id": 1000})
+        return data
+
+    got = trio.run(get_all_pages, datafn, "https://x.com/jobs?per_page=100", "jobs")
+    ids = [job["id"] for job in got]
+    assert len(ids) == len(set(ids))
+    assert ids[:100] == list(range(100))
+
+
+def test_get_all_pages_stops_early():
+    runs = [{"id": i} for i in range(1000)]
+    requested = []
+    datafn = paged_datafn(runs, "workflow_runs", requested)
+    got = trio.run(
+        get_all_pages,
+        datafn,
+        "https://x.com/runs?per_page=100",
+        "workflow_runs",
+        lambda items: items[-1]["id"] > 300,
+    )
+    # The first page, then one batch of four pages.
+    assert got == runs[:500]
+    assert sorted(requested) == [1, 2, 3, 4, 5]
+
+
+def test_past_cutoff_allows_for_reruns():
+    def created(days_ago):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        when = now - datetime.timedelta(days=days_ago)
+        return [{"created_at": when.isoformat(), "run_started_at": now.isoformat()}]
+
+    # Created two weeks ago, but it could have been re-run today.
+    assert not past_cutoff(created(14))
+    # Too old to have been re-run in the last week.
+    assert past_cutoff(created(40))
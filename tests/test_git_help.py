@@ -0,0 +1,100 @@
+import dulwich.repo
+import pytest
+
+from watchgha.git_help import (
+    GitFastPathError,
+    git_branch,
+    git_repo_urls,
+    parse_config,
+    read_branch,
+    read_remote_urls,
+)
+
+CONFIG = """\
+[core]
+\tbare = false
+[remote "origin"]
+\turl = https://github.com/owner/repo.git
+\tfetch = +refs/heads/*:refs/remotes/origin/*
+; A comment
+[Remote "with \\"quotes\\""]
+\tURL = "git@github.com:someone/else.git"  # the fork
+[branch "main"]
+\tremote = origin
+"""
+
+
+def make_repo(path, config=CONFIG, head="ref: refs/heads/main\n"):
+    git_dir = path / ".git"
+    git_dir.mkdir(parents=True)
+    (git_dir / "config").write_text(config)
+    (git_dir / "HEAD").write_text(head)
+    return git_dir
+
+
+def test_parse_config():
+    config = parse_config(CONFIG)
+    assert config[("remote", 'with "quotes"')] == {
+        "url": ["git@github.com:someone/else.git"]
+    }
+    assert config[("core", None)] == {"bare": ["false"]}
+
+
+def test_plain_repo(tmp_path):
+    make_repo(tmp_path)
+    assert read_remote_urls(tmp_path) == [
+        "https://github.com/owner/repo.git",
+        "git@github.com:someone/else.git",
+    ]
+    assert read_branch(tmp_path) == "main"
+
+
+def test_worktree(tmp_path):
+    git_dir = make_repo(tmp_path / "main")
+    wt_git_dir = git_dir / "worktrees" / "feature"
+    wt_git_dir.mkdir(parents=True)
+    (wt_git_dir / "HEAD").write_text("ref: refs/heads/nedbat/feature\n")
+    (wt_git_dir / "commondir").write_text("../..\n")
+    work_tree = tmp_path / "feature"
+    work_tree.mkdir()
+    (work_tree / ".git").write_text("gitdir: ../main/.git/worktrees/feature\n")
+    assert read_remote_urls(work_tree)[0] == "https://github.com/owner/repo.git"
+    assert read_branch(work_tree) == "nedbat/feature"
+
+
+def test_symbolic_branch(tmp_path):
+    git_dir = make_repo(tmp_path, head="ref: refs/heads/alias\n")
+    (git_dir / "refs" / "heads").mkdir(parents=True)
+    (git_dir / "refs" / "heads" / "alias").write_text("ref: refs/heads/real\n")
+    # "real" is only in packed-refs, so it has no file of its own.
+    (git_dir / "packed-refs").write_text(f"{'1' * 40} refs/heads/real\n")
+    assert read_branch(tmp_path) == "real"
+
+
+def test_detached_head(tmp_path):
+    make_repo(tmp_path, head="1234567890123456789012345678901234567890\n")
+    with pytest.raises(GitFastPathError):
+        read_branch(tmp_path)
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        '[include]\n\tpath = other.config\n[remote "origin"]\n\turl = x\n',
+        '[remote.origin]\n\turl = x\n',
+        '[remote "origin"]\n\turl = "x\n',
+    ],
+)
+def test_unusual_config(config):
+    with pytest.raises(GitFastPathError):
+        parse_config(config)
+
+
+def test_dulwich_fallback(tmp_path):
+    dulwich.repo.Repo.init(str(tmp_path))
+    with open(tmp_path / ".git" / "config", "a") as config:
+        config.write('[remote.origin]\n\turl = https://github.com/old/style.git\n')
+    with pytest.raises(GitFastPathError):
+        read_remote_urls(tmp_path)
+    assert list(git_repo_urls(str(tmp_path))) == ["https://github.com/old/style.git"]
+    assert git_branch(str(tmp_path)) == "master"
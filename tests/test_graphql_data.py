@@ -0,0 +1,196 @@
+import json
+
+import httpx
+import pytest
+import trio
+
+from watchgha.data_core import get_events
+from watchgha.graphql_data import GraphQLData, graphql_url
+from watchgha.http_help import Http
+from watchgha.sample_data import NOW
+from watchgha.utils import WatchGhaError
+
+
+def check_suite(run_id, name, status, conclusion, check_runs, next_cursor=None):
+    return {
+        "id": f"CS_{run_id}",
+        "status": status,
+        "conclusion": conclusion,
+        "createdAt": NOW.isoformat(),
+        "branch": {"name": "main"},
+        "workflowRun": {
+            "databaseId": run_id,
+            "url": f"https://github.com/owner/repo/actions/runs/{run_id}",
+            "event": "PUSH",
+            "createdAt": NOW.isoformat(),
+            "workflow": {"name": name},
+        },
+        "checkRuns": page(check_runs, next_cursor),
+    }
+
+
+def page(nodes, next_cursor=None):
+    return {
+        "pageInfo": {"hasNextPage": next_cursor is not None, "endCursor": next_cursor},
+        "nodes": list(nodes),
+    }
+
+
+def check_run(job_id, name, status, conclusion, steps=(), more_steps=False):
+    return {
+        "databaseId": job_id,
+        "name": name,
+        "status": status,
+        "conclusion": conclusion,
+        "startedAt": NOW.isoformat(),
+        "completedAt": None,
+        "steps": {"pageInfo": {"hasNextPage": more_steps}, "nodes": list(steps)},
+    }
+
+
+GRAPHQL_RESPONSE = {
+    "data": {
+        "repository": {
+            "object": {
+                "oid": "4b2ff58124791953563fdb52e40d9ab79d274d9a",
+                "messageHeadline": "fix: most awesome fix",
+                "checkSuites": {
+                    "pageInfo": {"hasNextPage": False, "endCursor": None},
+                    "nodes": [
+                        check_suite(
+                            101,
+                            "Tests",
+                            "IN_PROGRESS",
+                            None,
+                            [
+                                check_run(
+                                    1,
+                                    "Py 3.12",
+                                    "IN_PROGRESS",
+                                    None,
+                                    [
+                                        {
+                                            "name": "Run tests",
+                                            "number": 1,
+                                            "status": "IN_PROGRESS",
+                                            "conclusion": None,
+                                            "startedAt": None,
+                                            "completedAt": None,
+                                        },
+                                    ],
+                                ),
+                                check_run(2, "Py 3.13", "COMPLETED", "SUCCESS"),
+                            ],
+                        ),
+                        check_suite(
+                            102,
+                            "Docs",
+                            "COMPLETED",
+                            "FAILURE",
+                            [check_run(3, "Build", "COMPLETED", "FAILURE")],
+                        ),
+                    ],
+                },
+            },
+        },
+    },
+}
+
+
+def test_graphql_url(monkeypatch):
+    monkeypatch.delenv("GITHUB_GRAPHQL_URL", raising=False)
+    assert graphql_url("https://api.github.com") == "https://api.github.com/graphql"
+    assert (
+        graphql_url("https://ghe.example.com/api/v3")
+        == "https://ghe.example.com/api/graphql"
+    )
+
+
+def test_one_query_for_everything():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=GRAPHQL_RESPONSE)
+
+    http = Http(transport=httpx.MockTransport(handler))
+    graphql = GraphQLData(http)
+    url = "https://api.github.com/repos/owner/repo/actions/runs?per_page=100&branch=main"
+    events = trio.run(get_events, [url], graphql.get_json, None)
+    trio.run(http.aclose)
+
+    assert len(requests) == 1
+    assert str(requests[0].url) == "https://api.github.com/graphql"
+    variables = json.loads(requests[0].content)["variables"]
+    assert variables["owner"] == "owner"
+    assert variables["expr"] == "refs/heads/main"
+
+    [runs] = events
+    summary = {
+        run.name: (
+            run.status,
+            run.conclusion,
+            [(job.name, job.status, job.conclusion) for job in run.jobs],
+        )
+        for run in runs
+    }
+    assert summary == {
+        "Tests": (
+            "in_progress",
+            None,
+            [("Py 3.12", "in_progress", None), ("Py 3.13", "completed", "success")],
+        ),
+        "Docs": ("completed", "failure", [("Build", "completed", "failure")]),
+    }
+    assert {run.run_attempt for run in runs} == {None}
+
+
+def commit_response(suites):
+    return {
+        "data": {
+            "repository": {
+                "object": {
+                    "oid": "4b2ff58124791953563fdb52e40d9ab79d274d9a",
+                    "messageHeadline": "fix: most awesome fix",
+                    "checkSuites": page(suites),
+                },
+            },
+        },
+    }
+
+
+def get_graphql_events(handler):
+    http = Http(transport=httpx.MockTransport(handler))
+    graphql = GraphQLData(http)
+    url = "https://api.github.com/repos/owner/repo/actions/runs?per_page=100&branch=main"
+    try:
+        return trio.run(get_events, [url], graphql.get_json, None)
+    finally:
+        trio.run(http.aclose)
+
+
+def test_many_check_runs():
+    first = [check_run(i, f"Job {i}", "COMPLETED", "SUCCESS") for i in range(100)]
+    rest = [check_run(i, f"Job {i}", "COMPLETED", "SUCCESS") for i in range(100, 150)]
+    queries = []
+
+    def handler(request):
+        variables = json.loads(request.content)["variables"]
+        queries.append(variables)
+        if "id" in variables:
+            assert variables == {"id": "CS_101", "after": "cursor100"}
+            return httpx.Response(200, json={"data": {"node": {"checkRuns": page(rest)}}})
+        suite = check_suite(101, "Tests", "COMPLETED", "SUCCESS", first, "cursor100")
+        return httpx.Response(200, json=commit_response([suite]))
+
+    [[run]] = get_graphql_events(handler)
+    assert len(queries) == 2
+    assert [job.name for job in run.jobs] == [f"Job {i}" for i in range(150)]
+
+
+def test_too_many_steps():
+    graphql = GraphQLData(http=None)
+    job = check_run(1, "Huge", "IN_PROGRESS", None, more_steps=True)
+    suite = check_suite(101, "Tests", "IN_PROGRESS", None, [job])
+    with pytest.raises(WatchGhaError, match="'Huge' has more than 100 steps"):
+        graphql.job_from_check_run(job, suite)
@@ -0,0 +1,183 @@
+import httpx
+import pytest
+import trio
+import trio.testing
+
+from watchgha.http_help import Http
+from watchgha.utils import WatchGhaError
+
+
+def counting_transport(calls):
+    def handler(request):
+        calls.append(str(request.url))
+        return httpx.Response(200, json={"url": str(request.url)})
+
+    return httpx.MockTransport(handler)
+
+
+def test_one_client_for_all_requests():
+    calls = []
+    http = Http(transport=counting_transport(calls))
+
+    async def go():
+        await http.get_data("https://api.example.com/one")
+        client = http.client
+        await http.get_data("https://api.example.com/two")
+        assert http.client is client
+        await http.aclose()
+
+    trio.run(go)
+    assert calls == ["https://api.example.com/one", "https://api.example.com/two"]
+    assert http.client is None
+
+
+def etag_transport(calls):
+    """A server that answers If-None-Match with 304 Not Modified."""
+
+    def handler(request):
+        calls.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, json={"answer": 42}, headers={"ETag": '"v1"'})
+
+    return httpx.MockTransport(handler)
+
+
+def test_conditional_requests():
+    calls = []
+    http = Http(transport=etag_transport(calls))
+
+    async def go():
+        first = await http.get_json("https://api.example.com/data")
+        second = await http.get_json("https://api.example.com/data")
+        assert first == {"answer": 42}
+        assert second is first
+        assert await http.get_data("https://api.example.com/data") == '{"answer":42}'
+        await http.aclose()
+
+    trio.run(go)
+    assert calls == [None, '"v1"', '"v1"']
+    assert (http.stats.hits, http.stats.misses) == (2, 1)
+
+
+def test_secondary_rate_limit_backoff():
+    calls = []
+
+    def handler(request):
+        calls.append(trio.current_time())
+        if len(calls) == 1:
+            return httpx.Response(
+                429,
+                json={"message": "You have exceeded a secondary rate limit."},
+                headers={"Retry-After": "30"},
+            )
+        return httpx.Response(
+            200,
+            json={"ok": True},
+            headers={
+                "X-RateLimit-Limit": "5000",
+                "X-RateLimit-Remaining": "4321",
+                "X-RateLimit-Reset": "1700000000",
+            },
+        )
+
+    http = Http(transport=httpx.MockTransport(handler))
+
+    async def go():
+        assert await http.get_json("https://api.example.com/data") == {"ok": True}
+        await http.aclose()
+
+    trio.run(go, clock=trio.testing.MockClock(autojump_threshold=0))
+    assert calls[1] - calls[0] == 30
+    assert http.rate_limit.limit == 5000
+    assert http.rate_limit.remaining == 4321
+    assert http.rate_limit.num_charged == 2
+
+
+def test_concurrent_requests_are_limited_and_shared():
+    calls = []
+    in_flight = [0, 0]  # now, most
+
+    async def handler(request):
+        calls.append(str(request.url))
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight)
+        await trio.sleep(1)
+        in_flight[0] -= 1
+        return httpx.Response(200, json={"url": str(request.url)})
+
+    http = Http(max_requests=3, transport=httpx.MockTransport(handler))
+    urls = [f"https://api.example.com/{n}" for n in range(10)]
+
+    async def go():
+        async with trio.open_nursery() as nursery:
+            for url in urls + urls[:4]:
+                nursery.start_soon(http.get_json, url)
+        await http.aclose()
+
+    trio.run(go, clock=trio.testing.MockClock(autojump_threshold=0))
+    assert sorted(calls) == sorted(urls)
+    assert in_flight[1] == 3
+    assert http.stats.shared == 4
+
+
+def test_retries_are_unified():
+    calls = []
+
+    def handler(request):
+        calls.append((request.url.path, trio.current_time()))
+        if request.url.path == "/missing":
+            return httpx.Response(404, json={"message": "Not Found"})
+        if len(calls) == 1:
+            raise httpx.ConnectError("Connection refused", request=request)
+        if len(calls) == 2:
+            return httpx.Response(502)
+        return httpx.Response(200, json={"ok": True})
+
+    http = Http(transport=httpx.MockTransport(handler))
+
+    async def go():
+        assert await http.get_json("https://api.example.com/data") == {"ok": True}
+        with pytest.raises(WatchGhaError, match="Not Found"):
+            await http.get_json("https://api.example.com/missing")
+        await http.aclose()
+
+    trio.run(go, clock=trio.testing.MockClock(autojump_threshold=0))
+    # A dropped connection and a bad gateway were retried, with backoff.
+    paths = [path for path, _ in calls]
+    assert paths == ["/data", "/data", "/data", "/missing"]
+    assert 0 < calls[1][1] - calls[0][1] < calls[2][1] - calls[0][1] <= 0.75
+    # Errors that won't go away aren't retried.
+    assert paths.count("/missing") == 1
+
+
+def test_cancelled_request_isnt_shared_as_an_error():
+    calls = []
+
+    async def handler(request):
+        calls.append(trio.current_time())
+        await trio.sleep(1)
+        return httpx.Response(200, json={"ok": True})
+
+    http = Http(transport=httpx.MockTransport(handler))
+    url = "https://api.example.com/data"
+
+    async def go():
+        results = []
+
+        async def waiter():
+            await trio.sleep(0.1)
+            results.append(await http.get_json(url))
+
+        async with trio.open_nursery() as nursery:
+            nursery.start_soon(waiter)
+            with trio.move_on_after(0.5):
+                await http.get_json(url)
+        await http.aclose()
+        return results
+
+    results = trio.run(go, clock=trio.testing.MockClock(autojump_threshold=0))
+    # The waiter made its own request when the first one was cancelled.
+    assert results == [{"ok": True}]
+    assert calls == [0, 0.5]
+    assert http.stats.shared == 0
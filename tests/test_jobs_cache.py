@@ -0,0 +1,134 @@
+import trio
+
+from watchgha.data_core import get_events
+from watchgha.jobs_cache import DiskJobsCache, JobsCache
+from watchgha.model import Job, Run
+from watchgha.sample_data import sample_datafn
+
+
+def test_finished_runs_jobs_are_fetched_once():
+    urls = []
+
+    async def counting_datafn(url):
+        urls.append(url.partition("?")[0])
+        data = await sample_datafn(url)
+        if url.startswith("demo:jobs_1"):
+            # The finished runs' jobs are finished too.
+            data = {"jobs": [dict(job, status="completed") for job in data["jobs"]]}
+        return data
+
+    jobs_cache = JobsCache()
+    events1 = trio.run(get_events, ["demo:one"], counting_datafn, None, jobs_cache)
+    first_urls = urls[:]
+    urls.clear()
+    events2 = trio.run(get_events, ["demo:one"], counting_datafn, None, jobs_cache)
+
+    # Five finished runs share one jobs URL, the two in-progress runs have
+    # their own.
+    assert len(first_urls) == 1 + 7
+    assert sorted(urls) == ["demo:jobs_malicious", "demo:jobs_tests", "demo:one"]
+
+    def jobs_by_run(events):
+        return {run.name: [j.name for j in run.jobs] for runs in events for run in runs}
+
+    assert jobs_by_run(events1) == jobs_by_run(events2)
+
+
+def test_unfinished_jobs_of_finished_runs_arent_kept():
+    # The sample's finished runs have a queued job: the runs list and the jobs
+    # can disagree for a moment, and the jobs could still change.
+    jobs_cache = JobsCache()
+    trio.run(get_events, ["demo:one"], sample_datafn, None, jobs_cache)
+    assert jobs_cache.jobs == {}
+
+
+def finished_run(run_id, attempt=1):
+    return Run.from_json(
+        {
+            "id": run_id,
+            "name": "Tests",
+            "display_title": "fix: most awesome fix",
+            "head_branch": "main",
+            "head_sha": "4b2ff58124791953563fdb52e40d9ab79d274d9a",
+            "event": "push",
+            "status": "completed",
+            "conclusion": "success",
+            "run_attempt": attempt,
+            "run_started_at": "2025-03-25T12:34:56Z",
+            "html_url": f"https://github.com/owner/repo/actions/runs/{run_id}",
+            "jobs_url": f"https://api.github.com/repos/owner/repo/actions/runs/{run_id}/jobs",
+        }
+    )
+
+
+def jobs_named(name):
+    job = {"id": 1, "name": name, "status": "completed", "created_at": "2025-03-25T12:34:56Z"}
+    return [Job.from_json(job)]
+
+
+def test_disk_cache_survives_sessions(tmp_path):
+    path = tmp_path / "jobs.sqlite"
+    cache = DiskJobsCache(path)
+    cache.put(finished_run(17), jobs_named("Test"))
+    cache.close()
+
+    cache = DiskJobsCache(path)
+    assert cache.get(finished_run(17))[0].name == "Test"
+    assert cache.get(finished_run(17))[0].created_dt.year == 2025
+    assert cache.get(finished_run(17, attempt=2)) is None
+    assert cache.get(finished_run(18)) is None
+    cache.close()
+
+
+def test_disk_cache_eviction(tmp_path):
+    cache = DiskJobsCache(tmp_path / "jobs.sqlite", max_bytes=1200)
+    jobs = jobs_named("x" * 200)
+    for run_id in range(10):
+        cache.put(finished_run(run_id), jobs)
+    cache.close()
+
+    cache = DiskJobsCache(tmp_path / "jobs.sqlite", max_bytes=1200)
+    present = [run_id for run_id in range(10) if cache.get(finished_run(run_id))]
+    assert present == [7, 8, 9]
+    cache.close()
+
+
+def test_runs_without_an_attempt_arent_kept(tmp_path):
+    cache = DiskJobsCache(tmp_path / "jobs.sqlite")
+    cache.put(finished_run(17, attempt=None), jobs_named("Test"))
+    assert cache.get(finished_run(17, attempt=None)) is None
+    cache.close()
+
+
+def test_memory_cache_is_limited():
+    cache = JobsCache(max_entries=2)
+    for run_id in range(3):
+        cache.put(finished_run(run_id), jobs_named("Test"))
+    cache.get(finished_run(1))
+    cache.put(finished_run(3), jobs_named("Test"))
+    present = [run_id for run_id in range(4) if cache.get(finished_run(run_id))]
+    assert present == [1, 3]
+
+
+def test_disk_cache_in_another_format(tmp_path):
+    path = tmp_path / "jobs.sqlite"
+    cache = DiskJobsCache(path)
+    cache.put(finished_run(17), jobs_named("Test"))
+    cache.db.execute("pragma user_version = 0")
+    cache.close()
+
+    cache = DiskJobsCache(path)
+    assert cache.get(finished_run(17)) is None
+    cache.close()
+
+
+def test_failing_disk_cache_uses_memory(tmp_path):
+    cache = DiskJobsCache(tmp_path / "jobs.sqlite")
+    cache.put(finished_run(17), jobs_named("Test"))
+    # Another watcher has the database locked, or it's broken somehow.
+    cache.db.close()
+    cache.put(finished_run(18), jobs_named("Docs"))
+    assert cache.db is None
+    assert cache.get(finished_run(18))[0].name == "Docs"
+    assert cache.get(finished_run(19)) is None
+    cache.close()
@@ -0,0 +1,69 @@
+import json
+
+import trio
+
+from watchgha.data_core import get_events
+from watchgha.model import Step
+from watchgha.ndjson import Transitions, summary_record
+from watchgha.sample_data import sample_datafn
+from watchgha.targets import Target
+from watchgha.watcher import GhaWatcher
+
+
+def sample_events():
+    return trio.run(get_events, ["demo:one"], sample_datafn, None)
+
+
+def test_transitions():
+    events = sample_events()
+    transitions = Transitions()
+    records = transitions.changes([events])
+    num_runs = sum(len(runs) for runs in events)
+    num_jobs = sum(len(run.jobs) for runs in events for run in runs)
+    assert [r["type"] for r in records].count("run") == num_runs
+    assert [r["type"] for r in records].count("job") == num_jobs
+    test_suite = [r for r in records if r["type"] == "run" and r["name"] == "Test suite"]
+    assert test_suite[0]["status"] == "in_progress"
+
+    # Nothing changed, nothing to report.
+    assert transitions.changes([sample_events()]) == []
+
+    # A job moves to its next step.
+    events = sample_events()
+    run = [run for runs in events for run in runs if run.name == "Test suite"][0]
+    job = [job for job in run.jobs if job.name == "Test suite Py 3.8"][0]
+    job.steps[4].status = "completed"
+    job.steps[5] = Step.from_json({"name": "Upload coverage", "status": "in_progress"})
+    records = transitions.changes([events])
+    assert len(records) == 1
+    assert records[0]["type"] == "job"
+    assert records[0]["id"] == job.id
+    assert records[0]["run_id"] == run.id
+    assert records[0]["step"] == "Upload coverage"
+
+    # Runs that are gone are forgotten.
+    num_states = len(transitions.states)
+    events = sample_events()
+    del events[0][0]
+    assert transitions.changes([events]) == []
+    assert len(transitions.states) < num_states
+
+
+def test_ndjson_watcher(capsys):
+    watcher = GhaWatcher(
+        targets=[Target(["demo:one"])],
+        get_data_fn=sample_datafn,
+        only_words=None,
+        message=None,
+        output_format="ndjson",
+    )
+    watcher.show(trio.run(watcher.get_all_events))
+    lines = capsys.readouterr().out.splitlines()
+    records = [json.loads(line) for line in lines]
+    assert {r["type"] for r in records} == {"run", "job"}
+    assert watcher.status.total == sum(r["type"] == "job" for r in records)
+    assert not watcher.status.done
+
+    summary = summary_record(watcher.status)
+    assert summary["type"] == "summary"
+    assert summary["total"] == watcher.status.total
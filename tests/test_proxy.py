@@ -0,0 +1,162 @@
+import json
+import os
+import stat
+
+import httpx
+import pytest
+import trio
+
+from watchgha.http_help import Http
+from watchgha.proxy import ProxyClient, ProxyServer, has_unix_sockets
+from watchgha.utils import WatchGhaError
+
+pytestmark = pytest.mark.skipif(not has_unix_sockets(), reason="Needs Unix sockets")
+
+
+def slow_transport(calls):
+    """A GitHub that takes a while to answer."""
+
+    async def handler(request):
+        calls.append(str(request.url))
+        await trio.sleep(0.1)
+        if request.url.path == "/repos/owner/missing":
+            return httpx.Response(404, json={"message": "Not Found"})
+        return httpx.Response(
+            200,
+            json={"url": str(request.url)},
+            headers={
+                "x-ratelimit-limit": "5000",
+                "x-ratelimit-remaining": "4321",
+                "x-ratelimit-reset": "1900000000",
+            },
+        )
+
+    return httpx.MockTransport(handler)
+
+
+def run_with_proxy(tmp_path, calls, clientfn):
+    """Start a proxy server, and run `clientfn` with a ProxyClient for it."""
+    path = str(tmp_path / "proxy.sock")
+    server = ProxyServer(
+        Http(transport=slow_transport(calls)), api_url="https://api.github.com"
+    )
+
+    async def go():
+        async with trio.open_nursery() as nursery:
+            await nursery.start(server.serve, path)
+            client = ProxyClient(path, Http(transport=slow_transport(calls)))
+            assert client.available()
+            await clientfn(client)
+            nursery.cancel_scope.cancel()
+
+    trio.run(go)
+    return server
+
+
+def test_identical_requests_are_shared(tmp_path):
+    calls = []
+    results = []
+
+    async def clientfn(client):
+        async def get(url):
+            results.append(await client.get_json(url))
+
+        async with trio.open_nursery() as nursery:
+            for _ in range(5):
+                nursery.start_soon(get, "https://api.github.com/repos/owner/repo/runs")
+            nursery.start_soon(get, "https://api.github.com/repos/owner/repo/other")
+        # A moment later, the recent response is used.
+        results.append(await client.get_json("https://api.github.com/repos/owner/repo/runs"))
+        assert client.http.rate_limit.remaining == 4321
+
+    server = run_with_proxy(tmp_path, calls, clientfn)
+    assert sorted(calls) == ["https://api.github.com/repos/owner/repo/other", "https://api.github.com/repos/owner/repo/runs"]
+    assert results.count({"url": "https://api.github.com/repos/owner/repo/runs"}) == 6
+    assert (server.num_requests, server.num_shared) == (7, 5)
+
+
+def test_cancelled_request_isnt_shared(tmp_path):
+    calls = []
+    server = ProxyServer(
+        Http(transport=slow_transport(calls)), api_url="https://api.github.com"
+    )
+    url = "https://api.github.com/repos/owner/repo/runs"
+    results = []
+
+    async def cancelled():
+        with trio.move_on_after(0.05):
+            await server.get_data(url)
+
+    async def waiting():
+        results.append(json.loads(await server.get_data(url)))
+
+    async def go():
+        async with trio.open_nursery() as nursery:
+            nursery.start_soon(cancelled)
+            await trio.sleep(0.01)
+            nursery.start_soon(waiting)
+        await server.http.aclose()
+
+    trio.run(go)
+    assert results == [{"url": url}]
+    assert calls == [url, url]
+
+
+def test_errors_are_passed_along(tmp_path):
+    calls = []
+
+    async def clientfn(client):
+        with pytest.raises(WatchGhaError, match="Not Found"):
+            await client.get_json("https://api.github.com/repos/owner/missing")
+
+    run_with_proxy(tmp_path, calls, clientfn)
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://attacker.example/collect",
+        "http://api.github.com/repos/owner/repo/runs",
+        "https://api.github.com.attacker.example/repos/owner/repo/runs",
+        "https://api.github.com@attacker.example/repos/owner/repo/runs",
+        "https://api.github.com/user",
+        "https://api.github.com/repos/../user",
+    ],
+)
+def test_only_github_repo_urls(tmp_path, url):
+    calls = []
+
+    async def clientfn(client):
+        with pytest.raises(WatchGhaError, match="Not a GitHub API repo URL"):
+            await client.get_json(url)
+
+    run_with_proxy(tmp_path, calls, clientfn)
+    assert calls == []
+
+
+def test_private_socket(tmp_path):
+    async def clientfn(client):
+        mode = os.stat(client.path).st_mode
+        assert stat.S_ISSOCK(mode)
+        assert mode & 0o077 == 0
+
+    run_with_proxy(tmp_path, [], clientfn)
+
+
+def test_no_daemon(tmp_path):
+    calls = []
+    client = ProxyClient(str(tmp_path / "nobody.sock"), Http(transport=slow_transport(calls)))
+    assert not client.available()
+    result = trio.run(client.get_json, "https://api.github.com/repos/owner/repo/runs")
+    assert result == {"url": "https://api.github.com/repos/owner/repo/runs"}
+    assert calls == ["https://api.github.com/repos/owner/repo/runs"]
+
+
+def test_fresh_secs_stretches_for_budget():
+    server = ProxyServer(Http(), budget=0.5)
+    rl = server.http.rate_limit
+    assert server.fresh_secs(1000) == 5
+    rl.limit, rl.remaining, rl.reset = 5000, 100, 1000 + 3600
+    server.asked = {f"url{i}": 1000 for i in range(10)}
+    # 10 URLs per period, 50 requests allowed in the next hour.
+    assert server.fresh_secs(1000) == 3600 * 10 / 50
@@ -0,0 +1,143 @@
+import datetime
+import json
+
+import pytest
+import trio
+
+from watchgha.data_core import get_events
+from watchgha.replay import ReplayData
+from watchgha.utils import WatchGhaError, to_datetime
+
+RUNS_URL = "https://api.github.com/repos/a/b/actions/runs?per_page=100&branch=main"
+JOBS_URL = "https://api.github.com/repos/a/b/actions/runs/1/jobs?per_page=100"
+
+
+def run_json(status, conclusion=None, created_at="2024-01-02T03:04:05Z"):
+    return {
+        "id": 1,
+        "name": "CI",
+        "display_title": "Fix it",
+        "status": status,
+        "conclusion": conclusion,
+        "event": "push",
+        "head_branch": "main",
+        "head_sha": "a" * 40,
+        "html_url": "https://github.com/a/b/actions/runs/1",
+        "jobs_url": JOBS_URL.partition("?")[0],
+        "run_attempt": 1,
+        "created_at": created_at,
+        "updated_at": created_at,
+        "run_started_at": created_at,
+        "repository": {"full_name": "a/b"},
+    }
+
+
+def write_capture(tmp_path, responses, header=True):
+    """Write a SAVE_DATA capture of (url, data) pairs to `tmp_path`."""
+    lines = []
+    if header:
+        lines.append("# URLs fetched, starting at 2024-01-02T03:04:05+00:00:")
+    for n, (url, data) in enumerate(responses):
+        filename = f"get_{n:03d}.json"
+        (tmp_path / filename).write_text(json.dumps(data))
+        timing = f" (at {n:.3f}s, took 0.010s)" if header else ""
+        lines.append(f"{filename}: {url}{timing}")
+    (tmp_path / "get_index.txt").write_text("\n".join(lines) + "\n")
+
+
+def runs_page(status, conclusion=None):
+    return {"total_count": 1, "workflow_runs": [run_json(status, conclusion)]}
+
+
+def test_replays_polls_in_order(tmp_path):
+    write_capture(
+        tmp_path,
+        [
+            (RUNS_URL, runs_page("in_progress")),
+            (RUNS_URL + "&page=2", {"total_count": 1, "workflow_runs": []}),
+            (RUNS_URL, runs_page("completed", "success")),
+        ],
+    )
+    replay = ReplayData(tmp_path, shift_times=False)
+    assert replay.runs_urls() == [RUNS_URL]
+    assert replay.num_polls() == 2
+    statuses = [
+        trio.run(replay.get_json, RUNS_URL)["workflow_runs"][0]["status"]
+        for _ in range(3)
+    ]
+    # The last response repeats once they run out.
+    assert statuses == ["in_progress", "completed", "completed"]
+    assert replay.captures[RUNS_URL][1].took == 0.010
+
+
+def test_per_workflow_runs_urls(tmp_path):
+    # With --only, the workflows are listed, and then each one's runs polled.
+    repo_url = "https://api.github.com/repos/a/b"
+    workflow_runs_url = f"{repo_url}/actions/workflows/17/runs?per_page=100&branch=main"
+    write_capture(
+        tmp_path,
+        [
+            (f"{repo_url}/actions/workflows?per_page=100", {"workflows": []}),
+            (workflow_runs_url, runs_page("in_progress")),
+            (JOBS_URL, {"total_count": 0, "jobs": []}),
+            (workflow_runs_url, runs_page("completed", "success")),
+        ],
+    )
+    replay = ReplayData(tmp_path, shift_times=False)
+    assert replay.runs_urls() == [workflow_runs_url]
+    assert replay.num_polls() == 2
+
+
+def test_unknown_url(tmp_path):
+    write_capture(tmp_path, [(RUNS_URL, runs_page("queued"))])
+    replay = ReplayData(tmp_path)
+    with pytest.raises(WatchGhaError, match="No saved data"):
+        trio.run(replay.get_json, JOBS_URL)
+
+
+def test_missing_capture(tmp_path):
+    with pytest.raises(WatchGhaError, match="Couldn't read saved data"):
+        ReplayData(tmp_path)
+
+
+def test_times_are_shifted_to_now(tmp_path):
+    write_capture(tmp_path, [(RUNS_URL, runs_page("queued"))])
+    replay = ReplayData(tmp_path)
+    data = trio.run(replay.get_json, RUNS_URL)
+    created = to_datetime(data["workflow_runs"][0]["created_at"])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    assert abs(now - created) < datetime.timedelta(minutes=1)
+
+
+def test_old_captures_without_timings(tmp_path):
+    write_capture(tmp_path, [(RUNS_URL, runs_page("queued"))], header=False)
+    replay = ReplayData(tmp_path, timing=True)
+    assert replay.captures[RUNS_URL][0].took is None
+    assert trio.run(replay.get_json, RUNS_URL)["total_count"] == 1
+
+
+def test_get_events_from_replay(tmp_path):
+    job = {
+        "id": 11,
+        "run_id": 1,
+        "name": "test",
+        "status": "completed",
+        "conclusion": "success",
+        "html_url": "https://github.com/a/b/actions/runs/1/job/11",
+        "created_at": "2024-01-02T03:04:05Z",
+        "started_at": "2024-01-02T03:04:05Z",
+        "completed_at": "2024-01-02T03:05:05Z",
+        "steps": [],
+    }
+    write_capture(
+        tmp_path,
+        [
+            (RUNS_URL, runs_page("completed", "success")),
+            (JOBS_URL, {"total_count": 1, "jobs": [job]}),
+        ],
+    )
+    replay = ReplayData(tmp_path)
+    events = trio.run(get_events, replay.runs_urls(), replay.get_json, None)
+    runs = [run for runs in events for run in runs]
+    assert [run.conclusion for run in runs] == ["success"]
+    assert [job.name for job in runs[0].jobs] == ["test"]
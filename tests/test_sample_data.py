@@ -2,7 +2,10 @@ import io
 
 from textwrap import dedent
 
-from watchgha.sample_data import sample
+import trio
+
+from watchgha.data_core import events_status, get_events
+from watchgha.sample_data import sample, synthetic_data, synthetic_datafn
 
 
 def test_sample_data():
@@ -31,3 +34,18 @@ def test_sample_data():
                   Just one job                   [dim]⏲[/] [dim]queued[/]
             """)
         assert stream.getvalue() == expected
+
+
+def test_synthetic_data():
+    data = synthetic_data(num_workflows=4, num_jobs=150, num_steps=5)
+    events = trio.run(get_events, ["synth:runs"], synthetic_datafn(data), None)
+    # One push, so one event.
+    assert len(events) == 1
+    runs = events[0]
+    assert len(runs) == 4
+    # The jobs come in two pages.
+    assert [len(run.jobs) for run in runs] == [150] * 4
+    assert all(len(job.steps) == 5 for run in runs for job in run.jobs)
+    status = events_status(events)
+    assert status.total == 600
+    assert not status.done
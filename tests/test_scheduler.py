@@ -0,0 +1,54 @@
+import pytest
+
+from watchgha.http_help import RateLimit
+from watchgha.scheduler import PollScheduler
+
+
+NOW = 1_700_000_000
+
+
+@pytest.mark.parametrize(
+    "remaining, cost, secs",
+    [
+        # Plenty of requests left: poll at the requested rate.
+        (5000, 10, 15),
+        # Polls that cost nothing can always happen.
+        (0, 0, 15),
+        # 50 requests allowed in an hour, 10 per poll: 5 polls in an hour.
+        (100, 10, 720),
+        # Not enough for even one poll: wait until the reset.
+        (10, 10, 3600),
+    ],
+)
+def test_secs_for_cost(remaining, cost, secs):
+    rate_limit = RateLimit(limit=5000, remaining=remaining, reset=NOW + 3600)
+    scheduler = PollScheduler(15, rate_limit, budget=0.5)
+    assert scheduler.secs_for_cost(cost, NOW) == secs
+
+
+def test_blocked_until():
+    rate_limit = RateLimit(limit=5000, remaining=4000, reset=NOW + 3600)
+    rate_limit.blocked_until = NOW + 60
+    scheduler = PollScheduler(15, rate_limit, budget=0.5)
+    assert scheduler.secs_for_cost(1, NOW) == 60
+
+
+@pytest.mark.parametrize(
+    "due, secs",
+    [
+        # No prediction: the usual interval.
+        (None, 15),
+        # Nothing for a while: poll less often, but not too much less.
+        (NOW + 40, 40),
+        (NOW + 600, 60),
+        # Something is due soon or just now: poll more often.
+        (NOW + 10, 7.5),
+        (NOW - 10, 7.5),
+        # Long overdue, our guess was wrong.
+        (NOW - 100, 15),
+    ],
+)
+def test_secs_for_eta(due, secs):
+    scheduler = PollScheduler(15)
+    scheduler.next_due = due
+    assert scheduler.secs_for_eta(NOW) == secs
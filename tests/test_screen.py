@@ -0,0 +1,68 @@
+import io
+
+import rich.console
+
+from watchgha.screen import LineScreen, open_screen
+
+
+def make_console():
+    return rich.console.Console(
+        file=io.StringIO(), width=40, height=10, force_terminal=True, highlight=False
+    )
+
+
+def test_only_changed_lines_are_written():
+    console = make_console()
+    screen = LineScreen(console)
+    lines = [f"[green]job {n}[/] running" for n in range(5)]
+    with screen:
+        screen.update("\n".join(lines) + "\n")
+        before = console.file.getvalue()
+        assert all(f"job {n}" in before for n in range(5))
+
+        lines[3] = "[red]job 3[/] failed"
+        screen.update("\n".join(lines) + "\n")
+        after = console.file.getvalue()[len(before) :]
+        assert "job 3" in after
+        assert "failed" in after
+        assert "job 2" not in after
+        assert "job 4" not in after
+
+        # Nothing changed, nothing is written.
+        screen.update("\n".join(lines) + "\n")
+        assert console.file.getvalue()[len(before) + len(after) :] == ""
+
+
+def test_fewer_lines_clears_the_rest():
+    console = make_console()
+    screen = LineScreen(console)
+    screen.update("one\ntwo\nthree\n")
+    written = len(console.file.getvalue())
+    screen.update("one\ntwo\n")
+    assert console.file.getvalue()[written:] == "\x1b[3;1H\x1b[J"
+    assert len(screen.lines) == 2
+
+
+def test_long_lines_wrap():
+    console = make_console()
+    screen = LineScreen(console)
+    screen.update("x" * 50 + "\nshort\n")
+    assert len(screen.lines) == 3
+
+
+def test_lines_past_the_bottom_are_dropped():
+    console = make_console()
+    screen = LineScreen(console)
+    screen.update("".join(f"line {n}\n" for n in range(20)))
+    assert len(screen.lines) == 10
+    assert "line 10" not in console.file.getvalue()
+
+
+def test_no_control_sequences_for_files():
+    console = rich.console.Console(file=io.StringIO(), width=40, height=10)
+    assert not console.is_terminal
+    with open_screen(console) as screen:
+        screen.update("[green]job 1[/] running\n")
+    output = console.file.getvalue()
+    assert "job 1 running" in output
+    assert "\x1b" not in output
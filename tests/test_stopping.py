@@ -0,0 +1,73 @@
+import trio
+
+from watchgha.data_core import Until, get_events
+from watchgha.sample_data import sample_datafn
+from watchgha.targets import Target
+from watchgha.watcher import GhaWatcher
+
+
+def sample_events(**kwargs):
+    return trio.run(lambda: get_events(["demo:one"], sample_datafn, None, **kwargs))
+
+
+def test_until_workflow():
+    events = sample_events()
+    assert Until("a success run").result(events) is True
+    assert Until("A failure Run").result(events) is False
+    assert Until("Test suite").result(events) is None
+    assert Until("No such workflow").result(events) is None
+
+
+def test_until_job():
+    events = sample_events()
+    assert Until("Test suite/A finished job").result(events) is True
+    assert Until("Test suite/A failed job").result(events) is False
+    assert Until("Test suite/Test suite Py 3.9").result(events) is None
+    # The run finished without the job.
+    assert Until("A failure run/Nope").result(events) is False
+
+
+def test_jobs_wanted():
+    requested = []
+
+    async def datafn(url):
+        requested.append(url)
+        return await sample_datafn(url)
+
+    until = Until("Test suite")
+    events = trio.run(
+        lambda: get_events(["demo:one"], datafn, None, jobs_wanted=until.wants_jobs)
+    )
+    assert requested == ["demo:one", "demo:jobs_tests?per_page=100"]
+    for runs in events:
+        for run in runs:
+            assert (run.jobs != []) == (run.name == "Test suite")
+
+
+def sample_watcher(**kwargs):
+    watcher = GhaWatcher(
+        targets=[Target(["demo:one"])],
+        get_data_fn=sample_datafn,
+        only_words=None,
+        message=None,
+        **kwargs,
+    )
+    trio.run(watcher.get_gha_display)
+    return watcher
+
+
+def test_fail_fast():
+    watcher = sample_watcher()
+    assert not watcher.should_stop()
+    watcher = sample_watcher(fail_fast=True)
+    assert watcher.should_stop()
+    assert not watcher.succeeded
+    assert watcher.stop_message == "Stopped: a job failed"
+
+
+def test_until_stops():
+    watcher = sample_watcher(until=Until("A success run"))
+    assert watcher.should_stop()
+    assert watcher.succeeded
+    watcher = sample_watcher(until=Until("Test suite"))
+    assert not watcher.should_stop()
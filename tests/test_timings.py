@@ -0,0 +1,70 @@
+import functools
+import json
+
+import httpx
+import trio
+
+from watchgha.data_core import get_events
+from watchgha.http_help import Http
+from watchgha.sample_data import sample_datafn
+from watchgha.timings import NO_TIMINGS, Timings
+
+
+def flaky_transport():
+    """A server that answers the first request with a 502."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(502)
+        return httpx.Response(200, json={"answer": 42})
+
+    return httpx.MockTransport(handler)
+
+
+def test_http_requests_are_timed():
+    timings = Timings()
+    http = Http(transport=flaky_transport(), timings=timings)
+
+    async def go():
+        timings.start_poll()
+        assert await http.get_json("https://api.example.com/data") == {"answer": 42}
+        timings.end_poll()
+        await http.aclose()
+
+    trio.run(go)
+    poll = timings.last_poll
+    assert (poll.requests, poll.retries) == (2, 1)
+    assert poll.bytes == len('{"answer":42}')
+    assert "parse" in poll.phases
+    assert poll.describe().startswith("Last poll ")
+    assert "2 requests" in poll.describe()
+    assert "1 retries" in poll.describe()
+    # Without a trace, events aren't kept.
+    assert (timings.events, timings.lanes) == ([], [])
+
+
+def test_get_events_phases(tmp_path):
+    timings = Timings(trace=True)
+    timings.start_poll()
+    get_timed_events = functools.partial(get_events, timings=timings)
+    trio.run(get_timed_events, ["demo:one"], sample_datafn, None)
+    timings.end_poll()
+    assert {"sort runs", "sort jobs"} <= set(timings.last_poll.phases)
+
+    trace_file = tmp_path / "trace.json"
+    timings.write_trace(trace_file)
+    trace = json.loads(trace_file.read_text())
+    names = {event["name"] for event in trace["traceEvents"]}
+    assert {"get runs", "sort runs", "get jobs", "poll 1", "thread_name"} <= names
+    # The concurrent phases are in their own lanes.
+    events = trace["traceEvents"]
+    assert all(event["tid"] != 0 for event in events if event["name"] == "get runs")
+
+
+def test_no_timings():
+    with NO_TIMINGS.span("anything"):
+        pass
+    assert NO_TIMINGS.describe() == ""
+    assert not NO_TIMINGS.enabled
@@ -1,6 +1,8 @@
 import pytest
+import trio
 
 from watchgha import watch_runs
+from watchgha.targets import workflow_runs_urls
 from watchgha.watch_runs import gha_urls
 
 
@@ -55,8 +57,12 @@ def fake_git_branch(repo):
     return FAKE_REPOS.get(repo, {}).get("branch", "master")
 
 
+SINCE = "2025-03-17"
+
+
 @pytest.fixture
 def mocked_gha_urls_dependencies(monkeypatch):
+    monkeypatch.setattr("watchgha.targets.oldest_run_date", lambda: SINCE)
     monkeypatch.setattr(watch_runs, "isdir", fake_isdir)
     monkeypatch.setattr(watch_runs, "git_repo_urls", fake_git_repo_urls)
     monkeypatch.setattr(watch_runs, "git_branch", fake_git_branch)
@@ -69,50 +75,50 @@ def mocked_gha_urls_dependencies(monkeypatch):
             ["."],
             {},
             [
-                "https://api.github.com/repos/owner/repo/actions/runs?per_page=100&branch=mainbranch",
+                f"https://api.github.com/repos/owner/repo/actions/runs?per_page=100&branch=mainbranch&created=%3E%3D{SINCE}&exclude_pull_requests=true",
             ],
         ),
         (
             ["dir1"],
             {},
             [
-                "https://api.github.com/repos/somebody/therepo/actions/runs?per_page=100&branch=joe%2Ffeature1",
+                f"https://api.github.com/repos/somebody/therepo/actions/runs?per_page=100&branch=joe%2Ffeature1&created=%3E%3D{SINCE}&exclude_pull_requests=true",
             ],
         ),
         (
             ["dir1", "another-branch"],
             {},
             [
-                "https://api.github.com/repos/somebody/therepo/actions/runs?per_page=100&branch=another-branch",
+                f"https://api.github.com/repos/somebody/therepo/actions/runs?per_page=100&branch=another-branch&created=%3E%3D{SINCE}&exclude_pull_requests=true",
             ],
         ),
         (
             ["dir1", None, "sha12345678"],
             {},
             [
-                "https://api.github.com/repos/somebody/therepo/actions/runs?per_page=100&head_sha=sha12345678",
+                f"https://api.github.com/repos/somebody/therepo/actions/runs?per_page=100&head_sha=sha12345678&created=%3E%3D{SINCE}&exclude_pull_requests=true",
             ],
         ),
         (
             ["dir-many-remotes"],
             {},
             [
-                "https://api.github.com/repos/contributor1/project/actions/runs?per_page=100&branch=main",
-                "https://api.github.com/repos/contributor2/project/actions/runs?per_page=100&branch=main",
+                f"https://api.github.com/repos/contributor1/project/actions/runs?per_page=100&branch=main&created=%3E%3D{SINCE}&exclude_pull_requests=true",
+                f"https://api.github.com/repos/contributor2/project/actions/runs?per_page=100&branch=main&created=%3E%3D{SINCE}&exclude_pull_requests=true",
             ],
         ),
         (
             ["."],
             {"GITHUB_API_URL": "https://theapi.nedhub.com"},
             [
-                "https://theapi.nedhub.com/repos/owner/repo/actions/runs?per_page=100&branch=mainbranch",
+                f"https://theapi.nedhub.com/repos/owner/repo/actions/runs?per_page=100&branch=mainbranch&created=%3E%3D{SINCE}&exclude_pull_requests=true",
             ],
         ),
         (
             ["https://github.com/me/myproject.git", "mybranch"],
             {},
             [
-                "https://api.github.com/repos/me/myproject/actions/runs?per_page=100&branch=mybranch",
+                f"https://api.github.com/repos/me/myproject/actions/runs?per_page=100&branch=mybranch&created=%3E%3D{SINCE}&exclude_pull_requests=true",
             ],
         ),
         (
@@ -122,7 +128,7 @@ def mocked_gha_urls_dependencies(monkeypatch):
                 "GITHUB_API_URL": "https://api.mygithub.enterprise.com",
             },
             [
-                "https://api.mygithub.enterprise.com/repos/me/myproject/actions/runs?per_page=100&branch=master",
+                f"https://api.mygithub.enterprise.com/repos/me/myproject/actions/runs?per_page=100&branch=master&created=%3E%3D{SINCE}&exclude_pull_requests=true",
             ],
         ),
         (
@@ -132,7 +138,7 @@ def mocked_gha_urls_dependencies(monkeypatch):
                 "GITHUB_API_URL": "https://githubapi.mydomain.com",
             },
             [
-                "https://githubapi.mydomain.com/repos/davidszotten/davidrepo/actions/runs?per_page=100&branch=master",
+                f"https://githubapi.mydomain.com/repos/davidszotten/davidrepo/actions/runs?per_page=100&branch=master&created=%3E%3D{SINCE}&exclude_pull_requests=true",
             ],
         ),
     ],
@@ -169,3 +175,53 @@ def test_gha_urls_fails(
     with pytest.raises(SystemExit):
         gha_urls(*args)
     assert capsys.readouterr().err.strip() == msg
+
+
+def test_workflow_runs_urls():
+    async def fake_datafn(url):
+        assert url == "https://api.github.com/repos/owner/repo/actions/workflows?per_page=100"
+        return {
+            "workflows": [
+                {"id": 11, "name": "Tests"},
+                {"id": 12, "name": "Quality"},
+                {"id": 13, "name": "Nightly tests"},
+            ],
+        }
+
+    urls = trio.run(
+        workflow_runs_urls,
+        "https://api.github.com/repos/owner/repo/actions/runs?per_page=100&branch=main",
+        fake_datafn,
+        ["test"],
+    )
+    assert urls == [
+        "https://api.github.com/repos/owner/repo/actions/workflows/11/runs?per_page=100&branch=main",
+        "https://api.github.com/repos/owner/repo/actions/workflows/13/runs?per_page=100&branch=main",
+    ]
+
+
+def test_read_targets(mocked_gha_urls_dependencies):
+    sha = "4b2ff58124791953563fdb52e40d9ab79d274d9a"
+    targets = watch_runs.read_targets(
+        [
+            "# Release branches\n",
+            "dir1\n",
+            "\n",
+            "https://github.com/me/myproject release-1.0\n",
+            f"https://github.com/me/myproject {sha}\n",
+        ]
+    )
+    assert [t.label for t in targets] == [
+        "dir1",
+        "https://github.com/me/myproject release-1.0",
+        f"https://github.com/me/myproject {sha}",
+    ]
+    assert targets[0].urls == gha_urls("dir1")
+    assert targets[1].urls == gha_urls("https://github.com/me/myproject", "release-1.0")
+    assert targets[2].urls == gha_urls("https://github.com/me/myproject", None, sha)
+
+
+def test_read_no_targets(capsys):
+    with pytest.raises(SystemExit):
+        watch_runs.read_targets(["# Nothing here\n"])
+    assert capsys.readouterr().err.strip() == "No targets to watch"
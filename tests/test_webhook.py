@@ -0,0 +1,140 @@
+import json
+
+import httpx
+import pytest
+import trio
+import trio.testing
+
+from watchgha.sample_data import sample_datafn
+from watchgha.targets import Target
+from watchgha.watcher import GhaWatcher
+from watchgha.webhook import (
+    REQUEST_TIMEOUT,
+    handle_connection,
+    parse_address,
+    serve_webhooks,
+    signature,
+)
+
+RUNS_URL = "https://api.github.com/repos/owner/repo/actions/runs?branch=nedbat/test"
+REPOSITORY = {"full_name": "owner/repo"}
+
+
+def test_parse_address():
+    assert parse_address("8080") == ("127.0.0.1", 8080)
+    assert parse_address("0.0.0.0:9000") == ("0.0.0.0", 9000)
+    with pytest.raises(ValueError, match="Don't understand address 'web'"):
+        parse_address("web")
+
+
+def test_listener():
+    delivered = []
+    statuses = []
+
+    def deliverfn(event_name, payload):
+        delivered.append((event_name, payload))
+
+    async def go():
+        async with trio.open_nursery() as nursery:
+            listeners = await nursery.start(
+                serve_webhooks, "127.0.0.1", 0, deliverfn, "s3cret"
+            )
+            port = listeners[0].socket.getsockname()[1]
+            url = f"http://127.0.0.1:{port}/"
+            async with httpx.AsyncClient() as client:
+
+                async def post(event_name, body, secret="s3cret"):
+                    headers = {
+                        "X-GitHub-Event": event_name,
+                        "X-Hub-Signature-256": signature(secret, body),
+                    }
+                    resp = await client.post(url, content=body, headers=headers)
+                    statuses.append(resp.status_code)
+
+                payload = {"action": "completed", "workflow_job": {"id": 17}}
+                await post("workflow_job", json.dumps(payload).encode())
+                await post("ping", b"{}")
+                await post("workflow_job", b"{}", secret="wrong")
+                await post("workflow_run", b"not json")
+                statuses.append((await client.get(url)).status_code)
+            nursery.cancel_scope.cancel()
+
+    trio.run(go)
+    assert delivered == [("workflow_job", {"action": "completed", "workflow_job": {"id": 17}})]
+    assert statuses == [204, 204, 401, 400, 405]
+
+
+def test_slow_clients_are_dropped():
+    async def go():
+        client, server = trio.testing.memory_stream_pair()
+        async with trio.open_nursery() as nursery:
+            nursery.start_soon(handle_connection, server, None, None)
+            await client.send_all(b"POST / HTTP/1.1\r\nHost: x\r\n")
+            # Then nothing more.
+            assert await client.receive_some() == b""
+        return trio.current_time()
+
+    clock = trio.testing.MockClock(autojump_threshold=0)
+    assert trio.run(go, clock=clock) >= REQUEST_TIMEOUT
+
+
+def sample_watcher():
+    async def datafn(url):
+        if url.startswith("https://"):
+            url = "demo:one"
+        return await sample_datafn(url)
+
+    watcher = GhaWatcher(
+        targets=[Target([RUNS_URL])],
+        get_data_fn=datafn,
+        only_words=None,
+        message=None,
+    )
+    watcher.wakeup = trio.Event()
+    trio.run(watcher.get_gha_display)
+    return watcher
+
+
+def find_run(watcher, name):
+    for runs in watcher.all_events[0]:
+        for run in runs:
+            if run.name == name:
+                return run
+
+
+def test_deliver_job():
+    watcher = sample_watcher()
+    run = find_run(watcher, "Test suite")
+    delayed = [job for job in run.jobs if job.name == "A delayed job"][0]
+    assert "Now running" not in watcher.output
+
+    job = {
+        "id": delayed.id,
+        "run_id": run.id,
+        "run_attempt": 1,
+        "name": "A delayed job",
+        "status": "in_progress",
+        "created_at": delayed.created_dt.isoformat(),
+        "steps": [{"name": "Now running", "status": "in_progress"}],
+    }
+    watcher.deliver("workflow_job", {"workflow_job": job, "repository": REPOSITORY})
+    assert "Now running" in watcher.output
+    assert len(run.jobs) == 7
+    # The display changed, but it isn't time to poll.
+    assert watcher.wakeup.is_set()
+    assert not watcher.poll_now
+
+
+def test_deliver_new_run():
+    watcher = sample_watcher()
+    job = {"id": 99, "run_id": 12345, "name": "New", "status": "queued"}
+    watcher.deliver("workflow_job", {"workflow_job": job, "repository": REPOSITORY})
+    assert watcher.poll_now
+
+
+def test_deliver_other_repo():
+    watcher = sample_watcher()
+    job = {"id": 99, "run_id": 12345, "name": "New", "status": "queued"}
+    repository = {"full_name": "someone/else"}
+    watcher.deliver("workflow_job", {"workflow_job": job, "repository": repository})
+    assert not watcher.wakeup.is_set()